@@ -0,0 +1,66 @@
+import os
+import numpy as np
+import pandas as pd
+
+# =============================================================================
+# 0. CONFIGURAÇÕES
+# =============================================================================
+
+# Largura típica dos gráficos de séries temporais e quantos pontos enviar por pixel:
+# acima disso os pontos extra não são visíveis e só aumentam o payload da figura.
+LARGURA_GRAFICO_PX = int(os.getenv("GRAFICO_LARGURA_PX", 1200))
+PONTOS_POR_PIXEL = float(os.getenv("GRAFICO_PONTOS_POR_PIXEL", 0.5))
+# Mini-gráficos do painel principal
+PONTOS_MINI_GRAFICO = 150
+
+def orcamento_pontos(largura_px=LARGURA_GRAFICO_PX):
+    """Número máximo de pontos por série para um gráfico com a largura indicada."""
+    return max(int(largura_px * PONTOS_POR_PIXEL), 3)
+
+# =============================================================================
+# 1. LARGEST-TRIANGLE-THREE-BUCKETS (LTTB)
+# =============================================================================
+
+def indices_lttb(x, y, n_pontos):
+    """
+    Índices dos pontos escolhidos pelo LTTB para representar (x, y) com `n_pontos`.
+
+    O primeiro e o último ponto são mantidos; entre eles, cada balde contribui com o
+    ponto que forma o maior triângulo com o ponto escolhido no balde anterior e a
+    média do balde seguinte, o que preserva picos e vales da série.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if n_pontos >= n or n_pontos < 3:
+        return np.arange(n)
+
+    bordas = np.linspace(1, n - 1, n_pontos - 1).astype(int)
+    indices = np.empty(n_pontos, dtype=int)
+    indices[0], indices[-1] = 0, n - 1
+    anterior = 0
+    for i in range(n_pontos - 2):
+        inicio, fim = bordas[i], bordas[i + 1]
+        prox_fim = bordas[i + 2] if i + 2 < len(bordas) else n
+        media_x = x[fim:prox_fim].mean()
+        media_y = y[fim:prox_fim].mean()
+        areas = np.abs((x[anterior] - media_x) * (y[inicio:fim] - y[anterior]) - (x[anterior] - x[inicio:fim]) * (media_y - y[anterior]))
+        anterior = inicio + int(np.argmax(areas))
+        indices[i + 1] = anterior
+    return indices
+
+def reduzir_serie(df, coluna_x, coluna_y, max_pontos=None):
+    """
+    Reduz `df` (ordenado por `coluna_x`) a no máximo `max_pontos` linhas com LTTB sobre `coluna_y`.
+
+    As linhas sem valor em `coluna_y` são descartadas. As outras colunas seguem as
+    mesmas linhas (ex.: os limites do intervalo de confiança ficam alinhados com a previsão).
+    """
+    if max_pontos is None:
+        max_pontos = orcamento_pontos()
+    df = df.dropna(subset=[coluna_y])
+    if len(df) <= max_pontos:
+        return df
+    x = df[coluna_x]
+    x = x.to_numpy(dtype='datetime64[ns]').astype('int64') if pd.api.types.is_datetime64_any_dtype(x) else x.to_numpy()
+    return df.iloc[indices_lttb(x, df[coluna_y].to_numpy(), max_pontos)]
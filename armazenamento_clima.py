@@ -0,0 +1,131 @@
+import pandas as pd
+import os
+import sys
+
+# =============================================================================
+# 0. CONFIGURAÇÕES
+# =============================================================================
+
+# Diretório raiz do armazenamento: <diretorio>/<estacao>/<ano>.parquet
+DIRETORIO_PADRAO = os.getenv("CLIMA_STORE_DIR", "dados_clima")
+
+# Estação usada pelo dashboard e pelo dataset de ML (dados do INMET)
+ESTACAO_INMET = "INMET"
+
+COLUNA_TEMPO = "DATETIME"
+COMPRESSAO = "snappy"
+
+# =============================================================================
+# 1. PARTIÇÕES
+# =============================================================================
+
+def caminho_particao(estacao, ano, diretorio=DIRETORIO_PADRAO):
+    return os.path.join(diretorio, estacao, f"{ano}.parquet")
+
+def anos_disponiveis(estacao, diretorio=DIRETORIO_PADRAO):
+    """Lista os anos que possuem partição gravada para a estação."""
+    pasta = os.path.join(diretorio, estacao)
+    if not os.path.isdir(pasta):
+        return []
+    return sorted(int(nome[:-len(".parquet")]) for nome in os.listdir(pasta) if nome.endswith(".parquet") and nome[:-len(".parquet")].isdigit())
+
+def estacao_disponivel(estacao, diretorio=DIRETORIO_PADRAO):
+    return bool(anos_disponiveis(estacao, diretorio))
+
+def ler_particao(estacao, ano, columns=None, diretorio=DIRETORIO_PADRAO):
+    caminho = caminho_particao(estacao, ano, diretorio)
+    if not os.path.exists(caminho):
+        return None
+    colunas = None if columns is None else [COLUNA_TEMPO] + [c for c in columns if c != COLUNA_TEMPO]
+    return pd.read_parquet(caminho, columns=colunas)
+
+def gravar_particao(df, estacao, ano, diretorio=DIRETORIO_PADRAO):
+    """Grava a partição de forma atômica, para que uma falha não deixe um arquivo pela metade."""
+    caminho = caminho_particao(estacao, ano, diretorio)
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    caminho_tmp = f"{caminho}.tmp"
+    df.to_parquet(caminho_tmp, index=False, compression=COMPRESSAO)
+    os.replace(caminho_tmp, caminho)
+
+def gravar(df, estacao, diretorio=DIRETORIO_PADRAO):
+    """
+    Acrescenta dados horários ao armazenamento, dividindo-os por ano.
+
+    Registos já existentes com o mesmo horário são substituídos pelos novos.
+    Retorna a lista de anos afetados.
+    """
+    df = df.copy()
+    df[COLUNA_TEMPO] = pd.to_datetime(df[COLUNA_TEMPO])
+    anos_afetados = []
+    for ano, df_ano in df.groupby(df[COLUNA_TEMPO].dt.year):
+        existente = ler_particao(estacao, ano, diretorio=diretorio)
+        if existente is not None:
+            df_ano = pd.concat([existente, df_ano], ignore_index=True)
+        df_ano = df_ano.drop_duplicates(subset=[COLUNA_TEMPO], keep='last').sort_values(COLUNA_TEMPO).reset_index(drop=True)
+        gravar_particao(df_ano, estacao, ano, diretorio)
+        anos_afetados.append(int(ano))
+    return anos_afetados
+
+# =============================================================================
+# 2. CONSULTAS
+# =============================================================================
+
+def read_range(estacao, start=None, end=None, columns=None, diretorio=DIRETORIO_PADRAO):
+    """
+    Lê os dados horários de uma estação entre `start` e `end` (inclusive).
+
+    Apenas as partições dos anos do intervalo são abertas, e apenas as colunas
+    pedidas são lidas. Sem `start`/`end`, o intervalo fica aberto naquele lado.
+    Um `end` sem horário (meia-noite) inclui todas as horas desse dia.
+    """
+    anos = anos_disponiveis(estacao, diretorio)
+    start = pd.Timestamp(start) if start is not None else None
+    end = pd.Timestamp(end) if end is not None else None
+    # Data sem horário: vale até o fim do dia, ou seja, antes da meia-noite seguinte
+    limite_fim = end + pd.Timedelta(days=1) if end is not None and end == end.normalize() else None
+    if start is not None:
+        anos = [a for a in anos if a >= start.year]
+    if end is not None:
+        anos = [a for a in anos if a <= end.year]
+
+    partes = []
+    for ano in anos:
+        df_ano = ler_particao(estacao, ano, columns, diretorio)
+        if start is not None and ano == start.year:
+            df_ano = df_ano[df_ano[COLUNA_TEMPO] >= start]
+        if end is not None and ano == end.year:
+            df_ano = df_ano[df_ano[COLUNA_TEMPO] < limite_fim] if limite_fim is not None else df_ano[df_ano[COLUNA_TEMPO] <= end]
+        partes.append(df_ano)
+
+    if not partes:
+        colunas = [COLUNA_TEMPO] + [c for c in (columns or []) if c != COLUNA_TEMPO]
+        return pd.DataFrame(columns=colunas)
+    return pd.concat(partes, ignore_index=True)
+
+def ultimo_timestamp(estacao, coluna_valida=None, diretorio=DIRETORIO_PADRAO):
+    """Último horário armazenado (opcionalmente, o último com `coluna_valida` não nula)."""
+    for ano in reversed(anos_disponiveis(estacao, diretorio)):
+        df_ano = ler_particao(estacao, ano, [coluna_valida] if coluna_valida else None, diretorio)
+        if coluna_valida:
+            df_ano = df_ano.dropna(subset=[coluna_valida])
+        if not df_ano.empty:
+            return df_ano[COLUNA_TEMPO].max()
+    return None
+
+# =============================================================================
+# 3. IMPORTAÇÃO DOS CSVs EXISTENTES
+# =============================================================================
+
+def importar_csv(caminho_csv, estacao, diretorio=DIRETORIO_PADRAO):
+    """Converte um CSV horário plano (ex.: 'Dados_Climaticos_INMET.csv') em partições por ano."""
+    df = pd.read_csv(caminho_csv, parse_dates=[COLUNA_TEMPO])
+    anos = gravar(df, estacao, diretorio)
+    print(f"Arquivo '{caminho_csv}' importado para a estação '{estacao}': {len(df)} registros em {len(anos)} partições anuais.")
+    return anos
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print("Uso: python armazenamento_clima.py <arquivo.csv> <estacao>")
+        print("Ex.: python armazenamento_clima.py Dados_Climaticos_INMET.csv INMET")
+        sys.exit(1)
+    importar_csv(sys.argv[1], sys.argv[2])
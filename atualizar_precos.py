@@ -2,12 +2,14 @@ import pandas as pd
 from alpha_vantage.timeseries import TimeSeries
 from alpha_vantage.foreignexchange import ForeignExchange
 from datetime import date
-from sqlalchemy.exc import IntegrityError
+from sqlalchemy import select, func
 from time import sleep
 import numpy as np
 
-from database import SessionLocal, engine
+from database import SessionLocal, engine, comando_upsert
 import models
+import migrations
+import export_data
 
 # =============================================================================
 # 0. CONFIGURAÇÕES
@@ -23,6 +25,9 @@ COMMODITIES = {
 }
 DATA_INICIO = "2017-01-01"
 
+# Número de linhas enviadas por comando na inserção em lote
+TAMANHO_LOTE_INSERCAO = 1000
+
 # =============================================================================
 # 1. FUNÇÕES AUXILIARES
 # =============================================================================
@@ -58,22 +63,44 @@ def buscar_dados_commodity(api_key, symbol, nome_amigavel):
         df_simulado = pd.DataFrame(price_data, index=dates, columns=['4. close'])
         return df_simulado
 
-def salvar_dados_no_banco(db, dados, cultura_nome):
-    """Salva os dados processados na tabela precos_mercado."""
-    registos_inseridos = 0
-    for index, row in dados.iterrows():
-        novo_preco = models.PrecoMercado(
-            data=index.date(),
-            cultura_nome=cultura_nome,
-            preco_fecho_kg=row['Preco_BRL_kg']
-        )
-        db.add(novo_preco)
-        try:
-            db.commit()
-            registos_inseridos += 1
-        except IntegrityError:
-            db.rollback()
-    print(f"Total de {registos_inseridos} novos registos de preço inseridos para {cultura_nome}.")
+def salvar_dados_no_banco(db, dados, cultura_nome, atualizar_existentes=False, tamanho_lote=TAMANHO_LOTE_INSERCAO):
+    """
+    Salva os dados processados na tabela precos_mercado numa única transação.
+
+    As linhas são enviadas em lotes com INSERT ... ON CONFLICT(data, cultura_nome),
+    ignorando (DO NOTHING) ou atualizando (DO UPDATE) as datas já existentes.
+    Retorna uma tupla (inseridos, ignorados_ou_atualizados).
+    """
+    registos = [
+        {"data": index.date(), "cultura_nome": cultura_nome, "preco_fecho_kg": float(preco)}
+        for index, preco in dados['Preco_BRL_kg'].dropna().items()
+    ]
+    if not registos:
+        print(f"Nenhum registo de preço para inserir para {cultura_nome}.")
+        return 0, 0
+
+    tabela = models.PrecoMercado.__table__
+    stmt = comando_upsert(tabela, ['data', 'cultura_nome'], ['preco_fecho_kg'] if atualizar_existentes else None, db.get_bind())
+
+    contar = select(func.count()).select_from(tabela).where(tabela.c.cultura_nome == cultura_nome)
+    try:
+        total_antes = db.execute(contar).scalar_one()
+        for inicio in range(0, len(registos), tamanho_lote):
+            db.execute(stmt, registos[inicio:inicio + tamanho_lote])
+        total_depois = db.execute(contar).scalar_one()
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    registos_inseridos = total_depois - total_antes
+    registos_restantes = len(registos) - registos_inseridos
+    if atualizar_existentes and registos_restantes:
+        # Linhas reescritas no lugar não aparecem numa exportação incremental por id
+        export_data.invalidar_marcas(['precos_mercado'])
+    acao = "atualizados" if atualizar_existentes else "ignorados (já existentes)"
+    print(f"Total de {registos_inseridos} novos registos de preço inseridos para {cultura_nome}; {registos_restantes} {acao}.")
+    return registos_inseridos, registos_restantes
 
 # =============================================================================
 # 2. FUNÇÃO PRINCIPAL
@@ -84,7 +111,7 @@ def main():
         return
 
     db = SessionLocal()
-    models.Base.metadata.create_all(bind=engine)
+    migrations.atualizar_esquema(engine)
 
     # 1. Buscar cotação do Dólar
     dolar_series = buscar_dados_forex(ALPHA_VANTAGE_API_KEY)
@@ -0,0 +1,236 @@
+import argparse
+import inspect
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from sqlalchemy import text
+
+import database
+import populate_data
+
+# =============================================================================
+# 0. CONFIGURAÇÕES DO BENCHMARK
+# =============================================================================
+# Gera bases sintéticas em várias escalas (populate_data.gerar_dados_em_massa) e,
+# para cada uma, importa o dashboard num processo novo (apontado para a base por
+# DATABASE_URL) e chama diretamente as funções dos callbacks com combinações de
+# filtros representativas. O relatório JSON pode ser comparado entre commits com
+# --comparar para detetar regressões antes do deploy.
+
+ESCALAS = {
+    "pequena": {"num_fazendas": 3, "num_talhoes": 100, "num_anos": 4},
+    "media": {"num_fazendas": 10, "num_talhoes": 1000, "num_anos": 8},
+    "grande": {"num_fazendas": 25, "num_talhoes": 5000, "num_anos": 10},
+}
+DIRETORIO_BASES = "bases_benchmark"
+RELATORIO_PADRAO = "benchmark_dashboard.json"
+REPETICOES = 5
+# Diferença relativa a partir da qual --comparar acusa uma regressão
+LIMIAR_REGRESSAO = 0.20
+
+# Tabelas contadas no relatório para descrever cada escala
+TABELAS_CONTADAS = ["fazendas", "talhoes", "safras", "atividades_agricolas", "contratos_venda", "precos_mercado"]
+
+# =============================================================================
+# 1. EXECUÇÃO NO PROCESSO DE CADA ESCALA
+# =============================================================================
+
+def _sem_progresso(*args):
+    pass
+
+def _limpar_caches(modulo):
+    # Cada repetição mede o callback "a frio", como no primeiro pedido com aqueles filtros
+    for objeto in vars(modulo).values():
+        if callable(getattr(objeto, "cache_clear", None)):
+            objeto.cache_clear()
+
+def _chamar(funcao, args, disparo=None):
+    from dash._callback_context import context_value
+    from dash._utils import AttributeDict
+    # Callbacks que leem ctx.triggered recebem o mesmo contexto que o Dash montaria no pedido
+    context_value.set(AttributeDict(triggered_inputs=[{"prop_id": disparo, "value": 1}] if disparo else []))
+    if next(iter(inspect.signature(funcao).parameters), None) == "set_progress":
+        return funcao(_sem_progresso, *args)
+    return funcao(*args)
+
+def cenarios(dashboard):
+    """(nome, função, argumentos, prop_id que disparou) de cada medição."""
+    df = dashboard.df_agricola
+    anos = sorted(df["ano_safra"].unique())
+    ano = anos[-2] if len(anos) > 1 else anos[-1]
+    fazenda = df["fazenda"].value_counts().index[0]
+    cultura = df["cultura"].value_counts().index[0]
+    filtros = {
+        "todos": ("todos", "todos", "todos", "todos"),
+        "ano": (ano, "todos", "todos", "todos"),
+        "ano+fazenda+cultura": (ano, "todos", fazenda, cultura),
+    }
+    inicio_12m = dashboard.start_date_default.strftime("%Y-%m-%d") if hasattr(dashboard.start_date_default, "strftime") else None
+    fim = dashboard.max_date_allowed.strftime("%Y-%m-%d") if hasattr(dashboard.max_date_allowed, "strftime") else None
+    talhao = df["talhao"].value_counts().index[0]
+    botao = json.dumps({"index": talhao, "type": "btn-detalhes-talhao"}, separators=(",", ":")) + ".n_clicks"
+
+    lista = []
+    for nome, (a, s, f, c) in filtros.items():
+        lista.append((f"update_painel_principal[{nome}]", dashboard.update_painel_principal, (a, s, f, c), None))
+        lista.append((f"update_risco_mercado[{nome}, 12 meses]", dashboard.update_risco_mercado, (a, s, f, c, inicio_12m, fim), None))
+        lista.append((f"update_risco_mercado[{nome}, todo o período]", dashboard.update_risco_mercado, (a, s, f, c, None, None), None))
+        lista.append((f"update_grafico_operacional[{nome}]", dashboard.update_grafico_operacional, (a, s, c), None))
+        lista.append((f"update_enos_analysis[{nome}]", dashboard.update_enos_analysis, (a, s, f, c), None))
+        lista.append((f"update_grafico_correlacao[{nome}]", dashboard.update_grafico_correlacao, ("ph", "lucro_ha", a, c), None))
+    lista.append(("display_talhao_details[talhão com mais safras]", dashboard.display_talhao_details, ([1], False), botao))
+    if dashboard.modelo_produtividade is not None:
+        lista.append(("update_prediction[Soja]", dashboard.update_prediction, ("Soja", "Neutro", 100, 6.0, 15.0, 120.0, 3.0, 900.0), None))
+    return lista
+
+def medir_escala(repeticoes=REPETICOES):
+    """Executado no processo filho: importa o dashboard (carga dos dados) e mede cada callback."""
+    import psutil
+    processo = psutil.Process()
+    rss_antes = processo.memory_info().rss
+    inicio = time.perf_counter()
+    import dashboard
+    carga = {"tempo_s": round(time.perf_counter() - inicio, 3), "rss_mb": round((processo.memory_info().rss - rss_antes) / 2**20, 1)}
+
+    callbacks = {}
+    for nome, funcao, args, disparo in cenarios(dashboard):
+        tempos = []
+        try:
+            for _ in range(repeticoes):
+                _limpar_caches(dashboard)
+                inicio = time.perf_counter()
+                _chamar(funcao, args, disparo)
+                tempos.append((time.perf_counter() - inicio) * 1000)
+        except Exception as e:
+            # Um callback com erro não interrompe o benchmark; fica registado no relatório
+            callbacks[nome] = {"erro": f"{type(e).__name__}: {e}"}
+            print(f"  {nome}: ERRO {callbacks[nome]['erro']}")
+            continue
+        # O pico de memória é medido numa execução à parte: o tracemalloc atrasa o pandas
+        _limpar_caches(dashboard)
+        tracemalloc.start()
+        _chamar(funcao, args, disparo)
+        pico = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        callbacks[nome] = {"mediana_ms": round(statistics.median(tempos), 2), "min_ms": round(min(tempos), 2), "pico_mb": round(pico / 2**20, 2)}
+        print(f"  {nome}: {callbacks[nome]['mediana_ms']:.1f} ms (pico {callbacks[nome]['pico_mb']:.1f} MB)")
+    return {"carga": carga, "callbacks": callbacks}
+
+# =============================================================================
+# 2. ORQUESTRAÇÃO DAS ESCALAS
+# =============================================================================
+
+def preparar_base(nome, parametros, diretorio=DIRETORIO_BASES, seed=42, reutilizar=False):
+    os.makedirs(diretorio, exist_ok=True)
+    caminho = os.path.join(diretorio, f"dashboard_{nome}.db")
+    url = f"sqlite:///{caminho}"
+    if not (reutilizar and os.path.exists(caminho)):
+        for sufixo in ("", "-wal", "-shm"):
+            if os.path.exists(caminho + sufixo):
+                os.remove(caminho + sufixo)
+        print(f"Gerando base '{caminho}' ({parametros})...")
+        db_engine = database.criar_engine(url)
+        populate_data.gerar_dados_em_massa(db_engine, seed=seed, **parametros)
+        db_engine.dispose()
+    db_engine = database.criar_engine(url)
+    with db_engine.connect() as conn:
+        linhas = {tabela: conn.execute(text(f"SELECT COUNT(*) FROM {tabela}")).scalar() for tabela in TABELAS_CONTADAS}
+    db_engine.dispose()
+    return url, linhas
+
+def _versao_codigo():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def executar_benchmark(escalas=tuple(ESCALAS), saida=RELATORIO_PADRAO, repeticoes=REPETICOES, seed=42, reutilizar=False, diretorio=DIRETORIO_BASES):
+    relatorio = {
+        "versao": _versao_codigo(),
+        "data": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "repeticoes": repeticoes,
+        "escalas": {},
+    }
+    for nome in escalas:
+        parametros = ESCALAS[nome]
+        url, linhas = preparar_base(nome, parametros, diretorio, seed, reutilizar)
+        print(f"\n===== Escala '{nome}': {linhas['safras']} safras =====")
+        # Um processo por escala: o dashboard carrega os dados ao ser importado
+        ambiente = dict(os.environ, DATABASE_URL=url, DASH_TAREFAS_SEGUNDO_PLANO="0", INSTRUMENTACAO_ATIVA="0")
+        with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as arquivo:
+            caminho_resultado = arquivo.name
+        try:
+            subprocess.run([sys.executable, os.path.abspath(__file__), "--interno", caminho_resultado, "--repeticoes", str(repeticoes)],
+                           env=ambiente, check=True)
+            with open(caminho_resultado, encoding="utf-8") as f:
+                resultado = json.load(f)
+        finally:
+            os.remove(caminho_resultado)
+        relatorio["escalas"][nome] = {"parametros": parametros, "linhas": linhas, **resultado}
+
+    with open(saida, "w", encoding="utf-8") as f:
+        json.dump(relatorio, f, ensure_ascii=False, indent=2)
+    print(f"\nRelatório gravado em '{saida}'.")
+    return relatorio
+
+# =============================================================================
+# 3. COMPARAÇÃO ENTRE RELATÓRIOS
+# =============================================================================
+
+def comparar_relatorios(caminho_base, caminho_novo, limiar=LIMIAR_REGRESSAO):
+    """Imprime a variação de cada medição e retorna a lista de regressões acima do limiar."""
+    with open(caminho_base, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(caminho_novo, encoding="utf-8") as f:
+        novo = json.load(f)
+    print(f"Base: {base.get('versao')} ({base.get('data')})  |  Novo: {novo.get('versao')} ({novo.get('data')})")
+    regressoes = []
+    for escala, dados_novos in novo["escalas"].items():
+        dados_base = base["escalas"].get(escala)
+        if dados_base is None:
+            continue
+        print(f"\n===== Escala '{escala}' =====")
+        medicoes = [("carga (s)", dados_base["carga"]["tempo_s"], dados_novos["carga"]["tempo_s"])]
+        for nome, valores in dados_novos["callbacks"].items():
+            if "erro" in valores:
+                print(f"  {nome}: ERRO {valores['erro']}")
+            elif "mediana_ms" in dados_base["callbacks"].get(nome, {}):
+                medicoes.append((f"{nome} (ms)", dados_base["callbacks"][nome]["mediana_ms"], valores["mediana_ms"]))
+                medicoes.append((f"{nome} (pico MB)", dados_base["callbacks"][nome]["pico_mb"], valores["pico_mb"]))
+        for nome, antes, depois in medicoes:
+            variacao = (depois - antes) / antes if antes else 0.0
+            marca = "  <-- REGRESSÃO" if variacao > limiar else ""
+            print(f"  {nome}: {antes:.2f} -> {depois:.2f} ({variacao:+.0%}){marca}")
+            if marca:
+                regressoes.append((escala, nome, antes, depois))
+    print(f"\n{len(regressoes)} regressão(ões) acima de {limiar:.0%}.")
+    return regressoes
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark dos callbacks do dashboard em bases sintéticas de várias escalas.")
+    parser.add_argument("--escalas", nargs="+", choices=list(ESCALAS), default=list(ESCALAS))
+    parser.add_argument("--saida", default=RELATORIO_PADRAO, help="Arquivo JSON do relatório.")
+    parser.add_argument("--repeticoes", type=int, default=REPETICOES)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--diretorio", default=DIRETORIO_BASES, help="Onde guardar as bases geradas.")
+    parser.add_argument("--reutilizar", action="store_true", help="Reaproveita as bases já geradas.")
+    parser.add_argument("--comparar", nargs=2, metavar=("BASE", "NOVO"), help="Compara dois relatórios em vez de executar o benchmark.")
+    parser.add_argument("--limiar", type=float, default=LIMIAR_REGRESSAO, help="Variação relativa considerada regressão em --comparar.")
+    parser.add_argument("--interno", metavar="RESULTADO", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.interno:
+        with open(args.interno, "w", encoding="utf-8") as f:
+            json.dump(medir_escala(args.repeticoes), f)
+    elif args.comparar:
+        sys.exit(1 if comparar_relatorios(*args.comparar, limiar=args.limiar) else 0)
+    else:
+        executar_benchmark(args.escalas, args.saida, args.repeticoes, args.seed, args.reutilizar, args.diretorio)
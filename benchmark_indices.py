@@ -0,0 +1,145 @@
+import argparse
+import statistics
+import time
+import os
+import pandas as pd
+from sqlalchemy import text
+
+import database
+import migrations
+import populate_data
+import reports
+
+# =============================================================================
+# 0. CONFIGURAÇÕES DO BENCHMARK
+# =============================================================================
+# Compara os planos de execução (EXPLAIN QUERY PLAN) e os tempos das consultas
+# do dashboard e dos relatórios antes e depois das migrações de índices, numa
+# base grande gerada por populate_data.gerar_dados_em_massa.
+
+DB_BENCHMARK = "benchmark_indices.db"
+REPETICOES = 3
+
+CONSULTAS = {
+    "dashboard: query_completa": (reports.QUERY_COMPLETA, {}),
+    "relatório: produtividade": (reports.QUERY_PRODUTIVIDADE, {}),
+    "preços de uma cultura no período": ("""
+        SELECT data, preco_fecho_kg FROM precos_mercado
+        WHERE cultura_nome = :cultura AND data BETWEEN :inicio AND :fim ORDER BY data
+    """, {"cultura": "Soja", "inicio": "2020-01-01", "fim": "2020-12-31"}),
+    "safras de um talhão": ("""
+        SELECT s.id, c.nome, s.data_plantio, s.produtividade_kg_ha FROM safras s
+        JOIN culturas c ON s.cultura_id = c.id WHERE s.talhao_id = :talhao ORDER BY s.data_plantio
+    """, {"talhao": 5000}),
+    "custo das atividades de um talhão": ("""
+        SELECT s.id, SUM(a.custo_total_ha) FROM safras s
+        JOIN atividades_agricolas a ON a.safra_id = s.id WHERE s.talhao_id = :talhao GROUP BY s.id
+    """, {"talhao": 5000}),
+    "contratos de um talhão": ("""
+        SELECT cv.* FROM contratos_venda cv JOIN safras s ON cv.safra_id = s.id WHERE s.talhao_id = :talhao
+    """, {"talhao": 5000}),
+    "última análise de solo antes do plantio": ("""
+        SELECT * FROM analises_solo WHERE talhao_id = :talhao AND data_analise <= :data
+        ORDER BY data_analise DESC LIMIT 1
+    """, {"talhao": 5000, "data": "2021-10-01"}),
+    "área por fazenda": ("""
+        SELECT f.nome, COUNT(t.id), SUM(t.area_ha) FROM fazendas f
+        JOIN talhoes t ON t.fazenda_id = f.id WHERE f.id = :fazenda GROUP BY f.nome
+    """, {"fazenda": 3}),
+    "safras de uma cultura": ("""
+        SELECT s.id, s.produtividade_kg_ha FROM safras s
+        WHERE s.cultura_id = :cultura AND s.produtividade_kg_ha IS NOT NULL
+    """, {"cultura": 1}),
+}
+
+# =============================================================================
+# 1. FUNÇÕES AUXILIARES
+# =============================================================================
+
+def indices_da_migracao():
+    """Nomes dos índices criados pelas migrações (extraídos dos comandos CREATE INDEX)."""
+    nomes = []
+    for _, _, comandos in migrations.MIGRACOES:
+        for comando in comandos:
+            if callable(comando):
+                continue
+            partes = comando.split()
+            if partes[:2] == ["CREATE", "INDEX"]:
+                nomes.append(partes[5] if partes[2:5] == ["IF", "NOT", "EXISTS"] else partes[2])
+    return nomes
+
+def voltar_esquema_original(db_engine):
+    """Remove os índices das migrações e as estatísticas, simulando uma base criada antes delas."""
+    with db_engine.begin() as conn:
+        for nome in indices_da_migracao():
+            conn.execute(text(f"DROP INDEX IF EXISTS {nome}"))
+        conn.execute(text("DROP TABLE IF EXISTS schema_versao"))
+        if conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'")).first():
+            conn.execute(text("DELETE FROM sqlite_stat1"))
+
+def plano_de_execucao(conn, sql, params):
+    linhas = conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"), params).fetchall()
+    return [linha[-1] for linha in linhas]
+
+def medir_consultas(db_engine, repeticoes=REPETICOES):
+    resultados = {}
+    with db_engine.connect() as conn:
+        for nome, (sql, params) in CONSULTAS.items():
+            tempos = []
+            for _ in range(repeticoes):
+                inicio = time.perf_counter()
+                n_linhas = len(conn.execute(text(sql), params).fetchall())
+                tempos.append(time.perf_counter() - inicio)
+            resultados[nome] = {
+                "tempo_ms": statistics.median(tempos) * 1000,
+                "linhas": n_linhas,
+                "plano": plano_de_execucao(conn, sql, params),
+            }
+    return resultados
+
+def imprimir_planos(titulo, resultados):
+    print(f"\n===== {titulo} =====")
+    for nome, r in resultados.items():
+        print(f"\n[{nome}] {r['tempo_ms']:.1f} ms, {r['linhas']} linhas")
+        for passo in r["plano"]:
+            print(f"    {passo}")
+
+# =============================================================================
+# 2. FUNÇÃO PRINCIPAL
+# =============================================================================
+
+def executar_benchmark(caminho_db=DB_BENCHMARK, num_talhoes=populate_data.NUM_TALHOES_MASSA, num_anos=populate_data.NUM_ANOS_SIMULACAO,
+                       seed=42, reutilizar=False, repeticoes=REPETICOES):
+    db_engine = database.criar_engine(f"sqlite:///{caminho_db}")
+    if not (reutilizar and os.path.exists(caminho_db)):
+        print(f"Gerando base de benchmark '{caminho_db}' com {num_talhoes} talhões e {num_anos} anos...")
+        populate_data.gerar_dados_em_massa(db_engine, num_talhoes=num_talhoes, num_anos=num_anos, seed=seed)
+
+    voltar_esquema_original(db_engine)
+    antes = medir_consultas(db_engine, repeticoes)
+    imprimir_planos("ANTES DAS MIGRAÇÕES", antes)
+
+    print()
+    migrations.aplicar_migracoes(db_engine)
+    depois = medir_consultas(db_engine, repeticoes)
+    imprimir_planos("DEPOIS DAS MIGRAÇÕES", depois)
+
+    resumo = pd.DataFrame({
+        "antes_ms": {nome: r["tempo_ms"] for nome, r in antes.items()},
+        "depois_ms": {nome: r["tempo_ms"] for nome, r in depois.items()},
+    })
+    resumo["ganho"] = resumo["antes_ms"] / resumo["depois_ms"]
+    print("\n===== RESUMO (mediana de {} execuções) =====".format(repeticoes))
+    print(resumo.round(2).to_string())
+    return resumo
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark das consultas antes/depois das migrações de índices.")
+    parser.add_argument("--db", default=DB_BENCHMARK, help="Arquivo SQLite usado no benchmark (é recriado, a menos que se use --reutilizar).")
+    parser.add_argument("--talhoes", type=int, default=populate_data.NUM_TALHOES_MASSA)
+    parser.add_argument("--anos", type=int, default=populate_data.NUM_ANOS_SIMULACAO)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--reutilizar", action="store_true", help="Reaproveita a base já gerada em --db.")
+    parser.add_argument("--repeticoes", type=int, default=REPETICOES)
+    args = parser.parse_args()
+    executar_benchmark(args.db, args.talhoes, args.anos, args.seed, args.reutilizar, args.repeticoes)
@@ -0,0 +1,395 @@
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+import numpy as np
+import requests
+
+# =============================================================================
+# 0. CONFIGURAÇÕES DO TESTE DE CARGA
+# =============================================================================
+# Simula vários agrónomos a usar o dashboard ao mesmo tempo. Cada usuário virtual
+# navega pelas páginas do menu lateral, muda filtros, o período do gráfico de risco
+# e os sliders do simulador, enviando a /_dash-update-component os mesmos pedidos
+# que o navegador enviaria (incluindo a consulta periódica das tarefas em segundo plano).
+
+URL_PADRAO = "http://127.0.0.1:8050"
+USUARIOS = 50
+DURACAO_S = 60
+# Tempo médio (distribuição exponencial) entre duas ações de um usuário
+PAUSA_MEDIA_S = 2.0
+# Tempo ao longo do qual os usuários vão entrando
+RAMPA_S = 10
+TIMEOUT_S = 120
+# Pedidos simultâneos por usuário, como o limite de conexões por servidor dos navegadores
+CONEXOES_POR_USUARIO = 6
+
+ROTA_CALLBACKS = "/_dash-update-component"
+
+# A sincronização dropdown -> store dos filtros é feita no navegador (callback clientside):
+# o usuário virtual altera diretamente o store, e só os callbacks do servidor geram pedidos.
+FILTROS = {
+    "filtro-ano": "filtro-ano-store",
+    "filtro-season": "filtro-season-store",
+    "filtro-fazenda": "filtro-fazenda-store",
+    "filtro-cultura": "filtro-cultura-store",
+}
+DATE_PICKER_RISCO = "date-picker-risco"
+
+# Peso de cada ação na sessão simulada
+ACOES = {"navegar": 4, "filtro": 3, "periodo_risco": 2, "slider": 2}
+
+# =============================================================================
+# 1. LAYOUT E DEPENDÊNCIAS DO APP
+# =============================================================================
+
+def percorrer_componentes(arvore, encontrados):
+    """Acrescenta a `encontrados` {id: componente} de todos os componentes com id de uma árvore do layout."""
+    if isinstance(arvore, list):
+        for item in arvore:
+            percorrer_componentes(item, encontrados)
+    elif isinstance(arvore, dict):
+        props = arvore.get("props")
+        if isinstance(props, dict) and "type" in arvore:
+            if isinstance(props.get("id"), str):
+                encontrados[props["id"]] = arvore
+            for valor in props.values():
+                percorrer_componentes(valor, encontrados)
+    return encontrados
+
+def percorrer_links(arvore):
+    """Destinos internos (href começado por '/') dos links de uma árvore do layout."""
+    if isinstance(arvore, list):
+        for item in arvore:
+            yield from percorrer_links(item)
+    elif isinstance(arvore, dict) and isinstance(arvore.get("props"), dict):
+        if str(arvore["props"].get("href", "")).startswith("/"):
+            yield arvore["props"]["href"]
+        for valor in arvore["props"].values():
+            yield from percorrer_links(valor)
+
+def _separar(chave):
+    identificador, propriedade = chave.rsplit(".", 1)
+    return identificador, propriedade
+
+class AppDash:
+    """Layout inicial, páginas do menu e callbacks do servidor, lidos uma vez das rotas do Dash."""
+
+    def __init__(self, url, timeout=TIMEOUT_S):
+        self.url = url.rstrip("/")
+        layout = requests.get(f"{self.url}/_dash-layout", timeout=timeout).json()
+        self.componentes = percorrer_componentes(layout, {})
+        # Páginas do menu lateral
+        self.paginas = sorted(set(percorrer_links(layout)))
+        self.dependencias = []
+        for dep in requests.get(f"{self.url}/_dash-dependencies", timeout=timeout).json():
+            # Callbacks clientside não chegam ao servidor; os de ids com padrão (ALL/MATCH) ficam de fora
+            if dep.get("clientside_function") or "{" in dep["output"] or any(isinstance(i["id"], dict) or i["id"].startswith("{") for i in dep["inputs"]):
+                continue
+            saidas = [_separar(s) for s in dep["output"].strip(".").split("...")] if dep["output"].startswith("..") else [_separar(dep["output"].split("@")[0])]
+            self.dependencias.append({
+                "chave": dep["output"],
+                "nome": saidas[0][0],
+                "multi": dep["output"].startswith(".."),
+                "saidas": saidas,
+                "entradas": [(i["id"], i["property"]) for i in dep["inputs"]],
+                "estados": [(e["id"], e["property"]) for e in dep["state"]],
+                "inicial": not dep.get("prevent_initial_call"),
+                "background": dep.get("background"),
+            })
+
+# =============================================================================
+# 2. ESTATÍSTICAS
+# =============================================================================
+
+class Estatisticas:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencias = {}
+        self.erros = {}
+
+    def registrar(self, nome, segundos, erro=None):
+        with self._lock:
+            if erro is None:
+                self.latencias.setdefault(nome, []).append(segundos)
+            else:
+                self.erros.setdefault(nome, []).append(erro)
+
+    def relatorio(self, duracao_s):
+        nomes = sorted(set(self.latencias) | set(self.erros))
+        linhas = {}
+        for nome in nomes:
+            tempos = np.array(self.latencias.get(nome, [])) * 1000
+            linhas[nome] = {
+                "pedidos": len(tempos),
+                "erros": len(self.erros.get(nome, [])),
+                "exemplos_erros": sorted(set(self.erros.get(nome, [])))[:3],
+                "por_segundo": round(len(tempos) / duracao_s, 2),
+                **({f"p{p}_ms": round(float(np.percentile(tempos, p)), 1) for p in (50, 95, 99)} if len(tempos) else {}),
+            }
+        total = sum(len(t) for t in self.latencias.values())
+        return {"duracao_s": round(duracao_s, 1), "callbacks_por_segundo": round(total / duracao_s, 2),
+                "total": total, "erros": sum(len(e) for e in self.erros.values()), "callbacks": linhas}
+
+# =============================================================================
+# 3. USUÁRIO VIRTUAL
+# =============================================================================
+
+class UsuarioVirtual:
+    """Mantém o estado dos componentes como o navegador e dispara os callbacks afetados por cada ação."""
+
+    def __init__(self, app, estatisticas, rng, timeout=TIMEOUT_S):
+        self.app = app
+        self.estatisticas = estatisticas
+        self.rng = rng
+        self.timeout = timeout
+        self.http = requests.Session()
+        self.valores = {}
+        self.presentes = set()
+        self.sliders = set()
+        # Ids criados pelo `children` de cada contentor, para removê-los quando o conteúdo é trocado
+        self.filhos = {}
+        self._lock = threading.Lock()
+        self._registrar_componentes(app.componentes)
+
+    def _registrar_componentes(self, componentes):
+        with self._lock:
+            for identificador, componente in componentes.items():
+                self.presentes.add(identificador)
+                if componente["type"] == "Slider":
+                    self.sliders.add(identificador)
+                for propriedade, valor in componente["props"].items():
+                    if propriedade != "children":
+                        self.valores[(identificador, propriedade)] = valor
+
+    def _corpo(self, dep, alterados):
+        with self._lock:
+            saidas = [{"id": i, "property": p} for i, p in dep["saidas"]]
+            return {
+                "output": dep["chave"],
+                "outputs": saidas if dep["multi"] else saidas[0],
+                "inputs": [{"id": i, "property": p, "value": self.valores.get((i, p))} for i, p in dep["entradas"]],
+                "state": [{"id": i, "property": p, "value": self.valores.get((i, p))} for i, p in dep["estados"]],
+                "changedPropIds": [f"{i}.{p}" for i, p in dep["entradas"] if (i, p) in alterados],
+            }
+
+    def _post(self, url, corpo, **kwargs):
+        try:
+            return self.http.post(url, json=corpo, timeout=self.timeout, **kwargs)
+        except requests.ConnectionError:
+            # Conexão keep-alive fechada pelo servidor: o navegador repete o pedido numa conexão nova
+            return self.http.post(url, json=corpo, timeout=self.timeout, **kwargs)
+
+    def _executar(self, dep, alterados):
+        """Envia o pedido (e as consultas da tarefa, se for em segundo plano) e devolve as props alteradas."""
+        corpo = self._corpo(dep, alterados)
+        url = f"{self.app.url}{ROTA_CALLBACKS}"
+        inicio = time.perf_counter()
+        try:
+            resposta = self._post(url, corpo)
+            if resposta.status_code == 204:
+                self.estatisticas.registrar(dep["nome"], time.perf_counter() - inicio)
+                return {}
+            resposta.raise_for_status()
+            dados = resposta.json()
+            if dep["background"]:
+                intervalo = dep["background"].get("interval", 1000) / 1000
+                parametros = {"cacheKey": dados["cacheKey"], "job": dados["job"]}
+                while "response" not in dados:
+                    if time.perf_counter() - inicio > self.timeout:
+                        raise TimeoutError("tarefa em segundo plano não terminou")
+                    time.sleep(intervalo)
+                    resposta = self._post(url, corpo, params=parametros)
+                    resposta.raise_for_status()
+                    dados = resposta.json() if resposta.status_code != 204 else {}
+        except (requests.RequestException, ValueError, KeyError, TimeoutError) as e:
+            self.estatisticas.registrar(dep["nome"], time.perf_counter() - inicio, erro=str(e))
+            return {}
+        self.estatisticas.registrar(dep["nome"], time.perf_counter() - inicio)
+
+        alteradas = {}
+        for identificador, props in dados.get("response", {}).items():
+            for propriedade, valor in props.items():
+                alteradas[(identificador, propriedade)] = valor
+                if propriedade == "children":
+                    componentes = percorrer_componentes(valor, {})
+                    with self._lock:
+                        self.presentes -= self.filhos.get(identificador, set())
+                        self.filhos[identificador] = set(componentes)
+                    self._registrar_componentes(componentes)
+        with self._lock:
+            self.valores.update({k: v for k, v in alteradas.items() if k[1] != "children"})
+        return alteradas
+
+    def disparar(self, alterados, novos_ids=frozenset(), profundidade=3):
+        """Executa os callbacks afetados por `alterados` e os iniciais dos componentes novos, em cadeia."""
+        with self._lock:
+            presentes = set(self.presentes)
+        afetados = [dep for dep in self.app.dependencias
+                    if all(i in presentes for i, _ in dep["entradas"])
+                    and (any(e in alterados for e in dep["entradas"])
+                         or (dep["inicial"] and any(i in novos_ids for i, _ in dep["entradas"])))]
+        if not afetados or profundidade == 0:
+            return
+        with ThreadPoolExecutor(CONEXOES_POR_USUARIO) as executor:
+            respostas = list(executor.map(lambda dep: self._executar(dep, alterados), afetados))
+        seguintes = {}
+        for alteradas in respostas:
+            seguintes.update(alteradas)
+        with self._lock:
+            novos = self.presentes - presentes
+        self.disparar(set(seguintes), frozenset(novos), profundidade - 1)
+
+    # --- Ações ---
+    def navegar(self, pagina=None):
+        pagina = pagina or self.rng.choice(self.app.paginas)
+        with self._lock:
+            self.valores[("url", "pathname")] = pagina
+        self.disparar({("url", "pathname")})
+        return f"navegar {pagina}"
+
+    def mudar_filtro(self):
+        opcoes = [(filtro, store) for filtro, store in FILTROS.items() if filtro in self.presentes]
+        if not opcoes:
+            return None
+        filtro, store = self.rng.choice(opcoes)
+        valores = [o["value"] for o in self.valores.get((filtro, "options")) or [] if isinstance(o, dict)] or ["todos"]
+        valor = self.rng.choice(valores)
+        # Equivalente ao callback clientside: 'todas' dos dropdowns e None viram 'todos' no store
+        valor = "todos" if valor in (None, "todas") else valor
+        with self._lock:
+            self.valores[(filtro, "value")] = valor
+            self.valores[(store, "data")] = valor
+        self.disparar({(store, "data")})
+        return f"filtro {filtro}={valor}"
+
+    def mudar_periodo_risco(self):
+        if DATE_PICKER_RISCO not in self.presentes:
+            return None
+        minimo = date.fromisoformat(str(self.valores.get((DATE_PICKER_RISCO, "min_date_allowed")))[:10])
+        maximo = date.fromisoformat(str(self.valores.get((DATE_PICKER_RISCO, "max_date_allowed")))[:10])
+        dias = max((maximo - minimo).days, 1)
+        duracao = self.rng.randint(min(90, dias), min(730, dias))
+        inicio = minimo + timedelta(days=self.rng.randint(0, dias - duracao))
+        with self._lock:
+            self.valores[(DATE_PICKER_RISCO, "start_date")] = inicio.isoformat()
+            self.valores[(DATE_PICKER_RISCO, "end_date")] = (inicio + timedelta(days=duracao)).isoformat()
+        self.disparar({(DATE_PICKER_RISCO, "start_date"), (DATE_PICKER_RISCO, "end_date")})
+        return f"período risco {duracao} dias"
+
+    def arrastar_slider(self):
+        sliders = sorted(self.sliders & self.presentes)
+        if not sliders:
+            return None
+        slider = self.rng.choice(sliders)
+        minimo, maximo = float(self.valores[(slider, "min")]), float(self.valores[(slider, "max")])
+        passo = float(self.valores.get((slider, "step")) or (maximo - minimo) / 100)
+        # Vários ajustes seguidos no mesmo slider: cada vez que é solto gera um pedido
+        for _ in range(self.rng.randint(2, 5)):
+            atual = float(self.valores.get((slider, "value")) or minimo)
+            novo = min(max(atual + passo * self.rng.randint(-5, 5), minimo), maximo)
+            with self._lock:
+                self.valores[(slider, "value")] = novo
+            self.disparar({(slider, "value")})
+            time.sleep(self.rng.uniform(0.1, 0.5))
+        return f"slider {slider}"
+
+    def sessao(self, ate, pausa_media_s=PAUSA_MEDIA_S):
+        acoes = {"navegar": self.navegar, "filtro": self.mudar_filtro, "periodo_risco": self.mudar_periodo_risco, "slider": self.arrastar_slider}
+        self.navegar("/")
+        while time.monotonic() < ate:
+            time.sleep(self.rng.expovariate(1 / pausa_media_s) if pausa_media_s > 0 else 0)
+            nome = self.rng.choices(list(ACOES), weights=list(ACOES.values()))[0]
+            # Ações que não se aplicam à página atual viram uma navegação
+            if acoes[nome]() is None:
+                self.navegar()
+
+# =============================================================================
+# 4. EXECUÇÃO DO TESTE
+# =============================================================================
+
+def iniciar_servidor(porta, workers, threads, timeout=TIMEOUT_S):
+    """Inicia o dashboard com o gunicorn e espera que as rotas do Dash respondam."""
+    comando = [sys.executable, "-m", "gunicorn", "dashboard:server", "-w", str(workers), "--threads", str(threads),
+               "-b", f"127.0.0.1:{porta}", "--timeout", str(timeout)]
+    print(f"Iniciando servidor: {' '.join(comando[2:])}")
+    processo = subprocess.Popen(comando, cwd=os.path.dirname(os.path.abspath(__file__)))
+    url = f"http://127.0.0.1:{porta}"
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        if processo.poll() is not None:
+            raise RuntimeError(f"O servidor terminou com código {processo.returncode}.")
+        try:
+            if requests.get(f"{url}/_dash-dependencies", timeout=5).ok:
+                return processo, url
+        except requests.RequestException:
+            pass
+        time.sleep(1)
+    processo.terminate()
+    raise RuntimeError(f"O servidor não respondeu em {timeout} s.")
+
+def executar_carga(url, usuarios=USUARIOS, duracao_s=DURACAO_S, pausa_media_s=PAUSA_MEDIA_S, rampa_s=RAMPA_S, seed=42, timeout=TIMEOUT_S):
+    app = AppDash(url)
+    print(f"{len(app.dependencias)} callbacks do servidor, {len(app.paginas)} páginas: {', '.join(app.paginas)}")
+    estatisticas = Estatisticas()
+    inicio = time.monotonic()
+    ate = inicio + rampa_s + duracao_s
+
+    def usuario(n):
+        time.sleep(rampa_s * n / max(usuarios, 1))
+        try:
+            UsuarioVirtual(app, estatisticas, random.Random(seed + n), timeout).sessao(ate, pausa_media_s)
+        except Exception as e:
+            print(f"Usuário {n} interrompido: {e}")
+
+    threads = [threading.Thread(target=usuario, args=(n,), daemon=True) for n in range(usuarios)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return estatisticas.relatorio(time.monotonic() - inicio)
+
+def imprimir_relatorio(relatorio):
+    print(f"\n===== {relatorio['total']} callbacks em {relatorio['duracao_s']} s: "
+          f"{relatorio['callbacks_por_segundo']} /s, {relatorio['erros']} erro(s) =====")
+    print(f"{'callback (1ª saída)':<34}{'pedidos':>9}{'erros':>7}{'/s':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for nome, linha in sorted(relatorio["callbacks"].items(), key=lambda item: -item[1].get("p95_ms", 0)):
+        print(f"{nome:<34}{linha['pedidos']:>9}{linha['erros']:>7}{linha['por_segundo']:>8}"
+              f"{linha.get('p50_ms', '-'):>10}{linha.get('p95_ms', '-'):>10}{linha.get('p99_ms', '-'):>10}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Teste de carga do dashboard com usuários simultâneos.")
+    parser.add_argument("--url", default=URL_PADRAO, help="Endereço do dashboard (ignorado com --iniciar).")
+    parser.add_argument("--usuarios", type=int, default=USUARIOS)
+    parser.add_argument("--duracao", type=float, default=DURACAO_S, help="Segundos de carga depois da rampa.")
+    parser.add_argument("--rampa", type=float, default=RAMPA_S, help="Segundos até todos os usuários entrarem.")
+    parser.add_argument("--pausa", type=float, default=PAUSA_MEDIA_S, help="Pausa média entre ações de um usuário.")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--iniciar", action="store_true", help="Inicia o dashboard com o gunicorn durante o teste.")
+    parser.add_argument("--workers", type=int, default=4, help="Workers do gunicorn (com --iniciar).")
+    parser.add_argument("--threads", type=int, default=2, help="Threads por worker do gunicorn (com --iniciar).")
+    parser.add_argument("--porta", type=int, default=8050, help="Porta do servidor (com --iniciar).")
+    parser.add_argument("--timeout", type=float, default=TIMEOUT_S, help="Tempo máximo de um callback, incluindo tarefas em segundo plano.")
+    parser.add_argument("--saida", help="Grava o relatório em JSON.")
+    args = parser.parse_args()
+
+    servidor, url = iniciar_servidor(args.porta, args.workers, args.threads, int(args.timeout)) if args.iniciar else (None, args.url)
+    try:
+        relatorio = executar_carga(url, args.usuarios, args.duracao, args.pausa, args.rampa, args.seed, args.timeout)
+    finally:
+        if servidor is not None:
+            servidor.terminate()
+            servidor.wait()
+    if args.iniciar:
+        relatorio["servidor"] = {"workers": args.workers, "threads": args.threads}
+    imprimir_relatorio(relatorio)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(relatorio, f, ensure_ascii=False, indent=2)
+        print(f"\nRelatório gravado em '{args.saida}'.")
@@ -0,0 +1,162 @@
+import pandas as pd
+
+import armazenamento_clima
+import database
+import reports
+import resumo_safras
+
+# =============================================================================
+# 0. CONFIGURAÇÕES
+# =============================================================================
+
+PRECOS_VENDA = resumo_safras.PRECOS_VENDA
+
+# Tabelas que o dashboard carrega da base e dos arquivos de clima, na ordem em que são montadas
+TABELAS = ['df_completo', 'df_vendas', 'df_agricola', 'df_precos_mercado', 'df_clima', 'df_clima_anual_geral']
+
+def _season(datas):
+    return datas.dt.month.apply(lambda x: 'Season A (Safrinha)' if x <= 6 else 'Season B (Verão)')
+
+# =============================================================================
+# 1. ATIVIDADES, VENDAS E INDICADORES POR SAFRA
+# =============================================================================
+
+def carregar_df_completo(engine):
+    df_completo = pd.read_sql(reports.QUERY_COMPLETA, engine)
+    for col in ['data_plantio', 'data_colheita_real', 'data_execucao']:
+        df_completo[col] = pd.to_datetime(df_completo[col], errors='coerce')
+    df_completo['season'] = _season(df_completo['data_plantio'])
+    df_completo['ano_safra_num'] = df_completo['data_plantio'].dt.year
+    return df_completo
+
+def carregar_df_vendas(engine):
+    try:
+        df_vendas = pd.read_sql("SELECT * FROM contratos_venda", engine)
+        df_vendas['data_venda'] = pd.to_datetime(df_vendas['data_venda'])
+    except Exception:
+        df_vendas = pd.DataFrame()
+    return df_vendas
+
+def carregar_df_agricola_resumo(df_completo, engine):
+    """
+    Indicadores por safra lidos de safra_resumo; None se a tabela não existir ou estiver desatualizada.
+
+    O resumo é considerado desatualizado quando o estado gravado com ele (contagem e maior
+    id das tabelas de origem, ver resumo_safras.resumo_atualizado) difere do banco, ou
+    quando as safras resumidas não são as do banco.
+    """
+    try:
+        with engine.connect() as conn:
+            if not resumo_safras.resumo_atualizado(conn):
+                return None
+        df = pd.read_sql(reports.QUERY_SAFRAS_RESUMO, engine)
+    except Exception:
+        return None
+    if df.empty or set(df['safra_id']) != set(df_completo['safra_id']):
+        return None
+    for col in ['data_plantio', 'data_colheita_real', 'data_analise']:
+        df[col] = pd.to_datetime(df[col], errors='coerce')
+    df['season'] = _season(df['data_plantio'])
+    df['ano_safra_num'] = df['data_plantio'].dt.year
+    return df
+
+def calcular_df_agricola(df_completo, df_vendas, engine):
+    """Cálculo completo a partir das atividades, contratos, análises de solo e ONI (sem safra_resumo)."""
+    custo_por_safra = df_completo.groupby('safra_id')['custo_total_ha'].sum().reset_index().rename(columns={'custo_total_ha': 'custo_total_safra_ha'})
+    df_agricola = pd.merge(df_completo.drop_duplicates(subset=['safra_id']), custo_por_safra, on='safra_id', how='left')
+    df_agricola['receita_ha_potencial'] = df_agricola['produtividade_kg_ha'] * df_agricola['cultura'].map(PRECOS_VENDA)
+    df_agricola['lucro_ha_potencial'] = df_agricola['receita_ha_potencial'] - df_agricola['custo_total_safra_ha']
+
+    if not df_vendas.empty:
+        df_agricola_vendas = pd.merge(df_agricola, df_vendas[['safra_id', 'preco_venda_kg', 'quantidade_kg']], on='safra_id', how='left')
+        df_agricola_vendas['receita_realizada_ha'] = (df_agricola_vendas['quantidade_kg'] * df_agricola_vendas['preco_venda_kg']) / df_agricola_vendas['area_ha']
+        df_agricola_vendas['lucro_realizado_ha'] = df_agricola_vendas['receita_realizada_ha'] - df_agricola_vendas['custo_total_safra_ha']
+        df_agricola['lucro_ha'] = df_agricola_vendas['lucro_realizado_ha'].fillna(df_agricola['lucro_ha_potencial'])
+    else:
+        df_agricola['lucro_ha'] = df_agricola['lucro_ha_potencial']
+
+    try:
+        df_solo_raw = pd.read_sql("SELECT * FROM analises_solo", engine)
+        df_solo_raw['data_analise'] = pd.to_datetime(df_solo_raw['data_analise'])
+        df_agricola_sorted = df_agricola.sort_values('data_plantio')
+        df_solo_sorted = df_solo_raw.sort_values('data_analise')
+        df_agricola = pd.merge_asof(
+            df_agricola_sorted, df_solo_sorted,
+            left_on='data_plantio', right_on='data_analise',
+            by='talhao_id', direction='backward'
+        )
+    except Exception as e:
+        pass
+
+    try:
+        df_oni = pd.read_csv('oni_data.csv')
+        df_agricola['ano'] = df_agricola['data_plantio'].dt.year
+        df_agricola['mes'] = df_agricola['data_plantio'].dt.month
+        df_agricola = pd.merge(df_agricola, df_oni, on=['ano', 'mes'], how='left')
+        df_agricola.drop(columns=['ano', 'mes'], inplace=True)
+        print("Dados de ENOS (El Niño/La Niña) integrados com sucesso.")
+    except FileNotFoundError:
+        print("Aviso: Arquivo oni_data.csv não encontrado.")
+        df_agricola['fase_enos'] = 'Não Disponível'
+    return df_agricola
+
+def carregar_df_agricola(df_completo, df_vendas, engine):
+    df_agricola = carregar_df_agricola_resumo(df_completo, engine)
+    if df_agricola is not None:
+        print("Indicadores por safra carregados da tabela safra_resumo.")
+    else:
+        print("Aviso: tabela safra_resumo ausente ou desatualizada (execute 'python resumo_safras.py'). Calculando a partir das atividades.")
+        df_agricola = calcular_df_agricola(df_completo, df_vendas, engine)
+    df_agricola['ano_safra'] = df_agricola['ano_safra_num'].astype(str)
+    return df_agricola
+
+# =============================================================================
+# 2. PREÇOS DE MERCADO E CLIMA
+# =============================================================================
+
+def carregar_df_precos_mercado(engine):
+    try:
+        df_precos_mercado = pd.read_sql("SELECT * FROM precos_mercado", engine)
+        df_precos_mercado['data'] = pd.to_datetime(df_precos_mercado['data'])
+    except Exception as e:
+        df_precos_mercado = pd.DataFrame()
+    return df_precos_mercado
+
+def carregar_df_clima():
+    """Dados horários do INMET e o resumo anual; DataFrames vazios se não houver dados."""
+    try:
+        if armazenamento_clima.estacao_disponivel(armazenamento_clima.ESTACAO_INMET):
+            df_clima = armazenamento_clima.read_range(armazenamento_clima.ESTACAO_INMET, columns=['PRECIPITACAO_TOTAL_HORARIO_mm', 'TEMPERATURA_AR_BULBO_SECO_HORARIA_C'])
+            print("Dados climáticos do INMET carregados do armazenamento particionado.")
+        else:
+            df_clima = pd.read_csv('Dados_Climaticos_INMET.csv')
+            print("Dados de 'Dados_Climaticos_INMET.csv' carregados com sucesso.")
+        df_clima.rename(columns={'PRECIPITACAO_TOTAL_HORARIO_mm': 'precipitacao_mm', 'TEMPERATURA_AR_BULBO_SECO_HORARIA_C': 'temperatura_c'}, inplace=True)
+        df_clima['DATETIME'] = pd.to_datetime(df_clima['DATETIME'])
+        df_clima['ano'] = df_clima['DATETIME'].dt.year
+        df_clima['mes'] = df_clima['DATETIME'].dt.month
+        df_clima_anual_geral = df_clima.groupby('ano').agg(precipitacao_mm=('precipitacao_mm', 'sum'), temp_max=('temperatura_c', 'max'), temp_min=('temperatura_c', 'min'), temp_media=('temperatura_c', 'mean')).reset_index()
+    except Exception as e:
+        print(f"Aviso: Não foi possível carregar 'Dados_Climaticos_INMET.csv'. Erro: {e}")
+        df_clima = pd.DataFrame()
+        df_clima_anual_geral = pd.DataFrame()
+    return df_clima, df_clima_anual_geral
+
+# =============================================================================
+# 3. CARREGAMENTO COMPLETO
+# =============================================================================
+
+def carregar(engine=None):
+    """Monta todas as tabelas do dashboard; retorna {nome: DataFrame} com as chaves de TABELAS."""
+    engine = engine or database.engine
+    df_completo = carregar_df_completo(engine)
+    df_vendas = carregar_df_vendas(engine)
+    df_clima, df_clima_anual_geral = carregar_df_clima()
+    return {
+        'df_completo': df_completo,
+        'df_vendas': df_vendas,
+        'df_agricola': carregar_df_agricola(df_completo, df_vendas, engine),
+        'df_precos_mercado': carregar_df_precos_mercado(engine),
+        'df_clima': df_clima,
+        'df_clima_anual_geral': df_clima_anual_geral,
+    }
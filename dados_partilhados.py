@@ -0,0 +1,94 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import pandas as pd
+import pyarrow as pa
+
+# =============================================================================
+# 0. CONFIGURAÇÕES
+# =============================================================================
+
+# Com DASH_DADOS_PARTILHADOS=1 (ligado pelo gunicorn.conf.py) as tabelas do dashboard
+# são montadas uma única vez por um processo carregador e gravadas como arquivos Arrow
+# IPC; cada worker mapeia esses arquivos em memória (mmap) em vez de refazer as
+# consultas e guardar cópias próprias. As páginas mapeadas são partilhadas por todos os
+# workers, de modo que a memória total deixa de crescer com o número de workers.
+DADOS_PARTILHADOS = os.getenv("DASH_DADOS_PARTILHADOS", "0") == "1"
+# Em /dev/shm (tmpfs) os arquivos ficam em memória partilhada, sem ida ao disco
+DIRETORIO_DADOS = os.getenv("DASH_DADOS_DIR", os.path.join("/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(), "dashboard_agricola"))
+# Gravado por último: a sua presença indica que a publicação está completa
+MANIFESTO = "tabelas.json"
+
+# Texto em colunas de strings do Arrow (sem cópia), com NaN e resultados booleanos do numpy
+TIPO_TEXTO = pd.StringDtype("pyarrow", na_value=float("nan"))
+
+def _mapear_tipo(tipo):
+    return TIPO_TEXTO if tipo in (pa.string(), pa.large_string()) else None
+
+# =============================================================================
+# 1. PUBLICAÇÃO E MAPEAMENTO
+# =============================================================================
+
+def publicar(tabelas, diretorio=DIRETORIO_DADOS):
+    """Grava {nome: DataFrame} como arquivos Arrow IPC sem compressão, para poderem ser mapeados."""
+    os.makedirs(diretorio, exist_ok=True)
+    caminho_manifesto = os.path.join(diretorio, MANIFESTO)
+    if os.path.exists(caminho_manifesto):
+        os.remove(caminho_manifesto)
+    for nome, df in tabelas.items():
+        tabela = pa.Table.from_pandas(df, preserve_index=None)
+        caminho = os.path.join(diretorio, f"{nome}.arrow")
+        with pa.OSFile(f"{caminho}.tmp", "wb") as arquivo, pa.ipc.new_file(arquivo, tabela.schema) as escritor:
+            escritor.write_table(tabela)
+        os.replace(f"{caminho}.tmp", caminho)
+    with open(caminho_manifesto, "w", encoding="utf-8") as f:
+        json.dump({"tabelas": list(tabelas), "pid": os.getpid()}, f)
+
+def mapear(diretorio=DIRETORIO_DADOS):
+    """
+    Abre as tabelas publicadas sem copiá-las: {nome: DataFrame}, ou None se não houver publicação.
+
+    As colunas numéricas sem nulos e as de texto apontam diretamente para o arquivo
+    mapeado e são só de leitura; datas e colunas com nulos são convertidas para o
+    formato do pandas no próprio worker.
+    """
+    caminho_manifesto = os.path.join(diretorio, MANIFESTO)
+    if not os.path.exists(caminho_manifesto):
+        return None
+    with open(caminho_manifesto, encoding="utf-8") as f:
+        nomes = json.load(f)["tabelas"]
+    tabelas = {}
+    for nome in nomes:
+        tabela = pa.ipc.open_file(pa.memory_map(os.path.join(diretorio, f"{nome}.arrow"), "r")).read_all()
+        tabelas[nome] = tabela.to_pandas(split_blocks=True, types_mapper=_mapear_tipo)
+    return tabelas
+
+def remover(diretorio=DIRETORIO_DADOS):
+    shutil.rmtree(diretorio, ignore_errors=True)
+
+# =============================================================================
+# 2. USO PELO DASHBOARD E PELO SERVIDOR
+# =============================================================================
+
+def obter(carregar, ativo=DADOS_PARTILHADOS, diretorio=DIRETORIO_DADOS):
+    """Tabelas mapeadas da publicação, se o modo partilhado estiver ligado; senão (ou sem publicação), `carregar()`."""
+    if ativo:
+        tabelas = mapear(diretorio)
+        if tabelas is not None:
+            print(f"Tabelas do dashboard mapeadas de '{diretorio}' (memória partilhada).")
+            return tabelas
+        print(f"Aviso: nenhuma publicação em '{diretorio}' (execute 'python dados_partilhados.py'). Carregando as tabelas neste processo.")
+    return carregar()
+
+def publicar_em_processo_separado(diretorio=DIRETORIO_DADOS):
+    """Monta e publica as tabelas num processo à parte, que termina e devolve a sua memória ao sistema."""
+    ambiente = {**os.environ, "DASH_DADOS_DIR": diretorio}
+    subprocess.run([sys.executable, os.path.abspath(__file__)], env=ambiente, check=True)
+
+if __name__ == "__main__":
+    import dados_dashboard
+    publicar(dados_dashboard.carregar())
+    print(f"Tabelas {', '.join(dados_dashboard.TABELAS)} publicadas em '{DIRETORIO_DADOS}'.")
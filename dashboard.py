@@ -1,26 +1,40 @@
 import dash
-from dash import dcc, html, dash_table, ctx
+from dash import dcc, html, dash_table, ctx, Patch
 from dash.dependencies import Input, Output, State, ALL
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import pandas as pd
-from sqlalchemy import create_engine
 import numpy as np
 from datetime import datetime, timedelta
 from dateutil.relativedelta import relativedelta
-import requests
 import dash_bootstrap_components as dbc
 import re
+from functools import lru_cache
 import joblib
 
+import amostragem
+import estatisticas_box
+import dados_dashboard
+import dados_partilhados
+import database
+import resumo_safras
+import servico_clima
+import historico_chat
+import indice_talhoes
+import ranking_talhoes
+import regressao
+import instrumentacao
+import tarefas_segundo_plano
+
 # =============================================================================
 # 0. CONFIGURAÇÕES GLOBAIS E CARREGAMENTO DE MODELOS
 # =============================================================================
 
 # --- Carregar o modelo de ML de Produtividade ---
 try:
-    modelo_produtividade = joblib.load('yield_prediction_model.joblib')
+    # No modo partilhado os arrays do modelo (se gravado sem compressão) são mapeados do arquivo
+    modelo_produtividade = joblib.load('yield_prediction_model.joblib', mmap_mode='r' if dados_partilhados.DADOS_PARTILHADOS else None)
     df_ml_dataset = pd.read_csv('ml_dataset_produtividade.csv')
     print("Modelo de previsão de produtividade carregado com sucesso.")
 except FileNotFoundError:
@@ -38,108 +52,38 @@ except FileNotFoundError:
     print("AVISO: Arquivo 'previsao_precos_mercado.csv' não encontrado. As previsões de preço não estarão disponíveis.")
 
 
-OPENWEATHER_API_KEY = "cd679ff6e2bb5bc8b49cb85755d617f4"
 DEFAULT_LATITUDE = -13.05
 DEFAULT_LONGITUDE = -55.9
 DEFAULT_CITY_NAME = "Lucas do Rio Verde, BR"
 
-PRECOS_VENDA = {
-    "Soja": 1.10,
-    "Milho": 0.85,
-    "Algodão": 8.50
-}
+PRECOS_VENDA = resumo_safras.PRECOS_VENDA
 
 # =============================================================================
 # 1. CARREGAMENTO E PREPARAÇÃO DOS DADOS
 # =============================================================================
 
-engine = create_engine("sqlite:///gestao_agricola.db")
-query_completa = """
-SELECT
-    f.nome as fazenda, t.id as talhao_id, t.identificador as talhao, t.area_ha, s.id as safra_id,
-    s.data_plantio, s.data_colheita_real, s.produtividade_kg_ha, c.nome as cultura,
-    a.tipo_atividade, a.produto_utilizado, a.quantidade_aplicada_ha, a.unidade,
-    a.data_execucao, a.custo_total_ha, a.operador, m.nome as maquina
-FROM fazendas f
-JOIN talhoes t ON f.id = t.fazenda_id
-JOIN safras s ON t.id = s.talhao_id
-JOIN culturas c ON s.cultura_id = c.id
-LEFT JOIN atividades_agricolas a ON s.id = a.safra_id
-LEFT JOIN maquinas m ON a.maquina_id = m.id
-WHERE s.produtividade_kg_ha IS NOT NULL ORDER BY t.identificador, s.data_plantio;
-"""
-df_completo = pd.read_sql(query_completa, engine)
-for col in ['data_plantio', 'data_colheita_real', 'data_execucao']:
-    df_completo[col] = pd.to_datetime(df_completo[col], errors='coerce')
-df_completo['season'] = df_completo['data_plantio'].dt.month.apply(lambda x: 'Season A (Safrinha)' if x <= 6 else 'Season B (Verão)')
-df_completo['ano_safra_num'] = df_completo['data_plantio'].dt.year
-
-custo_por_safra = df_completo.groupby('safra_id')['custo_total_ha'].sum().reset_index().rename(columns={'custo_total_ha': 'custo_total_safra_ha'})
-df_agricola = pd.merge(df_completo.drop_duplicates(subset=['safra_id']), custo_por_safra, on='safra_id', how='left')
-df_agricola['receita_ha_potencial'] = df_agricola['produtividade_kg_ha'] * df_agricola['cultura'].map(PRECOS_VENDA)
-df_agricola['lucro_ha_potencial'] = df_agricola['receita_ha_potencial'] - df_agricola['custo_total_safra_ha']
-
-try:
-    df_vendas = pd.read_sql("SELECT * FROM contratos_venda", engine)
-    df_vendas['data_venda'] = pd.to_datetime(df_vendas['data_venda'])
-    df_agricola_vendas = pd.merge(df_agricola, df_vendas[['safra_id', 'preco_venda_kg', 'quantidade_kg']], on='safra_id', how='left')
-    df_agricola_vendas['receita_realizada_ha'] = (df_agricola_vendas['quantidade_kg'] * df_agricola_vendas['preco_venda_kg']) / df_agricola_vendas['area_ha']
-    df_agricola_vendas['lucro_realizado_ha'] = df_agricola_vendas['receita_realizada_ha'] - df_agricola_vendas['custo_total_safra_ha']
-    df_agricola['lucro_ha'] = df_agricola_vendas['lucro_realizado_ha'].fillna(df_agricola['lucro_ha_potencial'])
-except Exception:
-    df_agricola['lucro_ha'] = df_agricola['lucro_ha_potencial']
-    df_vendas = pd.DataFrame()
-
-df_agricola['ano_safra'] = df_agricola['ano_safra_num'].astype(str)
-
-try:
-    df_precos_mercado = pd.read_sql("SELECT * FROM precos_mercado", engine)
-    df_precos_mercado['data'] = pd.to_datetime(df_precos_mercado['data'])
-except Exception as e:
-    df_precos_mercado = pd.DataFrame()
+engine = database.engine
+# Montadas aqui, ou mapeadas da memória partilhada quando o servidor as publicou (gunicorn.conf.py)
+dados = dados_partilhados.obter(dados_dashboard.carregar)
+df_completo = dados['df_completo']
+df_vendas = dados['df_vendas']
+df_agricola = dados['df_agricola']
+df_precos_mercado = dados['df_precos_mercado']
+df_clima = dados['df_clima']
+df_clima_anual_geral = dados['df_clima_anual_geral']
+# As tabelas são carregadas uma única vez por processo e nunca recarregadas: as caches de
+# resultados derivados (lru_cache) valem durante toda a vida do worker, sem chave de versão
+
+# Índices para os detalhes de um talhão: consultas proporcionais às linhas do talhão, sem varrer as tabelas
+linhas_por_talhao = indice_talhoes.IndiceGrupos(df_completo, 'talhao', ordenar_por='data_plantio')
+lucro_por_safra = df_agricola.drop_duplicates(subset=['safra_id']).set_index('safra_id')['lucro_ha']
+chuva_acumulada = indice_talhoes.SerieAcumulada(df_clima['DATETIME'], df_clima['precipitacao_mm']) if not df_clima.empty else None
 
 min_date_allowed = min(df_vendas['data_venda'].min(), df_precos_mercado['data'].min()) if not df_vendas.empty and not df_precos_mercado.empty else datetime.now() - timedelta(days=365*5)
 max_date_allowed = max(df_vendas['data_venda'].max(), df_precos_mercado['data'].max()) if not df_vendas.empty and not df_precos_mercado.empty else datetime.now()
 start_date_default = max_date_allowed - relativedelta(months=12)
 
 
-try:
-    df_solo_raw = pd.read_sql("SELECT * FROM analises_solo", engine)
-    df_solo_raw['data_analise'] = pd.to_datetime(df_solo_raw['data_analise'])
-    df_agricola_sorted = df_agricola.sort_values('data_plantio')
-    df_solo_sorted = df_solo_raw.sort_values('data_analise')
-    df_agricola = pd.merge_asof(
-        df_agricola_sorted, df_solo_sorted,
-        left_on='data_plantio', right_on='data_analise',
-        by='talhao_id', direction='backward'
-    )
-except Exception as e:
-    pass
-
-try:
-    df_clima = pd.read_csv('Dados_Climaticos_INMET.csv')
-    print("Dados de 'Dados_Climaticos_INMET.csv' carregados com sucesso.")
-    df_clima.rename(columns={'PRECIPITACAO_TOTAL_HORARIO_mm': 'precipitacao_mm', 'TEMPERATURA_AR_BULBO_SECO_HORARIA_C': 'temperatura_c'}, inplace=True)
-    df_clima['DATETIME'] = pd.to_datetime(df_clima['DATETIME'])
-    df_clima['ano'] = df_clima['DATETIME'].dt.year
-    df_clima['mes'] = df_clima['DATETIME'].dt.month
-    df_clima_anual_geral = df_clima.groupby('ano').agg(precipitacao_mm=('precipitacao_mm', 'sum'), temp_max=('temperatura_c', 'max'), temp_min=('temperatura_c', 'min'), temp_media=('temperatura_c', 'mean')).reset_index()
-except Exception as e:
-    print(f"Aviso: Não foi possível carregar 'Dados_Climaticos_INMET.csv'. Erro: {e}")
-    df_clima = pd.DataFrame()
-
-
-try:
-    df_oni = pd.read_csv('oni_data.csv')
-    df_agricola['ano'] = df_agricola['data_plantio'].dt.year
-    df_agricola['mes'] = df_agricola['data_plantio'].dt.month
-    df_agricola = pd.merge(df_agricola, df_oni, on=['ano', 'mes'], how='left')
-    df_agricola.drop(columns=['ano', 'mes'], inplace=True)
-    print("Dados de ENOS (El Niño/La Niña) integrados com sucesso.")
-except FileNotFoundError:
-    print("Aviso: Arquivo oni_data.csv não encontrado.")
-    df_agricola['fase_enos'] = 'Não Disponível'
-
 
 # =============================================================================
 # 2. ESTILOS E INICIALIZAÇÃO DO APP
@@ -148,36 +92,26 @@ colors = {'background': '#1E1E1E', 'text': '#FFFFFF', 'grid': '#333333', 'primar
 app = dash.Dash(__name__, external_stylesheets=[dbc.themes.DARKLY, dbc.icons.FONT_AWESOME], suppress_callback_exceptions=True)
 app.title = 'Dashboard Agrícola'
 server = app.server
+# Métricas de todos os callbacks registados a seguir, publicadas em /metrics (None se desativado)
+metricas = instrumentacao.instrumentar(app)
+# Gerenciador dos callbacks pesados em segundo plano (None: correm no próprio worker)
+gerenciador_tarefas = tarefas_segundo_plano.criar_gerenciador()
 
 # =============================================================================
 # 3. FUNÇÕES AUXILIARES E LAYOUTS
 # =============================================================================
 def get_coords_for_city(city_name: str):
-    if OPENWEATHER_API_KEY == "SUA_CHAVE_DE_API_VAI_AQUI":
-        return None, "API Key não configurada."
-    url = f"http://api.openweathermap.org/geo/1.0/direct?q={city_name},BR&limit=1&appid={OPENWEATHER_API_KEY}"
-    try:
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()
-        if data:
-            location = data[0]
-            full_name = f"{location.get('name', '')}, {location.get('state', '')}"
-            return (location['lat'], location['lon'], full_name), None
-        return None, f"Cidade '{city_name}' não encontrada."
-    except requests.exceptions.RequestException as e:
-        return None, f"Erro de conexão com a API de geocoding: {e}"
+    return servico_clima.obter_servico().coordenadas_cidade(city_name)
 
 def get_weather_forecast(lat, lon):
-    if OPENWEATHER_API_KEY == "SUA_CHAVE_DE_API_VAI_AQUI":
-        return None, "Por favor, insira uma chave de API da OpenWeatherMap no início do script."
-    url = f"https://api.openweathermap.org/data/2.5/forecast?lat={lat}&lon={lon}&appid={OPENWEATHER_API_KEY}&units=metric&lang=pt_br"
-    try:
-        response = requests.get(url)
-        response.raise_for_status()
-        return response.json(), None
-    except requests.exceptions.RequestException as e:
-        return None, f"Erro de conexão com a API de meteorologia: {e}"
+    return servico_clima.obter_servico().previsao(lat, lon)
+
+def create_progress_bar(progress_id):
+    # Visível apenas enquanto o callback em segundo plano está a correr
+    return dbc.Progress(id=progress_id, value=0, striped=True, animated=True, className="mb-3", style={'display': 'none'})
+
+def running_progress_bar(progress_id):
+    return [(Output(progress_id, 'style'), {'display': 'flex'}, {'display': 'none'})]
 
 def create_mini_figure():
     return go.Figure().update_layout(
@@ -278,6 +212,7 @@ layout_agricola = html.Div(children=[
 
 layout_risco = html.Div([
     html.H1("Análise de Risco e Mercado", style={'textAlign': 'center'}),
+    create_progress_bar('progresso-risco'),
     html.Div(id="cards-kpi-risco", style={'display': 'flex', 'justifyContent': 'space-around', 'padding': '10px 0'}),
     dbc.Row([
         dbc.Col([
@@ -293,15 +228,29 @@ layout_risco = html.Div([
             )
         ], width={'size': 6, 'offset': 3}, className="mb-3 text-center")
     ]),
+    dcc.Store(id='risco-serie-store'),
     dcc.Graph(id="grafico-mercado-vendas"),
     html.Hr(),
     dcc.Graph(id="grafico-vendas-boxplot")
 ])
 
+COLUNAS_RANKING = {'posicao': '#', 'talhao': 'Talhão', 'fazenda': 'Fazenda', 'safras': 'Safras', 'lucro_medio': 'Lucro Médio (R$/ha)', 'lucro_mediano': 'Lucro Mediano (R$/ha)', 'produtividade_media': 'Produtividade Média (kg/ha)', 'custo_medio': 'Custo Médio (R$/ha)'}
+
 layout_talhoes = html.Div([
     html.H1('Análise de Desempenho dos Talhões', style={'textAlign': 'center'}),
-    html.P('Compare os talhões com maior e menor lucratividade média com base nos filtros selecionados.', style={'textAlign': 'center'}),
+    html.P('Compare os talhões com maior e menor lucratividade média com base nos filtros selecionados e consulte o ranking completo.', style={'textAlign': 'center'}),
     html.Div(id='comparativo-talhoes-container', style={'display': 'flex', 'justifyContent': 'space-around', 'gap': '20px', 'padding': '20px 0'}),
+    html.H4('Ranking de Lucratividade dos Talhões', className="text-center"),
+    # Paginação no servidor: cada página é uma fatia do ranking em cache do recorte
+    dash_table.DataTable(
+        id='tabela-ranking-talhoes',
+        columns=[{'name': nome, 'id': coluna} for coluna, nome in COLUNAS_RANKING.items()],
+        page_action='custom', page_current=0, page_size=ranking_talhoes.TAMANHO_PAGINA,
+        style_cell={'textAlign': 'left', 'backgroundColor': colors['card_background'], 'color': colors['text']},
+        style_header={'backgroundColor': colors['primary'], 'fontWeight': 'bold', 'color': 'white'},
+        style_data={'border': f"1px solid {colors['grid']}"},
+        style_table={'overflowX': 'auto'}
+    ),
     dbc.Modal(id='modal-detalhes-talhao', size='lg', centered=True, scrollable=True)
 ])
 
@@ -312,11 +261,15 @@ layout_solo = html.Div([
         dbc.Col([
             html.Label("Selecione o Indicador do Eixo X (Solo):"),
             dcc.Dropdown(id='dropdown-eixo-x-solo', options=[{'label': 'pH do Solo', 'value': 'ph'}, {'label': 'Fósforo (ppm)', 'value': 'fosforo_ppm'}, {'label': 'Potássio (ppm)', 'value': 'potassio_ppm'}, {'label': 'Matéria Orgânica (%)', 'value': 'materia_organica_percent'}], value='ph')
-        ], width=6),
+        ], width=4),
         dbc.Col([
             html.Label("Selecione o Indicador do Eixo Y (Resultado):"),
             dcc.Dropdown(id='dropdown-eixo-y-solo', options=[{'label': 'Lucro por Hectare (R$)', 'value': 'lucro_ha'}], value='lucro_ha')
-        ], width=6)
+        ], width=4),
+        dbc.Col([
+            html.Label("Linha de Tendência:"),
+            dcc.Dropdown(id='dropdown-tendencia-solo', options=[{'label': nome, 'value': metodo} for metodo, nome in regressao.METODOS.items()], value='ols', clearable=False)
+        ], width=4)
     ], style={'marginBottom': '20px'}),
     dcc.Graph(id='grafico-correlacao-solo')
 ])
@@ -324,6 +277,7 @@ layout_solo = html.Div([
 # <<< MUDANÇA: Novo layout operacional com painel de alertas e tabela >>>
 layout_operacional = html.Div([
     html.H1("Análise de Eficiência Operacional", style={'textAlign': 'center'}),
+    create_progress_bar('progresso-operacional'),
     dbc.Row([
         dbc.Col(dcc.Graph(id='grafico-custo-maquina'), width=6),
         dbc.Col(dcc.Graph(id='grafico-prod-operador'), width=6)
@@ -451,7 +405,7 @@ else:
     ])
 
 app.layout = html.Div(style={'backgroundColor': colors['background'], 'color': colors['text'], 'fontFamily': 'Arial'}, children=[
-    dcc.Store(id='chat-history-store', data=[]),
+    dcc.Store(id='chat-session-store', storage_type='session'),
     dcc.Location(id='url', refresh=False),
     dcc.Store(id='filtro-ano-store', data='todos'),
     dcc.Store(id='filtro-season-store', data='todos'),
@@ -484,11 +438,24 @@ def display_page_and_filters(pathname):
     elif pathname == '/ia': return layout_ia, [], sidebar_style_visible, content_style_with_sidebar
     return layout_painel_principal, [], sidebar_style_hidden, content_style_full_width
 
+# A sincronização dos filtros corre no navegador (callbacks clientside): navegar entre
+# páginas não gera pedidos ao servidor. O store só é alterado quando o valor muda de facto,
+# para não disparar de novo os callbacks que dependem dele.
+JS_DROPDOWN_PARA_STORE = """
+function(value, atual) {
+    var novo = (value === null || value === undefined) ? 'todos' : value;
+    return novo === atual ? window.dash_clientside.no_update : novo;
+}
+"""
+JS_STORE_PARA_DROPDOWN = """
+function(pathname, data) {
+    return data;
+}
+"""
+
 def create_sync_callback(filter_id):
-    @app.callback(Output(f'{filter_id}-store', 'data'), Input(filter_id, 'value'), prevent_initial_call=True)
-    def update_store(value): return value if value is not None else 'todos'
-    @app.callback(Output(filter_id, 'value', allow_duplicate=True), Input('url', 'pathname'), State(f'{filter_id}-store', 'data'), prevent_initial_call=True)
-    def update_dropdown_from_store(pathname, data): return data
+    app.clientside_callback(JS_DROPDOWN_PARA_STORE, Output(f'{filter_id}-store', 'data'), Input(filter_id, 'value'), State(f'{filter_id}-store', 'data'), prevent_initial_call=True)
+    app.clientside_callback(JS_STORE_PARA_DROPDOWN, Output(filter_id, 'value', allow_duplicate=True), Input('url', 'pathname'), State(f'{filter_id}-store', 'data'), prevent_initial_call=True)
 for filtro in ['filtro-ano', 'filtro-season', 'filtro-fazenda', 'filtro-cultura']: create_sync_callback(filtro)
 
 @app.callback(
@@ -508,10 +475,11 @@ def update_prediction(cultura, enos, area, ph, fosforo, potassio, materia_org, c
     input_data = input_data[df_ml_dataset.drop(columns='produtividade_kg_ha').columns]
     predicao = modelo_produtividade.predict(input_data)[0]
     df_cultura_historico = df_ml_dataset[df_ml_dataset['cultura'] == cultura]
-    fig_contexto = go.Figure()
-    fig_contexto.add_trace(go.Histogram(x=df_cultura_historico['produtividade_kg_ha'], name='Dados Históricos', marker_color='#333333'))
-    fig_contexto.add_vline(x=predicao, line_width=3, line_dash="dash", line_color=colors['primary'], annotation_text="Sua Previsão", annotation_position="top left")
-    fig_contexto.update_layout(title=f'Previsão vs. Histórico para {cultura}', xaxis_title='Produtividade (kg/ha)', yaxis_title='Frequência (Nº de Safras)', plot_bgcolor=colors['card_background'], paper_bgcolor=colors['background'], font_color=colors['text'])
+    with instrumentacao.fase('figura'):
+        fig_contexto = go.Figure()
+        fig_contexto.add_trace(go.Histogram(x=df_cultura_historico['produtividade_kg_ha'], name='Dados Históricos', marker_color='#333333'))
+        fig_contexto.add_vline(x=predicao, line_width=3, line_dash="dash", line_color=colors['primary'], annotation_text="Sua Previsão", annotation_position="top left")
+        fig_contexto.update_layout(title=f'Previsão vs. Histórico para {cultura}', xaxis_title='Produtividade (kg/ha)', yaxis_title='Frequência (Nº de Safras)', plot_bgcolor=colors['card_background'], paper_bgcolor=colors['background'], font_color=colors['text'])
     return f"{predicao:,.0f}", fig_contexto
 
 @app.callback(
@@ -529,28 +497,37 @@ def update_enos_analysis(ano, season, fazenda, cultura):
         fig_box = go.Figure().update_layout(title='Dados insuficientes para exibir o gráfico', plot_bgcolor=colors['card_background'], paper_bgcolor=colors['background'], font_color=colors['text'])
         fig_temporal = go.Figure().update_layout(title='Dados insuficientes para exibir o gráfico', plot_bgcolor=colors['card_background'], paper_bgcolor=colors['background'], font_color=colors['text'])
         return fig_box, fig_temporal
-    fig_box = px.box(dff, x='cultura', y='produtividade_kg_ha', color='fase_enos', title='Distribuição da Produtividade por Cultura e Cenário ENOS', labels={'produtividade_kg_ha': 'Produtividade (kg/ha)', 'cultura': 'Cultura', 'fase_enos': 'Cenário Climático'}, color_discrete_map={'El Nino': '#E74C3C', 'La Nina': '#3498DB', 'Neutro': '#95A5A6'}, category_orders={"fase_enos": ["La Nina", "Neutro", "El Nino"]})
-    fig_box.update_layout(plot_bgcolor=colors['card_background'], paper_bgcolor=colors['background'], font_color=colors['text'], legend_title_text='Cenário no Plantio')
+    # Quartis calculados aqui: a figura leva só as estatísticas de cada caixa, não todas as safras
+    estatisticas = estatisticas_box.calcular(dff, 'produtividade_kg_ha', ['fase_enos', 'cultura'])
+    with instrumentacao.fase('figura'):
+        fig_box = go.Figure(estatisticas_box.tracos_box(estatisticas, coluna_x='cultura', coluna_cor='fase_enos', cores={'El Nino': '#E74C3C', 'La Nina': '#3498DB', 'Neutro': '#95A5A6'}, ordem_cores=["La Nina", "Neutro", "El Nino"]))
+        fig_box.update_layout(title='Distribuição da Produtividade por Cultura e Cenário ENOS', boxmode='group', xaxis_title='Cultura', yaxis_title='Produtividade (kg/ha)')
+        fig_box.update_layout(plot_bgcolor=colors['card_background'], paper_bgcolor=colors['background'], font_color=colors['text'], legend_title_text='Cenário no Plantio')
     df_temporal = dff.groupby(['ano_safra', 'cultura', 'fase_enos'])['produtividade_kg_ha'].mean().reset_index()
-    fig_temporal = px.line(df_temporal, x='ano_safra', y='produtividade_kg_ha', color='cultura', line_dash='fase_enos', markers=True, title="Evolução Anual da Produtividade por Cultura e Cenário ENOS", labels={'produtividade_kg_ha': 'Produtividade Média (kg/ha)', 'ano_safra': 'Ano da Safra', 'fase_enos': 'Cenário Climático', 'cultura': 'Cultura'}, symbol='fase_enos', color_discrete_map={'Soja': '#2ECC71', 'Milho': '#F1C40F', 'Algodão': '#ECF0F1'}, line_dash_map={'El Nino': 'dot', 'La Nina': 'dash', 'Neutro': 'solid'}, category_orders={"fase_enos": ["La Nina", "Neutro", "El Nino"]})
-    fig_temporal.update_layout(plot_bgcolor=colors['card_background'], paper_bgcolor=colors['background'], font_color=colors['text'], legend_title_text='Legenda')
-    fig_temporal.update_xaxes(type='category')
+    with instrumentacao.fase('figura'):
+        fig_temporal = px.line(df_temporal, x='ano_safra', y='produtividade_kg_ha', color='cultura', line_dash='fase_enos', markers=True, title="Evolução Anual da Produtividade por Cultura e Cenário ENOS", labels={'produtividade_kg_ha': 'Produtividade Média (kg/ha)', 'ano_safra': 'Ano da Safra', 'fase_enos': 'Cenário Climático', 'cultura': 'Cultura'}, symbol='fase_enos', color_discrete_map={'Soja': '#2ECC71', 'Milho': '#F1C40F', 'Algodão': '#ECF0F1'}, line_dash_map={'El Nino': 'dot', 'La Nina': 'dash', 'Neutro': 'solid'}, category_orders={"fase_enos": ["La Nina", "Neutro", "El Nino"]})
+        fig_temporal.update_layout(plot_bgcolor=colors['card_background'], paper_bgcolor=colors['background'], font_color=colors['text'], legend_title_text='Legenda')
+        fig_temporal.update_xaxes(type='category')
     return fig_box, fig_temporal
 
-@app.callback(
-    [Output('cards-kpi-risco', 'children'), Output('grafico-mercado-vendas', 'figure'), Output('grafico-vendas-boxplot', 'figure')],
+@tarefas_segundo_plano.callback_pesado(
+    app, gerenciador_tarefas,
+    [Output('cards-kpi-risco', 'children'), Output('grafico-mercado-vendas', 'figure'), Output('grafico-vendas-boxplot', 'figure'), Output('risco-serie-store', 'data')],
     [Input('filtro-ano-store', 'data'),
      Input('filtro-season-store', 'data'),
      Input('filtro-fazenda-store', 'data'),
      Input('filtro-cultura-store', 'data'),
      Input('date-picker-risco', 'start_date'),
-     Input('date-picker-risco', 'end_date')]
+     Input('date-picker-risco', 'end_date')],
+    progress=[Output('progresso-risco', 'value'), Output('progresso-risco', 'label')],
+    running=running_progress_bar('progresso-risco')
 )
-def update_risco_mercado(ano, season, fazenda, cultura, start_date, end_date):
+def update_risco_mercado(set_progress, ano, season, fazenda, cultura, start_date, end_date):
+    set_progress((0, "Filtrando contratos..."))
     if df_vendas.empty or df_precos_mercado.empty:
         empty_fig = go.Figure().update_layout(plot_bgcolor=colors['background'], paper_bgcolor=colors['background'], font_color=colors['text'])
         alert = dbc.Alert("Dados de vendas ou de mercado não disponíveis.", color="warning")
-        return alert, empty_fig, empty_fig
+        return alert, empty_fig, empty_fig, None
 
     dff_vendas = pd.merge(df_agricola, df_vendas.rename(columns={'preco_venda_kg': 'preco_venda_contrato', 'quantidade_kg': 'qtd_vendida'}), on='safra_id', how='inner')
     dff_vendas_filtrado = dff_vendas.copy()
@@ -570,23 +547,20 @@ def update_risco_mercado(ano, season, fazenda, cultura, start_date, end_date):
     if dff_vendas_filtrado.empty:
         empty_fig = go.Figure().update_layout(title="Sem dados para os filtros selecionados", plot_bgcolor=colors['background'], paper_bgcolor=colors['background'], font_color=colors['text'])
         alert = dbc.Alert("Nenhum contrato de venda encontrado para os filtros.", color="warning")
-        return alert, empty_fig, empty_fig
+        return alert, empty_fig, empty_fig, None
 
     for col in ['qtd_vendida', 'preco_venda_contrato', 'produtividade_kg_ha', 'area_ha', 'custo_total_safra_ha']:
         dff_vendas_filtrado[col] = pd.to_numeric(dff_vendas_filtrado[col], errors='coerce').fillna(0)
 
     cultura_analisada = cultura if cultura is not None and cultura != 'todos' else (dff_vendas_filtrado['cultura'].mode()[0] if not dff_vendas_filtrado.empty else 'Soja')
+    set_progress((30, "Cruzando vendas com o mercado..."))
 
-    df_mercado_filtrado = df_precos_mercado[df_precos_mercado['cultura_nome'] == cultura_analisada].sort_values('data').copy()
-    
-    if start_date and end_date:
-        start_date_dt = pd.to_datetime(start_date)
-        end_date_dt = pd.to_datetime(end_date)
-        df_mercado_filtrado = df_mercado_filtrado[
-            (df_mercado_filtrado['data'] >= start_date_dt) & (df_mercado_filtrado['data'] <= end_date_dt)
-        ]
+    df_mercado_filtrado = serie_mercado(cultura_analisada, start_date, end_date)
 
-    fig_temporal = px.line(df_mercado_filtrado, x='data', y='preco_fecho_kg', title=f'Mercado vs. Vendas Realizadas: {cultura_analisada}', labels={'data': 'Data', 'preco_fecho_kg': 'Preço de Mercado (R$/kg)'})
+    # A série diária é reduzida ao número de pontos visíveis; o zoom volta a pedi-la em resolução total
+    df_mercado_reduzido = amostragem.reduzir_serie(df_mercado_filtrado, 'data', 'preco_fecho_kg')
+    with instrumentacao.fase('figura'):
+        fig_temporal = px.line(df_mercado_reduzido, x='data', y='preco_fecho_kg', title=f'Mercado vs. Vendas Realizadas: {cultura_analisada}', labels={'data': 'Data', 'preco_fecho_kg': 'Preço de Mercado (R$/kg)'})
 
     vendas_cultura_analisada = dff_vendas_filtrado[dff_vendas_filtrado['cultura'] == cultura_analisada].sort_values('data_venda').copy()
 
@@ -617,40 +591,45 @@ def update_risco_mercado(ano, season, fazenda, cultura, start_date, end_date):
             for index, row in vendas_com_mercado.iterrows()
         ]
 
-        fig_temporal.add_trace(go.Scatter(
-            x=vendas_com_mercado['data_venda'], y=vendas_com_mercado['preco_venda_contrato'],
-            mode='markers', name='Contratos Fechados', hovertext=hover_text, hoverinfo='text',
-            marker=dict(symbol='star', color=colors_performance, size=sizes, opacity=0.7, line=dict(width=1, color='rgba(255, 255, 255, 0.8)'))
-        ))
+        with instrumentacao.fase('figura'):
+            fig_temporal.add_trace(go.Scatter(
+                x=vendas_com_mercado['data_venda'], y=vendas_com_mercado['preco_venda_contrato'],
+                mode='markers', name='Contratos Fechados', hovertext=hover_text, hoverinfo='text',
+                marker=dict(symbol='star', color=colors_performance, size=sizes, opacity=0.7, line=dict(width=1, color='rgba(255, 255, 255, 0.8)'))
+            ))
 
+    tracos_previsao = []
     if not df_previsao_precos.empty:
-        df_previsao_filtrado = df_previsao_precos[df_previsao_precos['cultura_nome'] == cultura_analisada]
-        if start_date and end_date:
-            start_date_dt = pd.to_datetime(start_date)
-            end_date_dt = pd.to_datetime(end_date)
-            df_previsao_filtrado = df_previsao_filtrado[(df_previsao_filtrado['ds'] >= start_date_dt) & (df_previsao_filtrado['ds'] <= end_date_dt)]
-
-        fig_temporal.add_trace(go.Scatter(x=df_previsao_filtrado['ds'], y=df_previsao_filtrado['yhat'], mode='lines', line=dict(dash='dash', color='yellow'), name='Previsão de Preço'))
-        fig_temporal.add_trace(go.Scatter(x=df_previsao_filtrado['ds'], y=df_previsao_filtrado['yhat_upper'], mode='lines', line=dict(width=0), fillcolor='rgba(255, 255, 0, 0.15)', showlegend=False))
-        fig_temporal.add_trace(go.Scatter(x=df_previsao_filtrado['ds'], y=df_previsao_filtrado['yhat_lower'], mode='lines', line=dict(width=0), fill='tonexty', fillcolor='rgba(255, 255, 0, 0.15)', name='Intervalo de Confiança'))
-
+        df_previsao_filtrado = amostragem.reduzir_serie(serie_previsao(cultura_analisada, start_date, end_date), 'ds', 'yhat')
+        tracos_previsao = list(range(len(fig_temporal.data), len(fig_temporal.data) + 3))
+        with instrumentacao.fase('figura'):
+            fig_temporal.add_trace(go.Scatter(x=df_previsao_filtrado['ds'], y=df_previsao_filtrado['yhat'], mode='lines', line=dict(dash='dash', color='yellow'), name='Previsão de Preço'))
+            fig_temporal.add_trace(go.Scatter(x=df_previsao_filtrado['ds'], y=df_previsao_filtrado['yhat_upper'], mode='lines', line=dict(width=0), fillcolor='rgba(255, 255, 0, 0.15)', showlegend=False))
+            fig_temporal.add_trace(go.Scatter(x=df_previsao_filtrado['ds'], y=df_previsao_filtrado['yhat_lower'], mode='lines', line=dict(width=0), fill='tonexty', fillcolor='rgba(255, 255, 0, 0.15)', name='Intervalo de Confiança'))
+
+    set_progress((80, "Calculando indicadores..."))
     total_custo = (vendas_cultura_analisada['custo_total_safra_ha'] * vendas_cultura_analisada['area_ha']).sum()
     total_producao = (vendas_cultura_analisada['produtividade_kg_ha'] * vendas_cultura_analisada['area_ha']).sum()
 
     if total_producao > 0:
         custo_medio_kg = total_custo / total_producao
-        fig_temporal.add_hline(y=custo_medio_kg, line_dash="dot", line_color="orange",
-                              annotation_text=f"Custo Médio: R$ {custo_medio_kg:.2f}/kg",
-                              annotation_position="bottom right")
-
-    fig_temporal.update_layout(
-        plot_bgcolor=colors['card_background'], paper_bgcolor=colors['background'], font_color=colors['text'],
-        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
-    )
-    fig_temporal.update_xaxes(rangeslider_visible=False)
+        with instrumentacao.fase('figura'):
+            fig_temporal.add_hline(y=custo_medio_kg, line_dash="dot", line_color="orange",
+                                  annotation_text=f"Custo Médio: R$ {custo_medio_kg:.2f}/kg",
+                                  annotation_position="bottom right")
+
+    with instrumentacao.fase('figura'):
+        fig_temporal.update_layout(
+            plot_bgcolor=colors['card_background'], paper_bgcolor=colors['background'], font_color=colors['text'],
+            legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+        )
+        fig_temporal.update_xaxes(rangeslider_visible=False)
 
-    fig_boxplot = px.box(dff_vendas_filtrado, x='cultura', y='preco_venda_contrato', color='cultura', title=f'Distribuição do Preço de Venda por Cultura (Período Selecionado)', labels={'cultura': 'Cultura', 'preco_venda_contrato': 'Preço de Venda (R$/kg)'})
-    fig_boxplot.update_layout(plot_bgcolor=colors['card_background'], paper_bgcolor=colors['background'], font_color=colors['text'], showlegend=False)
+    estatisticas = estatisticas_box.calcular(dff_vendas_filtrado, 'preco_venda_contrato', ['cultura'])
+    with instrumentacao.fase('figura'):
+        fig_boxplot = go.Figure(estatisticas_box.tracos_box(estatisticas, coluna_x='cultura', coluna_cor='cultura'))
+        fig_boxplot.update_layout(title='Distribuição do Preço de Venda por Cultura (Período Selecionado)', boxmode='overlay', xaxis_title='Cultura', yaxis_title='Preço de Venda (R$/kg)')
+        fig_boxplot.update_layout(plot_bgcolor=colors['card_background'], paper_bgcolor=colors['background'], font_color=colors['text'], showlegend=False)
 
     def criar_card_risco(titulo, valor, formato): return dbc.Card(dbc.CardBody([html.H4(titulo, className="card-title"), html.P(formato.format(valor), className="card-text", style={'fontSize': 24, 'color': colors['primary']})]))
     receita_realizada = (dff_vendas_filtrado['qtd_vendida'] * dff_vendas_filtrado['preco_venda_contrato']).sum()
@@ -661,17 +640,87 @@ def update_risco_mercado(ano, season, fazenda, cultura, start_date, end_date):
     custo_oportunidade = receita_potencial - receita_realizada if receita_potencial > receita_realizada else 0
     cards = dbc.CardGroup([criar_card_risco("Receita Realizada", receita_realizada, "R$ {:,.2f}"), criar_card_risco("Receita Potencial Máx.", receita_potencial, "R$ {:,.2f}"), criar_card_risco("Custo de Oportunidade", custo_oportunidade, "R$ {:,.2f}")])
 
-    return cards, fig_temporal, fig_boxplot
+    serie = {'cultura': cultura_analisada, 'inicio': start_date, 'fim': end_date, 'tracos_previsao': tracos_previsao}
+    return cards, fig_temporal, fig_boxplot, serie
+
+def serie_mercado(cultura, inicio=None, fim=None):
+    df = df_precos_mercado[df_precos_mercado['cultura_nome'] == cultura].sort_values('data')
+    if inicio and fim:
+        df = df[(df['data'] >= pd.to_datetime(inicio)) & (df['data'] <= pd.to_datetime(fim))]
+    return df
+
+def serie_previsao(cultura, inicio=None, fim=None):
+    df = df_previsao_precos[df_previsao_precos['cultura_nome'] == cultura].sort_values('ds')
+    if inicio and fim:
+        df = df[(df['ds'] >= pd.to_datetime(inicio)) & (df['ds'] <= pd.to_datetime(fim))]
+    return df
 
 @app.callback(
-    [Output('chat-history-store', 'data'), Output('chat-display', 'children'), Output('chat-input', 'value'), Output('loading-output-ia', 'children')],
+    Output('grafico-mercado-vendas', 'figure', allow_duplicate=True),
+    Input('grafico-mercado-vendas', 'relayoutData'),
+    State('risco-serie-store', 'data'),
+    prevent_initial_call=True
+)
+def zoom_risco_mercado(relayout, serie):
+    # Ao aproximar, as séries de preço e previsão são trocadas pelos dados do intervalo visível;
+    # ao restaurar a vista (autorange), volta-se ao período escolhido no calendário.
+    if not relayout or not serie:
+        return dash.no_update
+    if 'xaxis.range[0]' in relayout:
+        inicio, fim = relayout['xaxis.range[0]'], relayout['xaxis.range[1]']
+    elif 'xaxis.range' in relayout:
+        inicio, fim = relayout['xaxis.range']
+    elif relayout.get('xaxis.autorange'):
+        inicio, fim = serie['inicio'], serie['fim']
+    else:
+        return dash.no_update
+
+    fig = Patch()
+    df_mercado = amostragem.reduzir_serie(serie_mercado(serie['cultura'], inicio, fim), 'data', 'preco_fecho_kg')
+    fig['data'][0]['x'] = df_mercado['data']
+    fig['data'][0]['y'] = df_mercado['preco_fecho_kg']
+    if serie['tracos_previsao']:
+        df_previsao = amostragem.reduzir_serie(serie_previsao(serie['cultura'], inicio, fim), 'ds', 'yhat')
+        for traco, coluna in zip(serie['tracos_previsao'], ['yhat', 'yhat_upper', 'yhat_lower']):
+            fig['data'][traco]['x'] = df_previsao['ds']
+            fig['data'][traco]['y'] = df_previsao[coluna]
+    return fig
+
+historico_conversas = historico_chat.HistoricoChat()
+
+def render_chat_message(entry):
+    style = {'padding': '10px', 'borderRadius': '10px', 'marginBottom': '10px', 'maxWidth': '80%'}
+    content = dcc.Markdown(entry['message'], dangerously_allow_html=True) if isinstance(entry['message'], str) else entry['message']
+    if entry['sender'] == 'user': style.update({'backgroundColor': colors['user_message_bg'], 'color': 'white', 'marginLeft': 'auto', 'textAlign': 'right'})
+    else: style.update({'textAlign': 'left', 'backgroundColor': colors['bot_message_bg'], 'marginRight': 'auto'})
+    return html.Div(content, style=style)
+
+# Id da sessão do navegador (por aba); o histórico fica no servidor. Gerado no navegador,
+# para a navegação entre páginas não voltar a fazer pedidos ao servidor (getRandomValues
+# também existe fora de HTTPS, ao contrário de crypto.randomUUID).
+JS_INICIAR_SESSAO_CHAT = """
+function(pathname, sessao) {
+    if (sessao) { return window.dash_clientside.no_update; }
+    var bytes = window.crypto.getRandomValues(new Uint8Array(16));
+    return Array.from(bytes, function(b) { return b.toString(16).padStart(2, '0'); }).join('');
+}
+"""
+app.clientside_callback(JS_INICIAR_SESSAO_CHAT, Output('chat-session-store', 'data'), Input('url', 'pathname'), State('chat-session-store', 'data'))
+
+@app.callback(Output('chat-display', 'children'), Input('chat-display', 'id'), State('chat-session-store', 'data'))
+def load_chat_history(_, session_id):
+    # Renderiza o histórico completo apenas quando a página do chat é aberta
+    return [render_chat_message(entry) for entry in historico_conversas.mensagens(session_id)]
+
+@app.callback(
+    [Output('chat-display', 'children', allow_duplicate=True), Output('chat-input', 'value'), Output('loading-output-ia', 'children')],
     [Input('send-button', 'n_clicks'), Input('chat-input', 'n_submit')],
-    [State('chat-input', 'value'), State('chat-history-store', 'data')]
+    [State('chat-input', 'value'), State('chat-session-store', 'data')],
+    prevent_initial_call=True
 )
-def handle_chat(n_clicks, n_submit, user_input, chat_history):
-    if (n_clicks == 0 and n_submit is None) or not user_input:
+def handle_chat(n_clicks, n_submit, user_input, session_id):
+    if (n_clicks == 0 and n_submit is None) or not user_input or not session_id:
         return dash.no_update
-    chat_history.append({'sender': 'user', 'message': user_input})
     bot_response = ""
     city_name_query = None
     triggers = ['em', 'para', 'de']
@@ -722,28 +771,21 @@ def handle_chat(n_clicks, n_submit, user_input, chat_history):
                     bot_response = dbc.Table(table_header + table_body, bordered=False, hover=True, responsive=True, className="mt-2 table-dark")
                 else: bot_response = "Desculpe, só consigo prever o tempo para **'amanhã'** ou **'próximos dias'**. Por favor, especifique um período e, opcionalmente, uma cidade (ex: 'previsão para amanhã em Sorriso')."
             except Exception as e: bot_response = f"Ocorreu um erro ao processar a previsão. Detalhe: {e}"
-    chat_history.append({'sender': 'bot', 'message': bot_response})
-    chat_display = []
-    for entry in chat_history:
-        style = {'padding': '10px', 'borderRadius': '10px', 'marginBottom': '10px', 'maxWidth': '80%'}
-        content = dcc.Markdown(entry['message'], dangerously_allow_html=True) if isinstance(entry['message'], str) else entry['message']
-        if entry['sender'] == 'user': style.update({'backgroundColor': colors['user_message_bg'], 'color': 'white', 'marginLeft': 'auto', 'textAlign': 'right'})
-        else: style.update({'textAlign': 'left', 'backgroundColor': colors['bot_message_bg'], 'marginRight': 'auto'})
-        chat_display.append(html.Div(content, style=style))
-    return chat_history, chat_display, "", None
-
-@app.callback(
-    [Output('kpi-prod-media', 'children'), Output('kpi-area-total', 'children'), Output('mini-grafico-prod-cultura', 'figure'),
-     Output('kpi-lucro-medio', 'children'), Output('kpi-custo-medio', 'children'), Output('mini-grafico-lucro-evolucao', 'figure'),
-     Output('kpi-custo-oportunidade', 'children'), Output('kpi-preco-mercado-soja', 'children'), Output('mini-grafico-mercado', 'figure'),
-     Output('kpi-ph-medio', 'children'), Output('kpi-fosforo-medio', 'children'), Output('mini-grafico-solo', 'figure'),
-     Output('kpi-maquina-top-custo', 'children'), Output('kpi-operador-top-prod', 'children'), Output('mini-grafico-custo-atividade', 'figure'),
-     Output('kpi-chuva-anual', 'children'), Output('kpi-temp-media-anual', 'children'), Output('mini-grafico-clima', 'figure')],
-    [Input('filtro-ano-store', 'data'), Input('filtro-season-store', 'data'), Input('filtro-fazenda-store', 'data'), Input('filtro-cultura-store', 'data')]
-)
-def update_painel_principal(ano, season, fazenda, cultura):
-    dff_agricola = df_agricola.copy()
-    dff_completo = df_completo.copy()
+    novas_mensagens = [{'sender': 'user', 'message': user_input}, {'sender': 'bot', 'message': bot_response}]
+    descartadas = historico_conversas.acrescentar(session_id, *novas_mensagens)
+    # Envia apenas as mensagens novas; as mais antigas que saíram do histórico são removidas do ecrã
+    chat_display = Patch()
+    for _ in range(descartadas):
+        del chat_display[0]
+    for entry in novas_mensagens:
+        chat_display.append(render_chat_message(entry))
+    return chat_display, "", None
+
+@lru_cache(maxsize=32)
+def filtrar_painel(ano, season, fazenda, cultura):
+    """Recortes de df_agricola e df_completo partilhados pelos cartões do painel (apenas leitura)."""
+    dff_agricola = df_agricola
+    dff_completo = df_completo
     if ano is not None and ano != 'todos':
         dff_agricola = dff_agricola[dff_agricola['ano_safra'] == ano]
         dff_completo = dff_completo[dff_completo['ano_safra_num'] == int(ano)]
@@ -756,52 +798,77 @@ def update_painel_principal(ano, season, fazenda, cultura):
     if cultura is not None and cultura != 'todos':
         dff_agricola = dff_agricola[dff_agricola['cultura'] == cultura]
         dff_completo = dff_completo[dff_completo['cultura'] == cultura]
+    return dff_agricola, dff_completo
+
+# --- Cartões do painel principal: cada grupo de KPIs é calculado e guardado em cache à parte ---
+@lru_cache(maxsize=64)
+def kpi_desempenho_agricola(ano, season, fazenda, cultura):
+    dff_agricola, _ = filtrar_painel(ano, season, fazenda, cultura)
     prod_media = dff_agricola['produtividade_kg_ha'].mean()
     area_total = dff_agricola.drop_duplicates(subset=['talhao', 'ano_safra', 'season'])['area_ha'].sum()
     kpi_prod_media_str = f"{prod_media:,.0f} kg/ha" if pd.notna(prod_media) else "N/D"
     kpi_area_total_str = f"Área Total: {area_total:,.0f} ha"
     df_prod_cultura = dff_agricola.groupby('cultura')['produtividade_kg_ha'].mean().reset_index()
-    mini_fig_prod_cultura = create_mini_figure()
-    if not df_prod_cultura.empty: mini_fig_prod_cultura.add_trace(go.Bar(x=df_prod_cultura['cultura'], y=df_prod_cultura['produtividade_kg_ha'], marker_color=colors['primary']))
+    with instrumentacao.fase('figura'):
+        mini_fig_prod_cultura = create_mini_figure()
+        if not df_prod_cultura.empty: mini_fig_prod_cultura.add_trace(go.Bar(x=df_prod_cultura['cultura'], y=df_prod_cultura['produtividade_kg_ha'], marker_color=colors['primary']))
+    return kpi_prod_media_str, kpi_area_total_str, mini_fig_prod_cultura
+
+@lru_cache(maxsize=64)
+def kpi_financeiro(ano, season, fazenda, cultura):
+    dff_agricola, _ = filtrar_painel(ano, season, fazenda, cultura)
     lucro_medio = dff_agricola['lucro_ha'].mean()
     custo_medio = dff_agricola['custo_total_safra_ha'].mean()
     kpi_lucro_medio_str = f"R$ {lucro_medio:,.2f} / ha" if pd.notna(lucro_medio) else "N/D"
     kpi_custo_medio_str = f"Custo Médio: R$ {custo_medio:,.2f} / ha" if pd.notna(custo_medio) else "N/D"
     df_lucro_ano = dff_agricola.groupby('ano_safra_num')['lucro_ha'].mean().reset_index()
-    mini_fig_lucro_evolucao = create_mini_figure()
-    if not df_lucro_ano.empty: mini_fig_lucro_evolucao.add_trace(go.Scatter(x=df_lucro_ano['ano_safra_num'], y=df_lucro_ano['lucro_ha'], fill='tozeroy', line_color=colors['primary']))
+    with instrumentacao.fase('figura'):
+        mini_fig_lucro_evolucao = create_mini_figure()
+        if not df_lucro_ano.empty: mini_fig_lucro_evolucao.add_trace(go.Scatter(x=df_lucro_ano['ano_safra_num'], y=df_lucro_ano['lucro_ha'], fill='tozeroy', line_color=colors['primary']))
+    return kpi_lucro_medio_str, kpi_custo_medio_str, mini_fig_lucro_evolucao
+
+@lru_cache(maxsize=64)
+def kpi_mercado(ano, season, fazenda, cultura):
+    dff_agricola, _ = filtrar_painel(ano, season, fazenda, cultura)
     if df_vendas.empty or df_precos_mercado.empty:
-        kpi_custo_oportunidade_str = "Dados de mercado indisponíveis"
-        kpi_preco_mercado_soja = "Execute o script populate_data.py"
-        mini_fig_mercado = create_mini_figure()
-    else:
-        receita_realizada_total = 0
-        if 'preco_venda_kg' in dff_agricola.columns:
-            dff_vendas_filtrado = dff_agricola.dropna(subset=['preco_venda_kg'])
-            if not dff_vendas_filtrado.empty: receita_realizada_total = (dff_vendas_filtrado['quantidade_kg'] * dff_vendas_filtrado['preco_venda_kg']).sum()
-        producao_total = (dff_agricola['produtividade_kg_ha'] * dff_agricola['area_ha']).sum()
-        cultura_principal = dff_agricola['cultura'].mode()[0] if not dff_agricola.empty else ''
-        preco_max_mercado = df_precos_mercado[df_precos_mercado['cultura_nome'] == cultura_principal]['preco_fecho_kg'].max() if not df_precos_mercado.empty and cultura_principal else 0
-        receita_potencial = producao_total * preco_max_mercado
-        custo_oportunidade = receita_potencial - receita_realizada_total if receita_realizada_total > 0 else 0
-        kpi_custo_oportunidade_str = f"Custo Oport.: R$ {custo_oportunidade/1000:,.0f}k" if custo_oportunidade > 0 else "N/D"
-        kpi_preco_mercado_soja = f"Mercado ({cultura_principal}): R$ {preco_max_mercado:.2f}/kg" if preco_max_mercado > 0 else "N/D"
-        df_mercado_filtrado = df_precos_mercado[df_precos_mercado['cultura_nome'] == cultura_principal]
+        return "Dados de mercado indisponíveis", "Execute o script populate_data.py", create_mini_figure()
+    receita_realizada_total = 0
+    if 'preco_venda_kg' in dff_agricola.columns:
+        dff_vendas_filtrado = dff_agricola.dropna(subset=['preco_venda_kg'])
+        if not dff_vendas_filtrado.empty: receita_realizada_total = (dff_vendas_filtrado['quantidade_kg'] * dff_vendas_filtrado['preco_venda_kg']).sum()
+    producao_total = (dff_agricola['produtividade_kg_ha'] * dff_agricola['area_ha']).sum()
+    cultura_principal = dff_agricola['cultura'].mode()[0] if not dff_agricola.empty else ''
+    preco_max_mercado = df_precos_mercado[df_precos_mercado['cultura_nome'] == cultura_principal]['preco_fecho_kg'].max() if not df_precos_mercado.empty and cultura_principal else 0
+    receita_potencial = producao_total * preco_max_mercado
+    custo_oportunidade = receita_potencial - receita_realizada_total if receita_realizada_total > 0 else 0
+    kpi_custo_oportunidade_str = f"Custo Oport.: R$ {custo_oportunidade/1000:,.0f}k" if custo_oportunidade > 0 else "N/D"
+    kpi_preco_mercado_soja = f"Mercado ({cultura_principal}): R$ {preco_max_mercado:.2f}/kg" if preco_max_mercado > 0 else "N/D"
+    df_mercado_filtrado = amostragem.reduzir_serie(serie_mercado(cultura_principal), 'data', 'preco_fecho_kg', amostragem.PONTOS_MINI_GRAFICO)
+    with instrumentacao.fase('figura'):
         mini_fig_mercado = create_mini_figure()
         if not df_mercado_filtrado.empty: mini_fig_mercado.add_trace(go.Scatter(x=df_mercado_filtrado['data'], y=df_mercado_filtrado['preco_fecho_kg'], line_color='red'))
+    return kpi_custo_oportunidade_str, kpi_preco_mercado_soja, mini_fig_mercado
+
+@lru_cache(maxsize=64)
+def kpi_solo(ano, season, fazenda, cultura):
+    dff_agricola, _ = filtrar_painel(ano, season, fazenda, cultura)
     if 'ph' not in df_agricola.columns:
-        kpi_ph_medio_str = "Dados de solo indisponíveis"
-        kpi_fosforo_medio_str = "Execute o script populate_data.py"
-        mini_fig_solo = create_mini_figure()
-    else:
-        ph_medio = dff_agricola['ph'].mean()
-        fosforo_medio = dff_agricola['fosforo_ppm'].mean()
-        kpi_ph_medio_str = f"pH Médio: {ph_medio:.2f}" if pd.notna(ph_medio) else "N/D"
-        kpi_fosforo_medio_str = f"Fósforo Médio: {fosforo_medio:.1f} ppm" if pd.notna(fosforo_medio) else "N/D"
+        return "Dados de solo indisponíveis", "Execute o script populate_data.py", create_mini_figure()
+    ph_medio = dff_agricola['ph'].mean()
+    fosforo_medio = dff_agricola['fosforo_ppm'].mean()
+    kpi_ph_medio_str = f"pH Médio: {ph_medio:.2f}" if pd.notna(ph_medio) else "N/D"
+    kpi_fosforo_medio_str = f"Fósforo Médio: {fosforo_medio:.1f} ppm" if pd.notna(fosforo_medio) else "N/D"
+    estatisticas_ph = estatisticas_box.calcular(dff_agricola, 'ph')
+    with instrumentacao.fase('figura'):
         mini_fig_solo = create_mini_figure()
-        if not dff_agricola['ph'].dropna().empty:
-            mini_fig_solo.add_trace(go.Box(y=dff_agricola['ph'], name='pH', marker_color=colors['primary']))
+        if not estatisticas_ph.empty:
+            mini_fig_solo.add_traces(estatisticas_box.tracos_box(estatisticas_ph, nome='pH', marker_color=colors['primary']))
             mini_fig_solo.update_layout(xaxis=dict(showticklabels=True))
+    return kpi_ph_medio_str, kpi_fosforo_medio_str, mini_fig_solo
+
+@lru_cache(maxsize=64)
+def kpi_operacional(ano, season, fazenda, cultura):
+    _, dff_completo = filtrar_painel(ano, season, fazenda, cultura)
     df_maquinas = dff_completo.dropna(subset=['maquina']).groupby('maquina')['custo_total_ha'].sum().nlargest(1).reset_index()
     maquina_top_custo = df_maquinas.iloc[0]['maquina'] if not df_maquinas.empty else 'N/D'
     kpi_maquina_top_custo_str = f"Maior Custo: {maquina_top_custo}"
@@ -810,25 +877,63 @@ def update_painel_principal(ano, season, fazenda, cultura):
     operador_top_prod = df_prod_operador.iloc[0]['operador'] if not df_prod_operador.empty else 'N/D'
     kpi_operador_top_prod_str = f"Top Produtiv.: {operador_top_prod}"
     df_custo_atividade = dff_completo.groupby('tipo_atividade')['custo_total_ha'].sum().reset_index()
-    mini_fig_custo_atividade = create_mini_figure()
-    if not df_custo_atividade.empty:
-        mini_fig_custo_atividade.add_trace(go.Pie(labels=df_custo_atividade['tipo_atividade'], values=df_custo_atividade['custo_total_ha'], hole=.6))
-        mini_fig_custo_atividade.update_layout(showlegend=False)
+    with instrumentacao.fase('figura'):
+        mini_fig_custo_atividade = create_mini_figure()
+        if not df_custo_atividade.empty:
+            mini_fig_custo_atividade.add_trace(go.Pie(labels=df_custo_atividade['tipo_atividade'], values=df_custo_atividade['custo_total_ha'], hole=.6))
+            mini_fig_custo_atividade.update_layout(showlegend=False)
+    return kpi_maquina_top_custo_str, kpi_operador_top_prod_str, mini_fig_custo_atividade
+
+def kpi_clima(ano, season, fazenda, cultura):
+    # O clima depende apenas do ano: a cache fica em _kpi_clima, chaveada só por ele, para
+    # que mudar season, fazenda ou cultura não gere falhas nem entradas repetidas
+    return _kpi_clima(ano)
+
+@lru_cache(maxsize=16)
+def _kpi_clima(ano):
     if df_clima.empty:
-        kpi_chuva_anual_str = "Dados de clima indisponíveis"
-        kpi_temp_media_anual_str = "Falta o arquivo .csv"
-        mini_fig_clima = create_mini_figure()
-    else:
-        ano_clima = int(ano) if ano is not None and ano != 'todos' else (df_clima['ano'].max() if not df_clima.empty else datetime.now().year)
-        dff_clima = df_clima[df_clima['ano'] == ano_clima]
-        chuva_anual = dff_clima['precipitacao_mm'].sum()
-        temp_media_anual = dff_clima['temperatura_c'].mean()
-        kpi_chuva_anual_str = f"Chuva em {ano_clima}: {chuva_anual:,.0f} mm"
-        kpi_temp_media_anual_str = f"Temp. Média: {temp_media_anual:.1f}°C"
-        df_mensal_clima = dff_clima.groupby('mes')['precipitacao_mm'].sum().reset_index()
+        return "Dados de clima indisponíveis", "Falta o arquivo .csv", create_mini_figure()
+    ano_clima = int(ano) if ano is not None and ano != 'todos' else (df_clima['ano'].max() if not df_clima.empty else datetime.now().year)
+    dff_clima = df_clima[df_clima['ano'] == ano_clima]
+    chuva_anual = dff_clima['precipitacao_mm'].sum()
+    temp_media_anual = dff_clima['temperatura_c'].mean()
+    kpi_chuva_anual_str = f"Chuva em {ano_clima}: {chuva_anual:,.0f} mm"
+    kpi_temp_media_anual_str = f"Temp. Média: {temp_media_anual:.1f}°C"
+    df_mensal_clima = dff_clima.groupby('mes')['precipitacao_mm'].sum().reset_index()
+    with instrumentacao.fase('figura'):
         mini_fig_clima = create_mini_figure()
         if not df_mensal_clima.empty: mini_fig_clima.add_trace(go.Bar(x=df_mensal_clima['mes'], y=df_mensal_clima['precipitacao_mm'], marker_color='lightblue'))
-    return (kpi_prod_media_str, kpi_area_total_str, mini_fig_prod_cultura, kpi_lucro_medio_str, kpi_custo_medio_str, mini_fig_lucro_evolucao, kpi_custo_oportunidade_str, kpi_preco_mercado_soja, mini_fig_mercado, kpi_ph_medio_str, kpi_fosforo_medio_str, mini_fig_solo, kpi_maquina_top_custo_str, kpi_operador_top_prod_str, mini_fig_custo_atividade, kpi_chuva_anual_str, kpi_temp_media_anual_str, mini_fig_clima)
+    return kpi_chuva_anual_str, kpi_temp_media_anual_str, mini_fig_clima
+
+# (função de KPIs, ids do título, do subtítulo e do mini-gráfico do cartão)
+CARTOES_PAINEL = [
+    (kpi_desempenho_agricola, 'kpi-prod-media', 'kpi-area-total', 'mini-grafico-prod-cultura'),
+    (kpi_financeiro, 'kpi-lucro-medio', 'kpi-custo-medio', 'mini-grafico-lucro-evolucao'),
+    (kpi_mercado, 'kpi-custo-oportunidade', 'kpi-preco-mercado-soja', 'mini-grafico-mercado'),
+    (kpi_solo, 'kpi-ph-medio', 'kpi-fosforo-medio', 'mini-grafico-solo'),
+    (kpi_operacional, 'kpi-maquina-top-custo', 'kpi-operador-top-prod', 'mini-grafico-custo-atividade'),
+    (kpi_clima, 'kpi-chuva-anual', 'kpi-temp-media-anual', 'mini-grafico-clima'),
+]
+
+def create_kpi_callback(calcular_kpis, titulo_id, subtitulo_id, grafico_id):
+    # Um callback por cartão: o navegador pede os seis em paralelo e cada cartão aparece assim que fica pronto
+    @app.callback(
+        [Output(titulo_id, 'children'), Output(subtitulo_id, 'children'), Output(grafico_id, 'figure')],
+        [Input('filtro-ano-store', 'data'), Input('filtro-season-store', 'data'), Input('filtro-fazenda-store', 'data'), Input('filtro-cultura-store', 'data')]
+    )
+    def update_cartao_painel(ano, season, fazenda, cultura):
+        return calcular_kpis(ano, season, fazenda, cultura)
+for cartao in CARTOES_PAINEL: create_kpi_callback(*cartao)
+
+if metricas is not None:
+    for funcao in [filtrar_painel] + [cartao[0] for cartao in CARTOES_PAINEL if cartao[0] is not kpi_clima]: metricas.registrar_lru_cache(funcao)
+    metricas.registrar_lru_cache(_kpi_clima, 'kpi_clima')
+    metricas.registrar_cache('clima_geocodificacao', lambda: servico_clima.obter_servico().cache_geocodificacao.estatisticas())
+    metricas.registrar_cache('clima_previsao', lambda: servico_clima.obter_servico().cache_previsao.estatisticas())
+
+def update_painel_principal(ano, season, fazenda, cultura):
+    """Os 18 valores do painel principal, na ordem dos cartões (usa as mesmas caches dos callbacks)."""
+    return tuple(valor for calcular_kpis, *_ in CARTOES_PAINEL for valor in calcular_kpis(ano, season, fazenda, cultura))
 
 @app.callback(
     [Output('cards-kpi-agricola', 'children'), Output('grafico-prod-cultura', 'figure'), Output('grafico-prod-fazenda', 'figure'), Output('grafico-evolucao-prod', 'figure')],
@@ -847,57 +952,74 @@ def update_dashboard_agricola(ano, season, fazenda, cultura):
         fig.update_layout(title=title, plot_bgcolor=colors['card_background'], paper_bgcolor=colors['background'], font_color=colors['text'], xaxis=dict(gridcolor=colors['grid']), yaxis=dict(gridcolor=colors['grid']), margin=dict(l=40, r=20, t=40, b=30))
         return fig
     df_prod_cultura = dff.groupby('cultura')['produtividade_kg_ha'].mean().sort_values(ascending=False).reset_index()
-    fig_prod_cultura = px.bar(df_prod_cultura, x='cultura', y='produtividade_kg_ha', text_auto='.0f')
-    fig_prod_cultura = style_figure(fig_prod_cultura, 'Produtividade Média por Cultura')
+    with instrumentacao.fase('figura'):
+        fig_prod_cultura = px.bar(df_prod_cultura, x='cultura', y='produtividade_kg_ha', text_auto='.0f')
+        fig_prod_cultura = style_figure(fig_prod_cultura, 'Produtividade Média por Cultura')
     df_prod_fazenda = dff.groupby('fazenda')['produtividade_kg_ha'].mean().sort_values(ascending=True).reset_index()
-    fig_prod_fazenda = px.bar(df_prod_fazenda, y='fazenda', x='produtividade_kg_ha', text_auto='.0f', orientation='h')
-    fig_prod_fazenda = style_figure(fig_prod_fazenda, 'Produtividade Média por Fazenda')
-    fig_prod_fazenda.update_yaxes(title_text='')
+    with instrumentacao.fase('figura'):
+        fig_prod_fazenda = px.bar(df_prod_fazenda, y='fazenda', x='produtividade_kg_ha', text_auto='.0f', orientation='h')
+        fig_prod_fazenda = style_figure(fig_prod_fazenda, 'Produtividade Média por Fazenda')
+        fig_prod_fazenda.update_yaxes(title_text='')
     df_evolucao = df_agricola.groupby('ano_safra_num')['produtividade_kg_ha'].mean().reset_index()
-    fig_evolucao_prod = px.area(df_evolucao, x='ano_safra_num', y='produtividade_kg_ha', markers=True)
-    fig_evolucao_prod = style_figure(fig_evolucao_prod, 'Evolução da Produtividade Anual (kg/ha)')
+    with instrumentacao.fase('figura'):
+        fig_evolucao_prod = px.area(df_evolucao, x='ano_safra_num', y='produtividade_kg_ha', markers=True)
+        fig_evolucao_prod = style_figure(fig_evolucao_prod, 'Evolução da Produtividade Anual (kg/ha)')
     return cards, fig_prod_cultura, fig_prod_fazenda, fig_evolucao_prod
 
+@lru_cache(maxsize=64)
+def ranking_por_recorte(ano, season, cultura):
+    """Ranking dos talhões no recorte de ano, season e cultura."""
+    dff = df_agricola
+    if ano is not None and ano != 'todos': dff = dff[dff['ano_safra'] == ano]
+    if season is not None and season != 'todos': dff = dff[dff['season'] == season]
+    if cultura is not None and cultura != 'todos': dff = dff[dff['cultura'] == cultura]
+    return ranking_talhoes.RankingTalhoes(dff)
+
+if metricas is not None:
+    metricas.registrar_lru_cache(ranking_por_recorte)
+
 @app.callback(
     Output('comparativo-talhoes-container', 'children'),
     [Input('filtro-ano-store', 'data'), Input('filtro-season-store', 'data'), Input('filtro-cultura-store', 'data')]
 )
 def update_analise_talhoes(ano, season, cultura):
-    dff = df_agricola.copy()
-    if ano is not None and ano != 'todos': dff = dff[dff['ano_safra'] == ano]
-    if season is not None and season != 'todos': dff = dff[dff['season'] == season]
-    if cultura is not None and cultura != 'todos': dff = dff[dff['cultura'] == cultura]
-    if dff.empty or dff['talhao'].nunique() < 2: return dbc.Alert("Dados insuficientes para comparação.", color="warning", style={'textAlign': 'center'})
-    lucro_medio_talhoes = dff.groupby('talhao')['lucro_ha'].mean()
-    melhor_talhao_id = lucro_medio_talhoes.idxmax()
-    pior_talhao_id = lucro_medio_talhoes.idxmin()
-    def criar_card_talhao(talhao_id, tipo):
-        dados_talhao = dff[dff['talhao'] == talhao_id].iloc[0]
-        lucro_medio = lucro_medio_talhoes.loc[talhao_id]
+    ranking = ranking_por_recorte(ano, season, cultura)
+    if len(ranking) < 2: return dbc.Alert("Dados insuficientes para comparação.", color="warning", style={'textAlign': 'center'})
+    def criar_card_talhao(dados_talhao, tipo):
+        talhao_id = dados_talhao['talhao']
         cor_titulo = 'success' if tipo == 'Melhor' else 'danger'
-        return dbc.Card([dbc.CardHeader(html.H4(f'{tipo} Desempenho: {talhao_id}', className=f"text-{cor_titulo}")), dbc.CardBody([html.P(f"Fazenda: {dados_talhao['fazenda']}"), html.P(f"Lucratividade Média: R$ {lucro_medio:,.2f} / ha"), dbc.Button('Ver Detalhes da Última Safra', id={'type': 'btn-detalhes-talhao', 'index': talhao_id}, n_clicks=0, color=cor_titulo)])], style={'width': '48%'})
-    return [criar_card_talhao(melhor_talhao_id, 'Melhor'), criar_card_talhao(pior_talhao_id, 'Pior')]
-    
+        return dbc.Card([dbc.CardHeader(html.H4(f'{tipo} Desempenho: {talhao_id}', className=f"text-{cor_titulo}")), dbc.CardBody([html.P(f"Fazenda: {dados_talhao['fazenda']}"), html.P(f"Lucratividade Média: R$ {dados_talhao['lucro_medio']:,.2f} / ha"), dbc.Button('Ver Detalhes da Última Safra', id={'type': 'btn-detalhes-talhao', 'index': talhao_id}, n_clicks=0, color=cor_titulo)])], style={'width': '48%'})
+    return [criar_card_talhao(ranking.melhores(1).iloc[0], 'Melhor'), criar_card_talhao(ranking.piores(1).iloc[0], 'Pior')]
+
+@app.callback(
+    [Output('tabela-ranking-talhoes', 'data'), Output('tabela-ranking-talhoes', 'page_count'), Output('tabela-ranking-talhoes', 'page_current')],
+    [Input('filtro-ano-store', 'data'), Input('filtro-season-store', 'data'), Input('filtro-cultura-store', 'data'), Input('tabela-ranking-talhoes', 'page_current'), Input('tabela-ranking-talhoes', 'page_size')]
+)
+def update_ranking_talhoes(ano, season, cultura, page_current, page_size):
+    # Um recorte novo volta à primeira página
+    if ctx.triggered_id != 'tabela-ranking-talhoes': page_current = 0
+    linhas, total_paginas = ranking_por_recorte(ano, season, cultura).pagina(page_current, page_size or ranking_talhoes.TAMANHO_PAGINA)
+    pagina = min(max(page_current or 0, 0), total_paginas - 1)
+    return linhas.round(2).to_dict('records'), total_paginas, pagina
+
 @app.callback(
     [Output('modal-detalhes-talhao', 'is_open'), Output('modal-detalhes-talhao', 'children')],
     [Input({'type': 'btn-detalhes-talhao', 'index': ALL}, 'n_clicks')],
     [State('modal-detalhes-talhao', 'is_open')], prevent_initial_call=True
 )
 def display_talhao_details(n_clicks, is_open):
-    ctx = dash.callback_context
     if not any(n_clicks) or not ctx.triggered: return False, []
     if any(n > 0 for n in n_clicks):
-        button_id_str = ctx.triggered[0]['prop_id'].split('.')[0]
-        talhao_id = eval(button_id_str)['index']
-        ultima_safra_df = df_completo[df_completo['talhao'] == talhao_id].sort_values('data_plantio', ascending=False)
-        if ultima_safra_df.empty: return True, dbc.ModalBody("Não foi possível encontrar dados.")
-        ultima_safra = ultima_safra_df.iloc[0]
+        # Id do botão já interpretado pelo Dash: {'type': 'btn-detalhes-talhao', 'index': <talhão>}
+        talhao_id = ctx.triggered_id['index']
+        linhas_talhao = linhas_por_talhao.linhas(talhao_id)
+        if linhas_talhao.empty: return True, dbc.ModalBody("Não foi possível encontrar dados.")
+        ultima_safra = linhas_talhao.iloc[0]
         safra_id = ultima_safra['safra_id']
-        atividades = df_completo[df_completo['safra_id'] == safra_id].drop_duplicates(subset=['tipo_atividade', 'produto_utilizado'])
+        atividades = linhas_talhao[linhas_talhao['safra_id'] == safra_id].drop_duplicates(subset=['tipo_atividade', 'produto_utilizado'])
         chuva_total = "Dados indisponíveis"
-        if not df_clima.empty and pd.notna(ultima_safra['data_plantio']) and pd.notna(ultima_safra['data_colheita_real']):
-            chuva_periodo = df_clima[(df_clima.index >= ultima_safra['data_plantio']) & (df_clima.index <= ultima_safra['data_colheita_real'])]
-            chuva_total = f"{chuva_periodo['precipitacao_mm'].sum():.1f} mm"
+        if chuva_acumulada is not None and pd.notna(ultima_safra['data_plantio']) and pd.notna(ultima_safra['data_colheita_real']):
+            chuva_total = f"{chuva_acumulada.total(ultima_safra['data_plantio'], ultima_safra['data_colheita_real']):.1f} mm"
         atividades_formatadas = atividades[['data_execucao', 'tipo_atividade', 'produto_utilizado', 'quantidade_aplicada_ha', 'unidade', 'custo_total_ha']].copy()
         atividades_formatadas['data_execucao'] = atividades_formatadas['data_execucao'].dt.strftime('%d/%m/%Y')
         modal_content = [
@@ -905,7 +1027,7 @@ def display_talhao_details(n_clicks, is_open):
             dbc.ModalBody([
                 html.H4("Resumo da Última Safra"),
                 dbc.Row([dbc.Col(html.P(f"Cultura: {ultima_safra['cultura']}")), dbc.Col(html.P(f"Produtividade: {ultima_safra['produtividade_kg_ha']:,.0f} kg/ha"))]),
-                dbc.Row([dbc.Col(html.P(f"Lucro: R$ {df_agricola[df_agricola['safra_id']==safra_id]['lucro_ha'].iloc[0]:,.2f} / ha")), dbc.Col(html.P(f"Chuva no Ciclo: {chuva_total}"))]),
+                dbc.Row([dbc.Col(html.P(f"Lucro: R$ {lucro_por_safra.loc[safra_id]:,.2f} / ha")), dbc.Col(html.P(f"Chuva no Ciclo: {chuva_total}"))]),
                 html.Hr(),
                 html.H4("Atividades de Manejo e Custos"),
                 dash_table.DataTable(data=atividades_formatadas.to_dict('records'), columns=[{'name': i, 'id': i} for i in atividades_formatadas.columns], style_cell={'textAlign': 'left'}, style_data={'backgroundColor': 'transparent', 'color': colors['text']}, style_header={'backgroundColor': colors['primary'], 'fontWeight': 'bold'})
@@ -914,29 +1036,44 @@ def display_talhao_details(n_clicks, is_open):
         return not is_open, modal_content
     return is_open, []
 
+@lru_cache(maxsize=32)
+def filtrar_correlacao(eixo_x, eixo_y, ano, cultura):
+    """Safras com os dois indicadores preenchidos, no recorte de ano e cultura (apenas leitura)."""
+    dff = df_agricola.dropna(subset=[eixo_x, eixo_y])
+    if ano is not None and ano != 'todos': dff = dff[dff['ano_safra'] == ano]
+    if cultura is not None and cultura != 'todos': dff = dff[dff['cultura'] == cultura]
+    return dff
+
+@lru_cache(maxsize=64)
+def tendencias_correlacao(eixo_x, eixo_y, ano, cultura, metodo):
+    """Linhas de tendência por cultura."""
+    return regressao.calcular_tendencias(filtrar_correlacao(eixo_x, eixo_y, ano, cultura), eixo_x, eixo_y, 'cultura', metodo)
+
 @app.callback(
     Output('grafico-correlacao-solo', 'figure'),
-    [Input('dropdown-eixo-x-solo', 'value'), Input('dropdown-eixo-y-solo', 'value'), Input('filtro-ano-store', 'data'), Input('filtro-cultura-store', 'data')]
+    [Input('dropdown-eixo-x-solo', 'value'), Input('dropdown-eixo-y-solo', 'value'), Input('filtro-ano-store', 'data'), Input('filtro-cultura-store', 'data'), Input('dropdown-tendencia-solo', 'value')]
 )
-def update_grafico_correlacao(eixo_x, eixo_y, ano, cultura):
+def update_grafico_correlacao(eixo_x, eixo_y, ano, cultura, metodo='ols'):
     if 'ph' not in df_agricola.columns:
         return go.Figure().update_layout(title='Dados de solo não disponíveis', paper_bgcolor=colors['background'], plot_bgcolor=colors['background'], font_color=colors['text'])
-    dff = df_agricola.dropna(subset=[eixo_x, eixo_y]).copy()
-    if ano is not None and ano != 'todos': dff = dff[dff['ano_safra'] == ano]
-    if cultura is not None and cultura != 'todos': dff = dff[dff['cultura'] == cultura]
-    fig = px.scatter(dff, x=eixo_x, y=eixo_y, color='cultura', hover_data=['talhao', 'ano_safra'], trendline='ols', title=f'Correlação entre {eixo_x.replace("_", " ").title()} e {eixo_y.replace("_", " ").title()}')
+    dff = filtrar_correlacao(eixo_x, eixo_y, ano, cultura)
+    with instrumentacao.fase('figura'):
+        fig = px.scatter(dff, x=eixo_x, y=eixo_y, color='cultura', hover_data=['talhao', 'ano_safra'], title=f'Correlação entre {eixo_x.replace("_", " ").title()} e {eixo_y.replace("_", " ").title()}')
 
     if not dff.empty:
-        traces = [trace for trace in fig.data if trace.mode == 'markers']
-        num_traces = len(traces)
-        for i in range(num_traces):
-            original_name = fig.data[i].name
-            fig.data[i + num_traces].name = f'Tendência - {original_name}'
-            fig.data[i + num_traces].showlegend = True
-            
-    fig.update_layout(plot_bgcolor=colors['card_background'], paper_bgcolor=colors['background'], font_color=colors['text'])
+        # Cada linha de tendência usa a cor dos pontos da sua cultura
+        cores = {trace.name: trace.marker.color for trace in fig.data}
+        tendencias = tendencias_correlacao(eixo_x, eixo_y, ano, cultura, metodo or 'ols')
+        with instrumentacao.fase('figura'):
+            fig.add_traces(regressao.tracos_tendencia(tendencias, cores))
+
+    with instrumentacao.fase('figura'):
+        fig.update_layout(plot_bgcolor=colors['card_background'], paper_bgcolor=colors['background'], font_color=colors['text'])
     return fig
 
+if metricas is not None:
+    for funcao in [filtrar_correlacao, tendencias_correlacao]: metricas.registrar_lru_cache(funcao)
+
 # <<< MUDANÇA: Função auxiliar para detecção de anomalias, agora retorna alertas e uma tabela de dados >>>
 def detectar_anomalias_operacionais(df_filtrado, df_historico, z_score_threshold=2):
     alertas = []
@@ -999,7 +1136,8 @@ def detectar_anomalias_operacionais(df_filtrado, df_historico, z_score_threshold
     return alertas, df_anomalias_final
 
 # <<< MUDANÇA: Callback agora tem 5 saídas, incluindo os dados e colunas da nova tabela >>>
-@app.callback(
+@tarefas_segundo_plano.callback_pesado(
+    app, gerenciador_tarefas,
     [Output('grafico-custo-maquina', 'figure'),
      Output('grafico-prod-operador', 'figure'),
      Output('alert-panel-operacional', 'children'),
@@ -1007,9 +1145,12 @@ def detectar_anomalias_operacionais(df_filtrado, df_historico, z_score_threshold
      Output('anomaly-table-operacional', 'columns')],
     [Input('filtro-ano-store', 'data'),
      Input('filtro-season-store', 'data'),
-     Input('filtro-cultura-store', 'data')]
+     Input('filtro-cultura-store', 'data')],
+    progress=[Output('progresso-operacional', 'value'), Output('progresso-operacional', 'label')],
+    running=running_progress_bar('progresso-operacional')
 )
-def update_grafico_operacional(ano, season, cultura):
+def update_grafico_operacional(set_progress, ano, season, cultura):
+    set_progress((0, "Filtrando operações..."))
     dff = df_completo.copy()
     if ano is not None and ano != 'todos': dff = dff[dff['ano_safra_num'] == int(ano)]
     if season is not None and season != 'todos': dff = dff[dff['season'] == season]
@@ -1020,15 +1161,18 @@ def update_grafico_operacional(ano, season, cultura):
         return fig
     
     df_maquinas = dff.dropna(subset=['maquina']).groupby('maquina')['custo_total_ha'].sum().reset_index()
-    fig_maquina = px.bar(df_maquinas, x='maquina', y='custo_total_ha', title='Custo Total Acumulado por Máquina (R$)', text_auto='.2s')
-    fig_maquina = style_figure(fig_maquina, 'Custo Total Acumulado por Máquina')
+    with instrumentacao.fase('figura'):
+        fig_maquina = px.bar(df_maquinas, x='maquina', y='custo_total_ha', title='Custo Total Acumulado por Máquina (R$)', text_auto='.2s')
+        fig_maquina = style_figure(fig_maquina, 'Custo Total Acumulado por Máquina')
     
     df_colheita = dff[dff['tipo_atividade'] == 'Colheita'].dropna(subset=['operador'])
     df_prod_operador = df_colheita.groupby('operador')['produtividade_kg_ha'].mean().reset_index()
-    fig_operador = px.bar(df_prod_operador, x='operador', y='produtividade_kg_ha', title='Produtividade Média na Colheita por Operador (kg/ha)', text_auto='.0f')
-    fig_operador = style_figure(fig_operador, 'Produtividade Média na Colheita por Operador')
+    with instrumentacao.fase('figura'):
+        fig_operador = px.bar(df_prod_operador, x='operador', y='produtividade_kg_ha', title='Produtividade Média na Colheita por Operador (kg/ha)', text_auto='.0f')
+        fig_operador = style_figure(fig_operador, 'Produtividade Média na Colheita por Operador')
 
     # Detecção de Anomalias agora retorna alertas e um dataframe
+    set_progress((50, "Detectando anomalias..."))
     alertas, df_anomalias = detectar_anomalias_operacionais(dff, df_completo)
     
     # Prepara os dados para a DataTable
@@ -1049,14 +1193,15 @@ def update_dashboard_clima(ano):
     prec_anual, temp_media, temp_max, temp_min = (dff['precipitacao_mm'].sum(), dff['temperatura_c'].mean(), dff['temperatura_c'].max(), dff['temperatura_c'].min()) if not dff.empty else (0,0,0,0)
     cards = dbc.CardGroup([criar_card_clima("Precipitação Total", prec_anual, "mm"), criar_card_clima("Temp. Média", temp_media, "°C"), criar_card_clima("Temp. Máxima", temp_max, "°C"), criar_card_clima("Temp. Mínima", temp_min, "°C")])
     df_mensal = dff.groupby('mes').agg(precipitacao_mm=('precipitacao_mm', 'sum'), temperatura_c_media=('temperatura_c', 'mean'), temperatura_c_max=('temperatura_c', 'max'), temperatura_c_min=('temperatura_c', 'min')).reset_index()
-    fig = make_subplots(specs=[[{"secondary_y": True}]])
-    fig.add_trace(go.Bar(x=df_mensal['mes'], y=df_mensal['precipitacao_mm'], name='Precipitação', marker_color='blue'), secondary_y=True)
-    fig.add_trace(go.Scatter(x=df_mensal['mes'], y=df_mensal['temperatura_c_media'], name='Temp. Média', mode='lines+markers', line=dict(color='orange')), secondary_y=False)
-    fig.add_trace(go.Scatter(x=df_mensal['mes'], y=df_mensal['temperatura_c_max'], name='Temp. Máxima', mode='lines', line=dict(color='red', dash='dot')), secondary_y=False)
-    fig.add_trace(go.Scatter(x=df_mensal['mes'], y=df_mensal['temperatura_c_min'], name='Temp. Mínima', mode='lines', line=dict(color='lightblue', dash='dot')), secondary_y=False)
-    fig.update_layout(title=f'Dados Climáticos Mensais para {ano}', plot_bgcolor=colors['card_background'], paper_bgcolor=colors['background'], font_color=colors['text'], xaxis_title='Mês', legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1))
-    fig.update_yaxes(title_text="Temperatura (°C)", secondary_y=False)
-    fig.update_yaxes(title_text="Precipitação (mm)", secondary_y=True, showgrid=False)
+    with instrumentacao.fase('figura'):
+        fig = make_subplots(specs=[[{"secondary_y": True}]])
+        fig.add_trace(go.Bar(x=df_mensal['mes'], y=df_mensal['precipitacao_mm'], name='Precipitação', marker_color='blue'), secondary_y=True)
+        fig.add_trace(go.Scatter(x=df_mensal['mes'], y=df_mensal['temperatura_c_media'], name='Temp. Média', mode='lines+markers', line=dict(color='orange')), secondary_y=False)
+        fig.add_trace(go.Scatter(x=df_mensal['mes'], y=df_mensal['temperatura_c_max'], name='Temp. Máxima', mode='lines', line=dict(color='red', dash='dot')), secondary_y=False)
+        fig.add_trace(go.Scatter(x=df_mensal['mes'], y=df_mensal['temperatura_c_min'], name='Temp. Mínima', mode='lines', line=dict(color='lightblue', dash='dot')), secondary_y=False)
+        fig.update_layout(title=f'Dados Climáticos Mensais para {ano}', plot_bgcolor=colors['card_background'], paper_bgcolor=colors['background'], font_color=colors['text'], xaxis_title='Mês', legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1))
+        fig.update_yaxes(title_text="Temperatura (°C)", secondary_y=False)
+        fig.update_yaxes(title_text="Precipitação (mm)", secondary_y=True, showgrid=False)
     return cards, fig
 
 # =============================================================================
@@ -0,0 +1,86 @@
+import pandas as pd
+import plotly.graph_objects as go
+
+# =============================================================================
+# 0. CONFIGURAÇÕES
+# =============================================================================
+
+# Os box plots recebem só as estatísticas de cada caixa (quartis e limites dos bigodes,
+# pelas mesmas regras do Plotly) e no máximo este número de pontos atípicos, os mais
+# afastados da mediana: o tamanho da figura deixa de depender do número de safras ou contratos.
+MAX_ATIPICOS = 30
+# Os bigodes vão até o último valor dentro de 1,5 x o intervalo interquartil
+FATOR_IQR = 1.5
+
+# =============================================================================
+# 1. ESTATÍSTICAS POR GRUPO
+# =============================================================================
+
+def calcular(df, coluna_valor, colunas_grupo=(), max_atipicos=MAX_ATIPICOS):
+    """
+    Estatísticas de box plot de `coluna_valor` para cada combinação de `colunas_grupo`.
+
+    Retorna um DataFrame com as colunas de grupo (na ordem em que aparecem em df) e n,
+    q1, mediana, q3, limite_inferior, limite_superior e atipicos (lista). Os quartis usam
+    interpolação linear, como o `quartilemethod` padrão do Plotly.
+    """
+    colunas_grupo = list(colunas_grupo)
+    dados = df[colunas_grupo + [coluna_valor]].dropna()
+    if not colunas_grupo:
+        colunas_grupo = ['_todos']
+        dados = dados.assign(_todos=0)
+    valores = dados[coluna_valor]
+    grupos = dados.groupby(colunas_grupo, sort=False)[coluna_valor]
+    q1 = grupos.transform('quantile', 0.25)
+    q3 = grupos.transform('quantile', 0.75)
+    mediana = grupos.transform('median')
+    margem = FATOR_IQR * (q3 - q1)
+    dentro = (valores >= q1 - margem) & (valores <= q3 + margem)
+
+    estatisticas = pd.DataFrame({
+        'n': grupos.size(),
+        'q1': grupos.quantile(0.25),
+        'mediana': grupos.median(),
+        'q3': grupos.quantile(0.75),
+        'limite_inferior': dados[dentro].groupby(colunas_grupo, sort=False)[coluna_valor].min(),
+        'limite_superior': dados[dentro].groupby(colunas_grupo, sort=False)[coluna_valor].max(),
+    })
+    fora = dados[~dentro].assign(_distancia=(valores - mediana).abs()[~dentro])
+    fora = fora.sort_values('_distancia', ascending=False, kind='stable').groupby(colunas_grupo, sort=False).head(max_atipicos)
+    atipicos = fora.groupby(colunas_grupo, sort=False)[coluna_valor].agg(list).reindex(estatisticas.index)
+    estatisticas['atipicos'] = [lista if isinstance(lista, list) else [] for lista in atipicos]
+    estatisticas = estatisticas.reset_index()
+    return estatisticas.drop(columns='_todos') if '_todos' in estatisticas.columns else estatisticas
+
+# =============================================================================
+# 2. TRAÇOS DO PLOTLY
+# =============================================================================
+
+def _box(estatisticas, x, **kwargs):
+    return go.Box(
+        x=x, q1=estatisticas['q1'].tolist(), median=estatisticas['mediana'].tolist(), q3=estatisticas['q3'].tolist(),
+        lowerfence=estatisticas['limite_inferior'].tolist(), upperfence=estatisticas['limite_superior'].tolist(),
+        # Com estatísticas pré-calculadas, y tem uma lista de pontos por caixa
+        y=estatisticas['atipicos'].tolist(), boxpoints='outliers', **kwargs
+    )
+
+def tracos_box(estatisticas, coluna_x=None, coluna_cor=None, cores=None, ordem_cores=None, nome=None, **kwargs):
+    """
+    go.Box a partir de `calcular`: um traço por valor de `coluna_cor` (com cores {valor: cor}
+    e a ordem `ordem_cores`), com uma caixa por valor de `coluna_x`; sem `coluna_x`, uma
+    única caixa chamada `nome`.
+    """
+    if coluna_cor is None:
+        x = estatisticas[coluna_x].tolist() if coluna_x else [nome] * len(estatisticas)
+        return [_box(estatisticas, x, name=nome, **kwargs)]
+    cores = cores or {}
+    valores = list(dict.fromkeys(estatisticas[coluna_cor]))
+    if ordem_cores:
+        valores = [v for v in ordem_cores if v in valores] + [v for v in valores if v not in ordem_cores]
+    tracos = []
+    for valor in valores:
+        grupo = estatisticas[estatisticas[coluna_cor] == valor]
+        x = grupo[coluna_x].tolist() if coluna_x else [valor] * len(grupo)
+        estilo = {'marker_color': cores[valor]} if valor in cores else {}
+        tracos.append(_box(grupo, x, name=str(valor), legendgroup=str(valor), offsetgroup=str(valor), **estilo, **kwargs))
+    return tracos
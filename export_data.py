@@ -1,30 +1,221 @@
 import pandas as pd
-from sqlalchemy import create_engine
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import MetaData, Table, Integer, Float, Date, select, func
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import argparse
+import threading
+import shutil
+import json
+import os
 import sys
 
-def export_tables_to_csv():
+import database
+
+# =============================================================================
+# 0. CONFIGURAÇÕES
+# =============================================================================
+
+TABELAS_PADRAO = ['fazendas', 'talhoes', 'safras', 'culturas', 'analises_solo', 'precos_mercado']
+
+# Linhas lidas do banco por vez (a tabela nunca é carregada inteira em memória)
+CHUNKSIZE = 50000
+MAX_EXPORTACOES_SIMULTANEAS = 4
+COMPRESSAO_PARQUET = 'zstd'
+
+# Diretório padrão das exportações e do arquivo de marcas
+DIRETORIO_PADRAO = os.getenv('EXPORT_DIRETORIO', '.')
+# Guarda, por tabela e formato, o maior id já exportado e quantas linhas havia até ele (modo incremental)
+ARQUIVO_MARCAS = '.export_marcas.json'
+# Só estas tabelas crescem normalmente por inserções e podem ser exportadas incrementalmente por id.
+# As demais (ex.: safras, atualizadas na colheita) são sempre exportadas por inteiro.
+# Quem apaga estas tabelas ou reescreve as suas linhas (populate_data, atualizar_precos)
+# chama `invalidar_marcas`; uma tabela que encolheu também volta à exportação completa.
+TABELAS_SO_INSERCAO = {'precos_mercado', 'analises_solo'}
+
+_lock_marcas = threading.Lock()
+
+# =============================================================================
+# 1. FUNÇÕES AUXILIARES
+# =============================================================================
+
+def caminho_saida(nome_tabela, formato, diretorio=DIRETORIO_PADRAO):
+    """CSV: db_<tabela>.csv; Parquet: diretório db_<tabela>.parquet com um arquivo por exportação."""
+    return os.path.join(diretorio, f"db_{nome_tabela}.{formato}")
+
+def ler_marcas(diretorio=DIRETORIO_PADRAO):
+    caminho = os.path.join(diretorio, ARQUIVO_MARCAS)
+    if not os.path.exists(caminho):
+        return {}
+    with open(caminho) as f:
+        return json.load(f)
+
+def _escrever_marcas(diretorio, marcas):
+    caminho = os.path.join(diretorio, ARQUIVO_MARCAS)
+    with open(f"{caminho}.tmp", 'w') as f:
+        json.dump(marcas, f, indent=2)
+    os.replace(f"{caminho}.tmp", caminho)
+
+def gravar_marca(diretorio, chave, valor):
+    with _lock_marcas:
+        marcas = ler_marcas(diretorio)
+        marcas[chave] = valor
+        _escrever_marcas(diretorio, marcas)
+
+def invalidar_marcas(tabelas, diretorio=DIRETORIO_PADRAO):
+    """Descarta as marcas das tabelas (depois de apagá-las ou de reescrever linhas): a próxima exportação é completa."""
+    with _lock_marcas:
+        marcas = ler_marcas(diretorio)
+        restantes = {chave: valor for chave, valor in marcas.items() if chave.split(':')[0] not in tabelas}
+        if restantes != marcas:
+            _escrever_marcas(diretorio, restantes)
+
+def marca_valida(db_engine, tabela, marca):
     """
-    Conecta ao banco de dados SQLite e exporta tabelas específicas para arquivos CSV.
+    Confere a marca com o estado atual da tabela: as linhas com id <= marca têm de continuar
+    a ser tantas quantas foram exportadas, com a mesma maior id. Uma tabela esvaziada ou
+    com linhas apagadas (ids reutilizados a partir de 1 no SQLite) falha a verificação.
     """
-    try:
-        engine = create_engine("sqlite:///gestao_agricola.db")
-        print("Conectado ao banco de dados gestao_agricola.db")
+    if not isinstance(marca, dict):
+        # Marca antiga (só o id), sem contagem para conferir
+        return False
+    consulta = select(func.max(tabela.c.id), func.count()).select_from(tabela).where(tabela.c.id <= marca['id'])
+    with db_engine.connect() as conn:
+        maior_id, linhas = conn.execute(consulta).one()
+    return maior_id == marca['id'] and linhas == marca['linhas']
 
-        tabelas_para_exportar = ['fazendas', 'talhoes', 'safras', 'culturas', 'analises_solo']
+def esquema_arrow(tabela):
+    """Esquema Parquet fixo a partir das colunas do banco, para que todos os blocos sejam compatíveis."""
+    tipos = []
+    for coluna in tabela.columns:
+        if isinstance(coluna.type, Integer):
+            tipo = pa.int64()
+        elif isinstance(coluna.type, Float):
+            tipo = pa.float64()
+        elif isinstance(coluna.type, Date):
+            tipo = pa.timestamp('ns')
+        else:
+            tipo = pa.string()
+        tipos.append(pa.field(coluna.name, tipo))
+    return pa.schema(tipos)
 
-        for nome_tabela in tabelas_para_exportar:
-            print(f"Exportando tabela '{nome_tabela}'...")
-            df = pd.read_sql_table(nome_tabela, engine)
-            nome_arquivo_csv = f"db_{nome_tabela}.csv"
-            df.to_csv(nome_arquivo_csv, index=False)
-            print(f" -> Tabela '{nome_tabela}' salva como '{nome_arquivo_csv}'")
+def ler_em_blocos(db_engine, tabela, marca=None, chunksize=CHUNKSIZE):
+    """Lê a tabela em blocos de `chunksize` linhas (apenas id > marca, se informada)."""
+    consulta = select(tabela)
+    if 'id' in tabela.c:
+        if marca is not None:
+            consulta = consulta.where(tabela.c.id > marca)
+        consulta = consulta.order_by(tabela.c.id)
+    colunas_data = [c.name for c in tabela.columns if isinstance(c.type, Date)]
+    with db_engine.connect().execution_options(stream_results=True) as conn:
+        for bloco in pd.read_sql_query(consulta, conn, chunksize=chunksize, parse_dates=colunas_data):
+            yield bloco
 
+def exportar_tabela(db_engine, nome_tabela, formato='csv', incremental=False, diretorio=DIRETORIO_PADRAO, chunksize=CHUNKSIZE):
+    """
+    Exporta uma tabela em blocos para CSV ou Parquet.
+
+    No modo incremental, exporta apenas as linhas com id maior que a última marca
+    gravada e acrescenta-as ao arquivo existente (CSV) ou como uma nova parte do
+    diretório Parquet. Sem marca anterior, com uma marca que já não corresponde à tabela
+    (`marca_valida`) ou para tabelas fora de TABELAS_SO_INSERCAO, faz uma exportação
+    completa. Retorna (linhas exportadas, True se a exportação foi só de linhas novas).
+    """
+    incremental = incremental and nome_tabela in TABELAS_SO_INSERCAO
+    tabela = Table(nome_tabela, MetaData(), autoload_with=db_engine)
+    destino = caminho_saida(nome_tabela, formato, diretorio)
+    chave_marca = f"{nome_tabela}:{formato}"
+    marca_gravada = ler_marcas(diretorio).get(chave_marca) if incremental and 'id' in tabela.c and os.path.exists(destino) else None
+    if marca_gravada is not None and not marca_valida(db_engine, tabela, marca_gravada):
+        print(f"Aviso: a tabela '{nome_tabela}' mudou desde a última exportação (linhas apagadas ou recriadas); exportação completa.")
+        marca_gravada = None
+    acrescentar = marca_gravada is not None
+    marca = marca_gravada['id'] if acrescentar else None
+
+    linhas, maior_id = 0, marca
+    if formato == 'csv':
+        caminho_tmp = destino if acrescentar else f"{destino}.tmp"
+        if not acrescentar and os.path.exists(caminho_tmp):
+            os.remove(caminho_tmp)
+        for bloco in ler_em_blocos(db_engine, tabela, marca, chunksize):
+            escrever_cabecalho = not os.path.exists(caminho_tmp)
+            bloco.to_csv(caminho_tmp, mode='a', header=escrever_cabecalho, index=False, date_format='%Y-%m-%d')
+            linhas += len(bloco)
+            if 'id' in bloco and not bloco.empty:
+                maior_id = int(bloco['id'].max())
+        if not acrescentar:
+            if not os.path.exists(caminho_tmp):
+                pd.DataFrame(columns=[c.name for c in tabela.columns]).to_csv(caminho_tmp, index=False)
+            os.replace(caminho_tmp, destino)
+    elif formato == 'parquet':
+        if not acrescentar and os.path.exists(destino):
+            shutil.rmtree(destino)
+        os.makedirs(destino, exist_ok=True)
+        parte = len([n for n in os.listdir(destino) if n.endswith('.parquet')])
+        caminho_parte = os.path.join(destino, f"part-{parte:05}.parquet")
+        esquema = esquema_arrow(tabela)
+        writer = None
+        try:
+            for bloco in ler_em_blocos(db_engine, tabela, marca, chunksize):
+                if writer is None:
+                    writer = pq.ParquetWriter(f"{caminho_parte}.tmp", esquema, compression=COMPRESSAO_PARQUET)
+                writer.write_table(pa.Table.from_pandas(bloco, schema=esquema, preserve_index=False))
+                linhas += len(bloco)
+                if 'id' in bloco and not bloco.empty:
+                    maior_id = int(bloco['id'].max())
+        finally:
+            if writer is not None:
+                writer.close()
+                os.replace(f"{caminho_parte}.tmp", caminho_parte)
+        if linhas == 0 and parte == 0:
+            pq.write_table(esquema.empty_table(), caminho_parte, compression=COMPRESSAO_PARQUET)
+    else:
+        raise ValueError(f"Formato de exportação desconhecido: '{formato}'")
+
+    if maior_id is not None:
+        linhas_ate_marca = (marca_gravada['linhas'] if acrescentar else 0) + linhas
+        gravar_marca(diretorio, chave_marca, {'id': maior_id, 'linhas': linhas_ate_marca})
+    return linhas, acrescentar
+
+# =============================================================================
+# 2. FUNÇÃO PRINCIPAL
+# =============================================================================
+
+def exportar_tabelas(tabelas=None, formato='csv', incremental=False, diretorio=DIRETORIO_PADRAO, workers=MAX_EXPORTACOES_SIMULTANEAS, chunksize=CHUNKSIZE, db_engine=None):
+    """Exporta várias tabelas em paralelo (uma thread e uma conexão por tabela)."""
+    tabelas = tabelas or TABELAS_PADRAO
+    db_engine = db_engine or database.engine
+    print(f"Conectado ao banco de dados {database.descricao_banco(db_engine)}")
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futuros = {executor.submit(exportar_tabela, db_engine, nome, formato, incremental, diretorio, chunksize): nome for nome in tabelas}
+        for futuro in as_completed(futuros):
+            nome_tabela = futuros[futuro]
+            linhas, so_novas = futuro.result()
+            modo = "novas linhas" if so_novas else "linhas"
+            print(f" -> Tabela '{nome_tabela}' salva em '{caminho_saida(nome_tabela, formato, diretorio)}' ({linhas} {modo})")
+
+def export_tables_to_csv():
+    """
+    Conecta ao banco de dados SQLite e exporta tabelas específicas para arquivos CSV.
+    """
+    parser = argparse.ArgumentParser(description="Exporta as tabelas do banco de dados para CSV ou Parquet.")
+    parser.add_argument("--tabelas", nargs='+', default=TABELAS_PADRAO, help="Tabelas a exportar (padrão: %(default)s).")
+    parser.add_argument("--formato", choices=['csv', 'parquet'], default='csv')
+    parser.add_argument("--incremental", action="store_true", help="Exporta apenas as linhas adicionadas desde a última exportação (tabelas só de inserção; as demais são exportadas por inteiro).")
+    parser.add_argument("--workers", type=int, default=MAX_EXPORTACOES_SIMULTANEAS)
+    parser.add_argument("--chunksize", type=int, default=CHUNKSIZE)
+    parser.add_argument("--diretorio", default=DIRETORIO_PADRAO)
+    args = parser.parse_args()
+
+    try:
+        exportar_tabelas(args.tabelas, args.formato, args.incremental, args.diretorio, args.workers, args.chunksize)
         print("\nExportação de todas as tabelas concluída com sucesso!")
 
     except Exception as e:
         print(f"Ocorreu um erro durante a exportação: {e}", file=sys.stderr)
-        print("Certifique-se de que o arquivo 'gestao_agricola.db' está no mesmo diretório que este script.", file=sys.stderr)
+        print(f"Verifique o acesso ao banco de dados '{database.descricao_banco(database.engine)}' (variável DATABASE_URL).", file=sys.stderr)
         sys.exit(1)
 
 if __name__ == "__main__":
-    export_tables_to_csv()
\ No newline at end of file
+    export_tables_to_csv()
@@ -1,4 +1,5 @@
 import pandas as pd
+import resumo_safras
 
 def classificar_fase_enos(oni_index):
     """Classifica a fase ENOS com base no índice ONI."""
@@ -45,6 +46,9 @@ def fetch_and_process_oni_data():
         
         print(f"\nSucesso! Arquivo '{output_filename}' foi criado com {len(df_final)} registros de dados climáticos.")
         print("O arquivo contém o histórico de El Niño e La Niña desde o ano 2000.")
+
+        # A fase ENOS de cada safra fica guardada em safra_resumo
+        resumo_safras.reconstruir_resumo_safras()
         
     except Exception as e:
         print(f"\nOcorreu um erro ao buscar ou processar os dados: {e}")
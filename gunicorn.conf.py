@@ -0,0 +1,35 @@
+import os
+
+# =============================================================================
+# 0. CONFIGURAÇÕES DO SERVIDOR
+# =============================================================================
+# Uso: gunicorn dashboard:server  (o gunicorn lê este arquivo do diretório atual)
+
+bind = os.getenv("GUNICORN_BIND", f"0.0.0.0:{os.getenv('PORT', '8050')}")
+workers = int(os.getenv("GUNICORN_WORKERS", 4))
+threads = int(os.getenv("GUNICORN_THREADS", 2))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 120))
+
+# Os workers mapeiam as tabelas publicadas pelo carregador em vez de montarem cópias próprias
+# (DASH_DADOS_PARTILHADOS=0 volta a carregar tudo em cada worker)
+os.environ.setdefault("DASH_DADOS_PARTILHADOS", "1")
+import dados_partilhados  # noqa: E402  (lê a variável acima)
+
+# O histórico do chat tem de ser comum a todos os workers: cada pedido da mesma sessão
+# pode ser atendido por um worker diferente (CHAT_PERSISTENCIA_DIR vazio: só em memória,
+# adequado apenas a um worker)
+os.environ.setdefault("CHAT_PERSISTENCIA_DIR", "cache_chat")
+
+# =============================================================================
+# 1. CICLO DE VIDA
+# =============================================================================
+
+def on_starting(server):
+    # Antes de criar os workers: monta as tabelas uma única vez, num processo à parte
+    if os.environ["DASH_DADOS_PARTILHADOS"] == "1":
+        server.log.info(f"Publicando as tabelas do dashboard em '{dados_partilhados.DIRETORIO_DADOS}'")
+        dados_partilhados.publicar_em_processo_separado()
+
+def on_exit(server):
+    if os.environ["DASH_DADOS_PARTILHADOS"] == "1":
+        dados_partilhados.remover()
@@ -0,0 +1,89 @@
+import os
+import threading
+from collections import OrderedDict, deque
+
+try:
+    import diskcache
+except ImportError:
+    diskcache = None
+
+# =============================================================================
+# 0. CONFIGURAÇÕES
+# =============================================================================
+
+# Mensagens guardadas por sessão (as mais antigas são descartadas)
+MAX_MENSAGENS_POR_SESSAO = int(os.getenv("CHAT_MAX_MENSAGENS", 100))
+# Sessões mantidas em memória quando não há persistência
+MAX_SESSOES_EM_MEMORIA = int(os.getenv("CHAT_MAX_SESSOES", 1000))
+
+# Diretório do diskcache para persistir o histórico (partilhado entre os workers do
+# mesmo servidor e preservado entre reinícios). Vazio: apenas em memória, o que só serve
+# a um processo; o gunicorn.conf.py usa 'cache_chat' por padrão.
+CHAT_PERSISTENCIA_DIR = os.getenv("CHAT_PERSISTENCIA_DIR", "")
+VALIDADE_PERSISTENCIA_S = int(os.getenv("CHAT_VALIDADE_S", 7 * 24 * 3600))
+
+# =============================================================================
+# 1. HISTÓRICO POR SESSÃO
+# =============================================================================
+
+class HistoricoChat:
+    """
+    Histórico do chat guardado no servidor, por id de sessão do navegador.
+
+    Cada sessão guarda no máximo `max_mensagens` entradas {'sender', 'message'}.
+    Com `diretorio` (e o pacote diskcache instalado) o histórico é gravado em disco;
+    caso contrário fica num dicionário LRU limitado a `max_sessoes` sessões.
+    """
+
+    def __init__(self, max_mensagens=MAX_MENSAGENS_POR_SESSAO, max_sessoes=MAX_SESSOES_EM_MEMORIA, diretorio=CHAT_PERSISTENCIA_DIR):
+        self.max_mensagens = max_mensagens
+        self.max_sessoes = max_sessoes
+        self._lock = threading.Lock()
+        self._memoria = OrderedDict()
+        self._disco = None
+        if diretorio:
+            if diskcache is None:
+                print("Aviso: pacote 'diskcache' não instalado; o histórico do chat ficará apenas em memória.")
+            else:
+                self._disco = diskcache.Cache(diretorio)
+
+    def _chave(self, sessao):
+        return f"chat:{sessao}"
+
+    def mensagens(self, sessao):
+        if not sessao:
+            return []
+        if self._disco is not None:
+            return list(self._disco.get(self._chave(sessao), []))
+        with self._lock:
+            historico = self._memoria.get(sessao)
+            if historico is None:
+                return []
+            self._memoria.move_to_end(sessao)
+            return list(historico)
+
+    def acrescentar(self, sessao, *mensagens):
+        """Acrescenta mensagens à sessão e devolve quantas das mais antigas foram descartadas."""
+        if self._disco is not None:
+            with self._disco.transact():
+                historico = deque(self._disco.get(self._chave(sessao), []), maxlen=self.max_mensagens)
+                descartadas = max(len(historico) + len(mensagens) - self.max_mensagens, 0)
+                historico.extend(mensagens)
+                self._disco.set(self._chave(sessao), list(historico), expire=VALIDADE_PERSISTENCIA_S)
+            return descartadas
+        with self._lock:
+            historico = self._memoria.get(sessao)
+            if historico is None:
+                historico = self._memoria[sessao] = deque(maxlen=self.max_mensagens)
+            self._memoria.move_to_end(sessao)
+            descartadas = max(len(historico) + len(mensagens) - self.max_mensagens, 0)
+            historico.extend(mensagens)
+            while len(self._memoria) > self.max_sessoes:
+                self._memoria.popitem(last=False)
+            return descartadas
+
+    def limpar(self, sessao):
+        if self._disco is not None:
+            self._disco.delete(self._chave(sessao))
+        with self._lock:
+            self._memoria.pop(sessao, None)
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+
+# =============================================================================
+# 1. LINHAS DE CADA TALHÃO
+# =============================================================================
+
+class IndiceGrupos:
+    """
+    Posições das linhas de cada valor de `coluna` num DataFrame, para consultas sem varrer a tabela.
+
+    As posições são ordenadas uma vez por grupo e, dentro do grupo, por `ordenar_por`
+    (mais recente primeiro, datas vazias no fim); cada grupo fica num intervalo
+    contíguo [início, fim) do vetor. O DataFrame em si não é copiado nem reordenado,
+    o que mantém as tabelas partilhadas entre workers intactas.
+    """
+
+    def __init__(self, df, coluna, ordenar_por=None):
+        self.df = df
+        colunas = [coluna] + ([ordenar_por] if ordenar_por else [])
+        chaves = pd.DataFrame({c: df[c].to_numpy() for c in colunas})
+        chaves = chaves[chaves[coluna].notna()]
+        ordenado = chaves.sort_values(colunas, ascending=[True] + [False] * (len(colunas) - 1), na_position='last', kind='stable')
+        tipo = np.int32 if len(df) < np.iinfo(np.int32).max else np.int64
+        self.posicoes = ordenado.index.to_numpy().astype(tipo)
+        valores = ordenado[coluna].to_numpy()
+        mudancas = np.flatnonzero(valores[1:] != valores[:-1]) + 1
+        inicios = np.concatenate([[0], mudancas]) if len(valores) else np.array([], dtype=int)
+        fins = np.append(mudancas, len(valores))
+        self.intervalos = {valores[i]: (int(i), int(f)) for i, f in zip(inicios, fins)}
+
+    def __contains__(self, valor):
+        return valor in self.intervalos
+
+    def linhas(self, valor):
+        """Linhas do grupo (DataFrame vazio se não existir), na ordem de `ordenar_por`: a mais recente primeiro."""
+        inicio, fim = self.intervalos.get(valor, (0, 0))
+        return self.df.iloc[self.posicoes[inicio:fim]]
+
+# =============================================================================
+# 2. TOTAIS DE UMA SÉRIE TEMPORAL EM INTERVALOS
+# =============================================================================
+
+class SerieAcumulada:
+    """
+    Soma de uma série temporal (ex.: chuva horária) em qualquer intervalo de datas, em O(log n).
+
+    Guarda as datas ordenadas e a soma acumulada dos valores (vazios contam como zero);
+    o total em [início, fim] é a diferença entre duas posições encontradas por busca
+    binária. `total` aceita datas isoladas ou vetores de inícios e fins.
+    """
+
+    def __init__(self, datas, valores):
+        serie = pd.Series(np.asarray(valores, dtype=float), index=pd.DatetimeIndex(datas)).sort_index()
+        self.datas = serie.index.to_numpy(dtype='datetime64[ns]')
+        self.acumulado = np.concatenate([[0.0], np.cumsum(np.nan_to_num(serie.to_numpy()))])
+
+    def total(self, inicio, fim):
+        inicio = np.asarray(pd.to_datetime(inicio), dtype='datetime64[ns]')
+        fim = np.asarray(pd.to_datetime(fim), dtype='datetime64[ns]')
+        return self.acumulado[np.searchsorted(self.datas, fim, side='right')] - self.acumulado[np.searchsorted(self.datas, inicio, side='left')]
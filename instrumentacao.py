@@ -0,0 +1,249 @@
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from flask import Response, g, request
+
+# =============================================================================
+# 0. CONFIGURAÇÕES
+# =============================================================================
+
+INSTRUMENTACAO_ATIVA = os.getenv("INSTRUMENTACAO_ATIVA", "1") != "0"
+ROTA_METRICAS = os.getenv("INSTRUMENTACAO_ROTA", "/metrics")
+# Callbacks cuja computação passar deste limite são registados no log com as entradas (0: desligado)
+LIMITE_CALLBACK_LENTO_MS = float(os.getenv("INSTRUMENTACAO_LENTO_MS", 1000))
+
+LIMITES_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+LIMITES_BYTES = (1_000, 10_000, 50_000, 100_000, 250_000, 500_000, 1_000_000, 5_000_000, 10_000_000)
+
+ROTA_CALLBACKS = "/_dash-update-component"
+
+# Fases da computação de um callback: 'figura' é o tempo dos blocos marcados com
+# `fase('figura')` (construção das figuras Plotly) e 'dados' é o restante (filtros e agregações pandas)
+FASES = ('dados', 'figura')
+
+# Fases medidas no callback em execução nesta thread (None fora de um callback instrumentado)
+_local = threading.local()
+
+# =============================================================================
+# 1. HISTOGRAMAS NO FORMATO DO PROMETHEUS
+# =============================================================================
+
+def _rotulos_texto(rotulos):
+    def escapar(valor):
+        return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return ",".join(f'{nome}="{escapar(valor)}"' for nome, valor in rotulos)
+
+class Histograma:
+    """Histograma cumulativo por conjunto de rótulos, exportado no formato de texto do Prometheus."""
+
+    def __init__(self, nome, descricao, limites):
+        self.nome = nome
+        self.descricao = descricao
+        self.limites = limites
+        self._series = {}
+
+    def observar(self, rotulos, valor):
+        serie = self._series.get(rotulos)
+        if serie is None:
+            serie = self._series[rotulos] = [[0] * (len(self.limites) + 1), 0.0, 0]
+        serie[0][bisect_left(self.limites, valor)] += 1
+        serie[1] += valor
+        serie[2] += 1
+
+    def exportar(self):
+        linhas = [f"# HELP {self.nome} {self.descricao}", f"# TYPE {self.nome} histogram"]
+        for rotulos, (contagens, soma, total) in sorted(self._series.items()):
+            acumulado = 0
+            for limite, contagem in zip(self.limites + (float("inf"),), contagens):
+                acumulado += contagem
+                le = "+Inf" if limite == float("inf") else repr(limite)
+                linhas.append(f"{self.nome}_bucket{{{_rotulos_texto(rotulos + (('le', le),))}}} {acumulado}")
+            linhas.append(f"{self.nome}_sum{{{_rotulos_texto(rotulos)}}} {soma}")
+            linhas.append(f"{self.nome}_count{{{_rotulos_texto(rotulos)}}} {total}")
+        return linhas
+
+# =============================================================================
+# 2. INSTRUMENTAÇÃO DOS CALLBACKS
+# =============================================================================
+
+@contextlib.contextmanager
+def fase(nome):
+    """Conta o tempo do bloco na fase `nome` do callback em execução; fora de um callback (ou dentro de outra fase) não faz nada."""
+    fases = getattr(_local, "fases", None)
+    if fases is None or getattr(_local, "fase_atual", None) is not None:
+        yield
+        return
+    _local.fase_atual = nome
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        fases[nome] = fases.get(nome, 0.0) + time.perf_counter() - inicio
+        _local.fase_atual = None
+
+def _primeira_saida(chave_callback):
+    # "..grafico-a.figure...grafico-b.figure.." (várias saídas) ou "grafico-a.figure"
+    return chave_callback.strip(".").split("...")[0].rsplit(".", 1)[0]
+
+class Instrumentacao:
+    """
+    Métricas dos callbacks de um app Dash.
+
+    - computação: tempo dentro da função do callback;
+    - fases: a computação dividida entre 'figura' (blocos marcados com `fase('figura')`)
+      e 'dados' (o restante), com o rótulo `fase`;
+    - pedido: tempo total do pedido HTTP, que inclui também a serialização da resposta em JSON;
+    - payload: bytes da resposta enviada ao navegador;
+    - caches: acertos e falhas das caches registadas com `registrar_cache`.
+
+    Os callbacks em segundo plano correm num processo filho; as medições feitas lá
+    chegam ao processo do servidor por um pipe criado antes do fork; o tempo de pedido
+    e o payload desses callbacks contam cada consulta do navegador ao estado da tarefa.
+    """
+
+    def __init__(self, limite_lento_ms=LIMITE_CALLBACK_LENTO_MS):
+        self.limite_lento_ms = limite_lento_ms
+        self.computacao = Histograma("dash_callback_computacao_segundos", "Tempo de execucao da funcao do callback.", LIMITES_SEGUNDOS)
+        self.fases = Histograma("dash_callback_fase_segundos", "Tempo de execucao do callback por fase (dados ou figura).", LIMITES_SEGUNDOS)
+        self.pedido = Histograma("dash_callback_pedido_segundos", "Tempo total do pedido, incluindo a serializacao da resposta.", LIMITES_SEGUNDOS)
+        self.payload = Histograma("dash_callback_payload_bytes", "Tamanho da resposta do callback em bytes.", LIMITES_BYTES)
+        self._caches = {}
+        self._rotulos = {}
+        self._lock = threading.Lock()
+        self._abrir_pipe()
+
+    def _abrir_pipe(self):
+        # O processo dono das métricas é o que atende os pedidos; os restantes escrevem no pipe
+        self._pid = os.getpid()
+        self._leitura, self._escrita = os.pipe()
+        os.set_blocking(self._leitura, False)
+        os.set_blocking(self._escrita, False)
+
+    # --- Registo ---
+    def _observar_computacao(self, rotulos, segundos, fases):
+        if os.getpid() != self._pid:
+            # Processo de uma tarefa em segundo plano: escritas menores que PIPE_BUF são atómicas.
+            # Se o pipe estiver cheio (métricas nunca lidas) a medição é descartada.
+            try:
+                os.write(self._escrita, (json.dumps([list(rotulos), segundos, fases]) + "\n").encode())
+            except BlockingIOError:
+                pass
+            return
+        with self._lock:
+            self._registrar_computacao(rotulos, segundos, fases)
+
+    def _registrar_computacao(self, rotulos, segundos, fases):
+        self.computacao.observar(rotulos, segundos)
+        # O que não foi marcado como outra fase conta como 'dados'
+        fases = {**dict.fromkeys(FASES, 0.0), **fases}
+        fases['dados'] = max(segundos - sum(t for nome, t in fases.items() if nome != 'dados'), 0.0)
+        for nome, tempo in fases.items():
+            self.fases.observar(rotulos + (("fase", nome),), tempo)
+
+    def _recolher_processos_filhos(self):
+        pendente = b""
+        while True:
+            try:
+                bloco = os.read(self._leitura, 65536)
+            except BlockingIOError:
+                break
+            if not bloco:
+                break
+            pendente += bloco
+        for linha in pendente.decode().splitlines():
+            rotulos, segundos, fases = json.loads(linha)
+            self._registrar_computacao(tuple(tuple(r) for r in rotulos), segundos, fases)
+
+    def registrar_cache(self, nome, estatisticas):
+        """`estatisticas` é uma função sem argumentos que devolve (acertos, falhas)."""
+        self._caches[nome] = estatisticas
+
+    def registrar_lru_cache(self, funcao, nome=None):
+        self.registrar_cache(nome or funcao.__name__, lambda: tuple(funcao.cache_info())[:2])
+
+    # --- Integração com o Dash/Flask ---
+    def instrumentar(self, app):
+        """Passa a medir todos os callbacks registados com `app.callback` a partir daqui e publica a rota de métricas."""
+        callback_original = app.callback
+
+        def callback_instrumentado(*args, **kwargs):
+            antes = set(app.callback_map)
+            decorador = callback_original(*args, **kwargs)
+            # O Dash regista a chave do callback (as suas saídas) antes de receber a função
+            chaves = set(app.callback_map) - antes
+            chave = chaves.pop() if chaves else None
+
+            def registrar(funcao):
+                # Funções registadas várias vezes (ex.: uma por cartão) distinguem-se pela primeira saída
+                rotulos = (("callback", funcao.__name__), ("saida", _primeira_saida(chave) if chave else ""))
+                if chave:
+                    self._rotulos[chave] = rotulos
+
+                @functools.wraps(funcao)
+                def medida(*a, **kw):
+                    _local.fases, _local.fase_atual = {}, None
+                    inicio = time.perf_counter()
+                    try:
+                        return funcao(*a, **kw)
+                    finally:
+                        segundos = time.perf_counter() - inicio
+                        fases, _local.fases = _local.fases, None
+                        self._observar_computacao(rotulos, segundos, fases)
+                        if self.limite_lento_ms and segundos * 1000 >= self.limite_lento_ms:
+                            # O primeiro argumento dos callbacks com progresso é a função set_progress
+                            entradas = [x for x in a if not callable(x)]
+                            print(f"[callback lento] {rotulos[0][1]} ({rotulos[1][1]}): {segundos * 1000:.0f} ms; entradas={entradas}")
+
+                return decorador(medida)
+            return registrar
+
+        app.callback = callback_instrumentado
+        server = app.server
+
+        @server.before_request
+        def _inicio_pedido():
+            if os.getpid() != self._pid:
+                # Primeiro pedido num worker criado por fork (ex.: gunicorn com preload): pipe próprio
+                with self._lock:
+                    if os.getpid() != self._pid:
+                        os.close(self._leitura)
+                        os.close(self._escrita)
+                        self._abrir_pipe()
+            if request.path.endswith(ROTA_CALLBACKS):
+                g.inicio_callback = time.perf_counter()
+
+        @server.after_request
+        def _fim_pedido(response):
+            inicio = g.pop("inicio_callback", None)
+            if inicio is None:
+                return response
+            corpo = request.get_json(silent=True) or {}
+            rotulos = self._rotulos.get(corpo.get("output"), (("callback", "desconhecido"), ("saida", str(corpo.get("output")))))
+            tamanho = response.calculate_content_length()
+            with self._lock:
+                self.pedido.observar(rotulos, time.perf_counter() - inicio)
+                if tamanho is not None:
+                    self.payload.observar(rotulos, tamanho)
+            return response
+
+        server.add_url_rule(ROTA_METRICAS, "metricas_callbacks", lambda: Response(self.exportar(), mimetype="text/plain; version=0.0.4"))
+        return self
+
+    def exportar(self):
+        with self._lock:
+            self._recolher_processos_filhos()
+            linhas = self.computacao.exportar() + self.fases.exportar() + self.pedido.exportar() + self.payload.exportar()
+        linhas += ["# HELP dash_cache_acertos_total Acertos das caches de dados do dashboard.", "# TYPE dash_cache_acertos_total counter"]
+        estatisticas = {nome: estatisticas() for nome, estatisticas in sorted(self._caches.items())}
+        linhas += [f'dash_cache_acertos_total{{cache="{nome}"}} {acertos}' for nome, (acertos, _) in estatisticas.items()]
+        linhas += ["# HELP dash_cache_falhas_total Falhas das caches de dados do dashboard.", "# TYPE dash_cache_falhas_total counter"]
+        linhas += [f'dash_cache_falhas_total{{cache="{nome}"}} {falhas}' for nome, (_, falhas) in estatisticas.items()]
+        return "\n".join(linhas) + "\n"
+
+def instrumentar(app, ativa=INSTRUMENTACAO_ATIVA):
+    """Instrumenta o app (ou devolve None se INSTRUMENTACAO_ATIVA=0)."""
+    return Instrumentacao().instrumentar(app) if ativa else None
@@ -1,6 +1,8 @@
 import pandas as pd
 import numpy as np
 
+import armazenamento_clima
+
 try:
     # --- 1. Carregar os dados a partir dos arquivos CSV ---
     print("Lendo os arquivos CSV exportados...")
@@ -10,7 +12,6 @@ try:
     df_fazendas = pd.read_csv('db_fazendas.csv')
     df_solo_raw = pd.read_csv('db_analises_solo.csv')
     df_oni = pd.read_csv('oni_data.csv')
-    df_clima = pd.read_csv('Dados_Climaticos_INMET.csv')
     print("Todos os arquivos CSV foram lidos com sucesso.")
 
     # --- 2. Juntar os dados para recriar o dataframe principal ---
@@ -51,6 +52,12 @@ try:
 
     # --- 4. Engenharia de Features Climáticas ---
     print("Iniciando engenharia de features climáticas (pode levar alguns instantes)...")
+    # Lê apenas as partições climáticas que cobrem os ciclos das safras
+    inicio_ciclos, fim_ciclos = df_agricola['data_plantio'].min(), df_agricola['data_colheita_real'].max()
+    if armazenamento_clima.estacao_disponivel(armazenamento_clima.ESTACAO_INMET):
+        df_clima = armazenamento_clima.read_range(armazenamento_clima.ESTACAO_INMET, inicio_ciclos, fim_ciclos, columns=['PRECIPITACAO_TOTAL_HORARIO_mm', 'TEMPERATURA_AR_BULBO_SECO_HORARIA_C'])
+    else:
+        df_clima = pd.read_csv('Dados_Climaticos_INMET.csv')
     df_clima.rename(columns={
         'PRECIPITACAO_TOTAL_HORARIO_mm': 'precipitacao_mm',
         'TEMPERATURA_AR_BULBO_SECO_HORARIA_C': 'temperatura_c'
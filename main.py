@@ -4,10 +4,11 @@ from database import SessionLocal, engine
 import models
 import operations
 import reports
+import migrations
 
 def main():
-    # Cria as tabelas no banco de dados
-    models.Base.metadata.create_all(bind=engine)
+    # Cria as tabelas e aplica as migrações pendentes (índices) no banco de dados
+    migrations.atualizar_esquema(engine)
     
     # Obtém uma sessão do banco
     db = SessionLocal()
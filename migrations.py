@@ -0,0 +1,96 @@
+# projeto_agricola/migrations.py
+from datetime import datetime
+from sqlalchemy import text
+from database import engine
+import models
+import resumo_safras
+
+# =============================================================================
+# 0. MIGRAÇÕES DO ESQUEMA
+# =============================================================================
+# `create_all` só cria tabelas novas: não acrescenta índices a um
+# gestao_agricola.db já existente. Cada migração tem um número de versão e é
+# aplicada uma única vez; a versão atual fica registada na tabela `schema_versao`.
+# Os nomes dos índices são os mesmos declarados em models.py, para que uma base
+# criada do zero e uma base migrada fiquem iguais.
+
+MIGRACOES = [
+    (1, "Índices das chaves estrangeiras e das consultas por cultura/data", [
+        "CREATE INDEX IF NOT EXISTS ix_talhoes_fazenda_id ON talhoes (fazenda_id)",
+        "CREATE INDEX IF NOT EXISTS ix_safras_talhao_plantio ON safras (talhao_id, data_plantio)",
+        "CREATE INDEX IF NOT EXISTS ix_safras_cultura_id ON safras (cultura_id)",
+        "CREATE INDEX IF NOT EXISTS ix_atividades_agricolas_safra_id ON atividades_agricolas (safra_id)",
+        "CREATE INDEX IF NOT EXISTS ix_contratos_venda_safra_id ON contratos_venda (safra_id)",
+        "CREATE INDEX IF NOT EXISTS ix_analises_solo_talhao_data ON analises_solo (talhao_id, data_analise)",
+        "CREATE INDEX IF NOT EXISTS ix_precos_mercado_cultura_data ON precos_mercado (cultura_nome, data)",
+    ]),
+    (2, "Estatísticas do planeador de consultas", [
+        "ANALYZE",
+    ]),
+    (3, "Tabela safra_resumo preenchida a partir dos dados existentes", [
+        lambda conn: models.SafraResumo.__table__.create(conn, checkfirst=True),
+        # atualizar_resumo_safras grava também o estado das tabelas de origem (migração 4)
+        lambda conn: models.SafraResumoEstado.__table__.create(conn, checkfirst=True),
+        resumo_safras.atualizar_resumo_safras,
+    ]),
+    (4, "Estado das tabelas de origem gravado com safra_resumo", [
+        lambda conn: models.SafraResumoEstado.__table__.create(conn, checkfirst=True),
+        resumo_safras.atualizar_resumo_safras,
+    ]),
+]
+
+# =============================================================================
+# 1. CONTROLE DE VERSÃO
+# =============================================================================
+
+def _criar_tabela_versao(conn):
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS schema_versao (
+            versao INTEGER PRIMARY KEY,
+            descricao VARCHAR,
+            aplicada_em VARCHAR
+        )
+    """))
+
+def versao_atual(db_engine=engine):
+    """Maior versão de migração já aplicada (0 para uma base nunca migrada)."""
+    with db_engine.begin() as conn:
+        _criar_tabela_versao(conn)
+        return conn.execute(text("SELECT COALESCE(MAX(versao), 0) FROM schema_versao")).scalar()
+
+def aplicar_migracoes(db_engine=engine, ate_versao=None):
+    """
+    Aplica, por ordem, as migrações ainda não registadas.
+
+    Cada migração corre na sua própria transação junto com o registo da versão,
+    de modo que uma falha não deixa a base marcada como migrada pela metade.
+    Retorna a lista de versões aplicadas.
+    """
+    versao = versao_atual(db_engine)
+    aplicadas = []
+    for numero, descricao, comandos in MIGRACOES:
+        if numero <= versao or (ate_versao is not None and numero > ate_versao):
+            continue
+        with db_engine.begin() as conn:
+            for comando in comandos:
+                # Passos que não são SQL puro recebem a conexão da transação da migração
+                if callable(comando):
+                    comando(conn)
+                else:
+                    conn.execute(text(comando))
+            conn.execute(
+                text("INSERT INTO schema_versao (versao, descricao, aplicada_em) VALUES (:versao, :descricao, :aplicada_em)"),
+                {"versao": numero, "descricao": descricao, "aplicada_em": datetime.now().isoformat(timespec="seconds")}
+            )
+        print(f"Migração {numero} aplicada: {descricao}")
+        aplicadas.append(numero)
+    return aplicadas
+
+def atualizar_esquema(db_engine=engine):
+    """Cria as tabelas que faltam e aplica as migrações pendentes."""
+    models.Base.metadata.create_all(bind=db_engine)
+    return aplicar_migracoes(db_engine)
+
+if __name__ == "__main__":
+    aplicadas = atualizar_esquema()
+    print(f"Esquema na versão {versao_atual()}." if aplicadas else f"Nenhuma migração pendente (versão {versao_atual()}).")
@@ -1,5 +1,5 @@
 from sqlalchemy import (Column, Integer, String, Float, Date, ForeignKey, 
-                        UniqueConstraint)
+                        UniqueConstraint, Index)
 from sqlalchemy.orm import relationship
 from database import Base
 
@@ -13,7 +13,7 @@ class Fazenda(Base):
 class Talhao(Base):
     __tablename__ = "talhoes"
     id = Column(Integer, primary_key=True, index=True)
-    fazenda_id = Column(Integer, ForeignKey("fazendas.id"))
+    fazenda_id = Column(Integer, ForeignKey("fazendas.id"), index=True)
     identificador = Column(String, unique=True, index=True)
     area_ha = Column(Float)
     fazenda = relationship("Fazenda", back_populates="talhoes")
@@ -39,7 +39,7 @@ class Safra(Base):
     __tablename__ = "safras"
     id = Column(Integer, primary_key=True, index=True)
     talhao_id = Column(Integer, ForeignKey("talhoes.id"))
-    cultura_id = Column(Integer, ForeignKey("culturas.id"))
+    cultura_id = Column(Integer, ForeignKey("culturas.id"), index=True)
     data_plantio = Column(Date)
     data_colheita_prevista = Column(Date)
     data_colheita_real = Column(Date, nullable=True)
@@ -48,11 +48,12 @@ class Safra(Base):
     cultura = relationship("Cultura")
     atividades = relationship("AtividadeAgricola", back_populates="safra")
     contratos_venda = relationship("ContratoVenda", back_populates="safra")
+    __table_args__ = (Index('ix_safras_talhao_plantio', 'talhao_id', 'data_plantio'),)
 
 class AtividadeAgricola(Base):
     __tablename__ = "atividades_agricolas"
     id = Column(Integer, primary_key=True, index=True)
-    safra_id = Column(Integer, ForeignKey("safras.id"))
+    safra_id = Column(Integer, ForeignKey("safras.id"), index=True)
     tipo_atividade = Column(String)
     produto_utilizado = Column(String, nullable=True)
     quantidade_aplicada_ha = Column(Float)
@@ -74,11 +75,12 @@ class AnaliseSolo(Base):
     potassio_ppm = Column(Float)
     materia_organica_percent = Column(Float)
     talhao = relationship("Talhao", back_populates="analises_solo")
+    __table_args__ = (Index('ix_analises_solo_talhao_data', 'talhao_id', 'data_analise'),)
 
 class ContratoVenda(Base):
     __tablename__ = "contratos_venda"
     id = Column(Integer, primary_key=True, index=True)
-    safra_id = Column(Integer, ForeignKey("safras.id"))
+    safra_id = Column(Integer, ForeignKey("safras.id"), index=True)
     data_venda = Column(Date)
     quantidade_kg = Column(Float)
     preco_venda_kg = Column(Float)
@@ -90,5 +92,28 @@ class PrecoMercado(Base):
     data = Column(Date)
     cultura_nome = Column(String)
     preco_fecho_kg = Column(Float)
-    __table_args__ = (UniqueConstraint('data', 'cultura_nome', name='_data_cultura_uc'),)
+    __table_args__ = (
+        UniqueConstraint('data', 'cultura_nome', name='_data_cultura_uc'),
+        Index('ix_precos_mercado_cultura_data', 'cultura_nome', 'data'),
+    )
 
+
+class SafraResumo(Base):
+    """Indicadores consolidados por safra, mantidos por resumo_safras.atualizar_resumo_safras."""
+    __tablename__ = "safra_resumo"
+    safra_id = Column(Integer, ForeignKey("safras.id"), primary_key=True)
+    custo_total_ha = Column(Float)
+    receita_potencial_ha = Column(Float, nullable=True)
+    lucro_potencial_ha = Column(Float, nullable=True)
+    receita_realizada_ha = Column(Float, nullable=True)
+    lucro_ha = Column(Float, nullable=True)
+    analise_solo_id = Column(Integer, ForeignKey("analises_solo.id"), nullable=True)
+    fase_enos = Column(String, nullable=True)
+
+
+class SafraResumoEstado(Base):
+    """Contagem e maior id de cada tabela de origem na última atualização de safra_resumo."""
+    __tablename__ = "safra_resumo_estado"
+    tabela = Column(String, primary_key=True)
+    linhas = Column(Integer)
+    maior_id = Column(Integer, nullable=True)
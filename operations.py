@@ -1,6 +1,8 @@
 from datetime import date, timedelta
+from sqlalchemy import insert, update
 from sqlalchemy.orm import Session
 import models
+import resumo_safras
 
 def criar_dados_iniciais(db: Session):
     """Cria dados básicos de culturas e fazendas, se não existirem."""
@@ -23,78 +25,211 @@ def criar_dados_iniciais(db: Session):
         db.add_all(fazendas)
     db.commit()
 
+# =============================================================================
+# CACHE DE CONSULTAS POR SESSÃO
+# =============================================================================
+def _cache_consultas(db: Session):
+    return db.info.setdefault('cache_consultas', {})
+
+def limpar_cache_consultas(db: Session):
+    """Descarta os nomes já resolvidos nesta sessão (ex.: depois de apagar os cadastros)."""
+    db.info.pop('cache_consultas', None)
+
+def _resolver_nomes(db: Session, modelo, nomes, *colunas):
+    """
+    Resolve nomes para (id, *colunas) com uma única consulta IN por lote.
+
+    Os resultados ficam guardados na sessão, de modo que lotes seguintes não
+    voltam a consultar os mesmos nomes. Para nomes repetidos vale o menor id,
+    como o `.first()` das funções individuais.
+    """
+    cache = _cache_consultas(db).setdefault(modelo.__tablename__, {})
+    faltantes = {nome for nome in nomes if nome and nome not in cache}
+    if faltantes:
+        consulta = db.query(modelo.nome, modelo.id, *colunas).filter(modelo.nome.in_(faltantes)).order_by(modelo.id)
+        for nome, *valores in consulta:
+            cache.setdefault(nome, tuple(valores))
+    return cache
+
+def _ids_existentes(db: Session, modelo, ids):
+    ids = {i for i in ids if i is not None}
+    if not ids:
+        return set()
+    return {i for (i,) in db.query(modelo.id).filter(modelo.id.in_(ids))}
+
+# =============================================================================
+# ESCRITA EM LOTE (UMA TRANSAÇÃO POR CHAMADA)
+# =============================================================================
+def adicionar_talhoes_em_lote(db: Session, registros: list):
+    """
+    Adiciona vários talhões numa única transação.
+
+    Cada registro é um dict com `fazenda_nome`, `identificador` e `area_ha`.
+    Retorna a lista de talhões criados, alinhada com `registros` (None para os inválidos).
+    """
+    fazendas = _resolver_nomes(db, models.Fazenda, [r['fazenda_nome'] for r in registros])
+    talhoes = []
+    for registro in registros:
+        fazenda = fazendas.get(registro['fazenda_nome'])
+        if not fazenda:
+            print(f"Erro: Fazenda '{registro['fazenda_nome']}' não encontrada.")
+            talhoes.append(None)
+            continue
+        talhoes.append(models.Talhao(identificador=registro['identificador'], area_ha=registro['area_ha'], fazenda_id=fazenda[0]))
+
+    db.add_all([t for t in talhoes if t is not None])
+    db.commit()
+    return talhoes
+
+def registrar_plantios_em_lote(db: Session, registros: list):
+    """
+    Regista o início de várias safras numa única transação.
+
+    Cada registro é um dict com `talhao_id`, `cultura_nome` e `data_plantio`.
+    Retorna a lista de safras criadas, alinhada com `registros` (None para os inválidos).
+    """
+    culturas = _resolver_nomes(db, models.Cultura, [r['cultura_nome'] for r in registros], models.Cultura.ciclo_fisiologico_dias)
+    talhoes_validos = _ids_existentes(db, models.Talhao, [r['talhao_id'] for r in registros])
+    safras = []
+    for registro in registros:
+        cultura = culturas.get(registro['cultura_nome'])
+        if not cultura or registro['talhao_id'] not in talhoes_validos:
+            print("Erro: Cultura ou Talhão não encontrado.")
+            safras.append(None)
+            continue
+        cultura_id, ciclo_dias = cultura
+        safras.append(models.Safra(
+            talhao_id=registro['talhao_id'],
+            cultura_id=cultura_id,
+            data_plantio=registro['data_plantio'],
+            data_colheita_prevista=registro['data_plantio'] + timedelta(days=ciclo_dias)
+        ))
+
+    db.add_all([s for s in safras if s is not None])
+    db.flush()
+    resumo_safras.atualizar_resumo_safras(db, [s.id for s in safras if s is not None])
+    db.commit()
+    return safras
+
+def _inserir_atividades(db: Session, registros: list):
+    """Valida e insere atividades em lote, sem confirmar a transação. Retorna o nº inserido."""
+    safras_validas = _ids_existentes(db, models.Safra, [r['safra_id'] for r in registros])
+    maquinas = _resolver_nomes(db, models.Maquina, [r.get('maquina_nome') for r in registros])
+    linhas = []
+    for registro in registros:
+        if registro['safra_id'] not in safras_validas:
+            print("Erro: Safra não encontrada.")
+            continue
+        maquina = maquinas.get(registro.get('maquina_nome')) if registro.get('maquina_nome') else None
+        linhas.append({
+            'safra_id': registro['safra_id'],
+            'tipo_atividade': registro['tipo'],
+            'produto_utilizado': registro.get('produto'),
+            'quantidade_aplicada_ha': registro.get('qtd'),
+            'unidade': registro.get('unidade'),
+            'data_execucao': registro['data'],
+            'maquina_id': maquina[0] if maquina else None,
+            'custo_total_ha': registro.get('custo_ha', 0.0),
+            'operador': registro.get('operador'),
+        })
+    if linhas:
+        db.execute(insert(models.AtividadeAgricola), linhas)
+    return len(linhas)
+
+def registrar_atividades_em_lote(db: Session, registros: list):
+    """
+    Regista várias atividades agrícolas numa única transação com inserção em lote.
+
+    Cada registro é um dict com `safra_id`, `tipo`, `produto`, `qtd`, `unidade`,
+    `data` e, opcionalmente, `maquina_nome`, `custo_ha` e `operador`.
+    Retorna o número de atividades inseridas.
+    """
+    inseridas = _inserir_atividades(db, registros)
+    resumo_safras.atualizar_resumo_safras(db, [r['safra_id'] for r in registros])
+    db.commit()
+    return inseridas
+
+def registrar_colheitas_em_lote(db: Session, registros: list):
+    """
+    Regista os dados finais de colheita de várias safras numa única transação.
+
+    Cada registro é um dict com `safra_id`, `data_colheita`, `produtividade`,
+    `maquina_nome` e, opcionalmente, `custo_operacional_ha` e `operador`.
+    Retorna o número de colheitas registadas.
+    """
+    safras_validas = _ids_existentes(db, models.Safra, [r['safra_id'] for r in registros])
+    validos = []
+    for registro in registros:
+        if registro['safra_id'] not in safras_validas:
+            print("Erro: Safra não encontrada.")
+            continue
+        validos.append(registro)
+    if not validos:
+        return 0
+
+    db.execute(update(models.Safra), [
+        {'id': r['safra_id'], 'data_colheita_real': r['data_colheita'], 'produtividade_kg_ha': r['produtividade']}
+        for r in validos
+    ])
+    # Regista a colheita como uma atividade também, para consolidar custos e operadores
+    _inserir_atividades(db, [{
+        'safra_id': r['safra_id'], 'tipo': 'Colheita', 'produto': 'N/A', 'qtd': r['produtividade'], 'unidade': 'kg/ha',
+        'data': r['data_colheita'], 'maquina_nome': r.get('maquina_nome'), 'custo_ha': r.get('custo_operacional_ha', 0.0),
+        'operador': r.get('operador')
+    } for r in validos])
+    resumo_safras.atualizar_resumo_safras(db, [r['safra_id'] for r in validos])
+    db.commit()
+    return len(validos)
+
+def registrar_contratos_venda_em_lote(db: Session, registros: list):
+    """
+    Regista vários contratos de venda numa única transação.
+
+    Cada registro é um dict com `safra_id`, `data_venda`, `quantidade_kg` e `preco_venda_kg`.
+    Retorna o número de contratos registados.
+    """
+    safras_validas = _ids_existentes(db, models.Safra, [r['safra_id'] for r in registros])
+    linhas = []
+    for registro in registros:
+        if registro['safra_id'] not in safras_validas:
+            print("Erro: Safra não encontrada.")
+            continue
+        linhas.append({k: registro[k] for k in ('safra_id', 'data_venda', 'quantidade_kg', 'preco_venda_kg')})
+    if not linhas:
+        return 0
+
+    db.execute(insert(models.ContratoVenda), linhas)
+    resumo_safras.atualizar_resumo_safras(db, [l['safra_id'] for l in linhas])
+    db.commit()
+    return len(linhas)
+
+# =============================================================================
+# ESCRITA INDIVIDUAL (DELEGA PARA O CAMINHO EM LOTE)
+# =============================================================================
 def adicionar_talhao(db: Session, fazenda_nome: str, identificador: str, area_ha: float):
     """Adiciona um novo talhão a uma fazenda existente."""
-    fazenda = db.query(models.Fazenda).filter(models.Fazenda.nome == fazenda_nome).first()
-    if not fazenda:
-        print(f"Erro: Fazenda '{fazenda_nome}' não encontrada.")
-        return None
-    
-    novo_talhao = models.Talhao(identificador=identificador, area_ha=area_ha, fazenda_id=fazenda.id)
-    db.add(novo_talhao)
-    db.commit()
-    db.refresh(novo_talhao)
-    return novo_talhao
+    return adicionar_talhoes_em_lote(db, [{'fazenda_nome': fazenda_nome, 'identificador': identificador, 'area_ha': area_ha}])[0]
 
 def registrar_plantio(db: Session, talhao_id: int, cultura_nome: str, data_plantio: date):
     """Regista o início de uma nova safra num talhão."""
-    cultura = db.query(models.Cultura).filter(models.Cultura.nome == cultura_nome).first()
-    talhao = db.query(models.Talhao).get(talhao_id)
-    if not cultura or not talhao:
-        print("Erro: Cultura ou Talhão não encontrado.")
-        return None
-
-    data_colheita_prevista = data_plantio + timedelta(days=cultura.ciclo_fisiologico_dias)
-    nova_safra = models.Safra(
-        talhao_id=talhao_id,
-        cultura_id=cultura.id,
-        data_plantio=data_plantio,
-        data_colheita_prevista=data_colheita_prevista
-    )
-    db.add(nova_safra)
-    db.commit()
-    db.refresh(nova_safra)
-    return nova_safra
+    return registrar_plantios_em_lote(db, [{'talhao_id': talhao_id, 'cultura_nome': cultura_nome, 'data_plantio': data_plantio}])[0]
 
 def registrar_atividade(db: Session, safra_id: int, tipo: str, produto: str, qtd: float, unidade: str, data: date, maquina_nome: str = None, custo_ha: float = 0.0, operador: str = None):
     """Regista uma atividade agrícola, incluindo os seus custos e operador."""
-    safra = db.query(models.Safra).get(safra_id)
-    if not safra:
-        print("Erro: Safra não encontrada.")
-        return None
-        
-    maquina_id = None
-    if maquina_nome:
-        maquina = db.query(models.Maquina).filter(models.Maquina.nome == maquina_nome).first()
-        if maquina:
-            maquina_id = maquina.id
-
-    nova_atividade = models.AtividadeAgricola(
-        safra_id=safra_id,
-        tipo_atividade=tipo,
-        produto_utilizado=produto,
-        quantidade_aplicada_ha=qtd,
-        unidade=unidade,
-        data_execucao=data,
-        maquina_id=maquina_id,
-        custo_total_ha=custo_ha,
-        operador=operador
-    )
-    db.add(nova_atividade)
-    db.commit()
+    registrar_atividades_em_lote(db, [{
+        'safra_id': safra_id, 'tipo': tipo, 'produto': produto, 'qtd': qtd, 'unidade': unidade, 'data': data,
+        'maquina_nome': maquina_nome, 'custo_ha': custo_ha, 'operador': operador
+    }])
 
 def registrar_colheita(db: Session, safra_id: int, data_colheita: date, produtividade: float, maquina_nome: str, custo_operacional_ha: float = 0.0, operador: str = None):
     """Regista os dados finais de colheita de uma safra."""
-    safra = db.query(models.Safra).get(safra_id)
-    if not safra:
-        print("Erro: Safra não encontrada.")
-        return
-
-    safra.data_colheita_real = data_colheita
-    safra.produtividade_kg_ha = produtividade
-    
-    # Regista a colheita como uma atividade também, para consolidar custos e operadores
-    registrar_atividade(db, safra_id, 'Colheita', 'N/A', produtividade, 'kg/ha', data_colheita, maquina_nome, custo_operacional_ha, operador)
-    
-    db.commit()
+    registrar_colheitas_em_lote(db, [{
+        'safra_id': safra_id, 'data_colheita': data_colheita, 'produtividade': produtividade,
+        'maquina_nome': maquina_nome, 'custo_operacional_ha': custo_operacional_ha, 'operador': operador
+    }])
 
+def registrar_contrato_venda(db: Session, safra_id: int, data_venda: date, quantidade_kg: float, preco_venda_kg: float):
+    """Regista um contrato de venda de parte da produção de uma safra."""
+    registrar_contratos_venda_em_lote(db, [{
+        'safra_id': safra_id, 'data_venda': data_venda, 'quantidade_kg': quantidade_kg, 'preco_venda_kg': preco_venda_kg
+    }])
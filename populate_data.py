@@ -1,8 +1,18 @@
 import random
+import argparse
+import time
 from datetime import date, timedelta
+import numpy as np
+import pandas as pd
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session
 from database import SessionLocal, engine
+import database
 import models
 import operations
+import migrations
+import resumo_safras
+import export_data
 
 # =============================================================================
 # 0. CONFIGURAÇÕES DA GERAÇÃO DE DADOS
@@ -13,6 +23,13 @@ NUM_ANOS_SIMULACAO = 8
 CULTURAS_COMERCIAIS = ["Soja", "Milho", "Algodão"]
 OPERADORES = ["Carlos Silva", "João Pereira", "Marcos Costa", "Lucas Martins", "Rafael Souza"]
 PRECO_COMBUSTIVEL_LT = 5.80 # R$/L
+RENDIMENTO_HA_H = {"Plantadeira": 8, "Pulverizador": 20, "Colheitadeira": 7}
+
+# Configurações do modo de geração em massa (testes de carga e escala)
+NUM_FAZENDAS_MASSA = 30
+NUM_TALHOES_MASSA = 10000
+UFS_FAZENDAS = ["MT", "GO", "BA", "MS", "PR", "TO", "MA", "PI"]
+TAMANHO_LOTE_MASSA = 50000
 
 # Tabela de preços de insumos
 CUSTOS_OPERACIONAIS = {
@@ -36,6 +53,7 @@ def limpar_banco_de_dados(db_session):
     """Apaga todos os dados das tabelas para um novo preenchimento."""
     print("Limpando a base de dados...")
     # Ordem inversa para respeitar chaves estrangeiras
+    db_session.query(models.SafraResumo).delete()
     db_session.query(models.PrecoMercado).delete()
     db_session.query(models.ContratoVenda).delete()
     db_session.query(models.AnaliseSolo).delete()
@@ -46,38 +64,52 @@ def limpar_banco_de_dados(db_session):
     db_session.query(models.Cultura).delete()
     db_session.query(models.Maquina).delete()
     db_session.commit()
+    operations.limpar_cache_consultas(db_session)
+    # Os ids recomeçam: as exportações incrementais anteriores deixam de valer
+    export_data.invalidar_marcas(export_data.TABELAS_PADRAO)
+
+MAQUINAS_INICIAIS = [
+    {"nome": "John Deere DB74", "tipo": "Plantadeira", "custo_hora_operacao": 150.0, "consumo_combustivel_l_h": 25.0},
+    {"nome": "Case IH Axial-Flow 9250", "tipo": "Colheitadeira", "custo_hora_operacao": 220.0, "consumo_combustivel_l_h": 35.0},
+    {"nome": "Stara Imperador 3.0", "tipo": "Pulverizador", "custo_hora_operacao": 110.0, "consumo_combustivel_l_h": 18.0},
+]
 
 def criar_dados_iniciais_completos(db):
     operations.criar_dados_iniciais(db)
     if db.query(models.Maquina).count() == 0:
-        maquinas = [
-            models.Maquina(nome="John Deere DB74", tipo="Plantadeira", custo_hora_operacao=150.0, consumo_combustivel_l_h=25.0),
-            models.Maquina(nome="Case IH Axial-Flow 9250", tipo="Colheitadeira", custo_hora_operacao=220.0, consumo_combustivel_l_h=35.0),
-            models.Maquina(nome="Stara Imperador 3.0", tipo="Pulverizador", custo_hora_operacao=110.0, consumo_combustivel_l_h=18.0),
-        ]
+        maquinas = [models.Maquina(**dados) for dados in MAQUINAS_INICIAIS]
         db.add_all(maquinas); db.commit()
 
+def carregar_maquinas_por_tipo(db):
+    """Consulta as máquinas uma única vez, indexadas pelo tipo."""
+    maquinas = {}
+    for maquina in db.query(models.Maquina).all():
+        maquinas.setdefault(maquina.tipo, maquina)
+    return maquinas
+
+def calcular_custo_op_ha(tipo, custo_hora_operacao, consumo_combustivel_l_h):
+    horas_op = 1 / RENDIMENTO_HA_H[tipo]
+    return (horas_op * consumo_combustivel_l_h * PRECO_COMBUSTIVEL_LT) + (horas_op * custo_hora_operacao)
+
 def gerar_analise_solo(db, talhao, ano):
     analise = models.AnaliseSolo(talhao_id=talhao.id, data_analise=date(ano, 5, 15), ph=round(random.uniform(4.8, 6.2), 2), fosforo_ppm=round(random.uniform(5.0, 25.0), 2), potassio_ppm=round(random.uniform(40.0, 150.0), 2), materia_organica_percent=round(random.uniform(1.5, 3.5), 2))
     db.add(analise); db.commit()
 
-def gerar_safra_sintetica(db, talhao, cultura_nome, start_date):
+def gerar_safra_sintetica(db, talhao, cultura_nome, start_date, maquinas):
     safra = operations.registrar_plantio(db, talhao.id, cultura_nome, start_date + timedelta(days=random.randint(1, 45)))
     if not safra: return
     params = CULTURA_PARAMETROS[cultura_nome]
-    plantadeira, pulverizador, colheitadeira = [db.query(models.Maquina).filter(models.Maquina.tipo == t).first() for t in ["Plantadeira", "Pulverizador", "Colheitadeira"]]
-    rendimento_ha_h = {"Plantadeira": 8, "Pulverizador": 20, "Colheitadeira": 7}
-    def calcular_custo_op_ha(maq):
-        horas_op = 1 / rendimento_ha_h[maq.tipo]
-        return (horas_op * maq.consumo_combustivel_l_h * PRECO_COMBUSTIVEL_LT) + (horas_op * maq.custo_hora_operacao)
+    plantadeira, pulverizador, colheitadeira = [maquinas[t] for t in ["Plantadeira", "Pulverizador", "Colheitadeira"]]
+    def custo_op_ha(maq):
+        return calcular_custo_op_ha(maq.tipo, maq.custo_hora_operacao, maq.consumo_combustivel_l_h)
     
-    custo_op_pulv_ha = calcular_custo_op_ha(pulverizador)
+    custo_op_pulv_ha = custo_op_ha(pulverizador)
     qtd_calcario = round(random.uniform(1.5, 3.0), 1)
     custo_total_correcao = (qtd_calcario * CUSTOS_OPERACIONAIS["insumos"]["Calcário Dolomítico"]["preco"]) + custo_op_pulv_ha
     operations.registrar_atividade(db, safra.id, "Correção de Solo", "Calcário Dolomítico", qtd_calcario, "ton", safra.data_plantio - timedelta(days=30), pulverizador.nome, custo_total_correcao, random.choice(OPERADORES))
     
     qtd_adubo = random.randint(*params["adubo_qtd"])
-    custo_total_plantio = (qtd_adubo * CUSTOS_OPERACIONAIS["insumos"][params["adubo_produto"]]["preco"]) + calcular_custo_op_ha(plantadeira)
+    custo_total_plantio = (qtd_adubo * CUSTOS_OPERACIONAIS["insumos"][params["adubo_produto"]]["preco"]) + custo_op_ha(plantadeira)
     operations.registrar_atividade(db, safra.id, "Adubação e Plantio", params["adubo_produto"], qtd_adubo, "kg", safra.data_plantio, plantadeira.nome, custo_total_plantio, random.choice(OPERADORES))
     
     qtd_herbicida = round(random.uniform(1.5, 3.0), 1)
@@ -90,12 +122,13 @@ def gerar_safra_sintetica(db, talhao, cultura_nome, start_date):
     
     data_colheita = safra.data_colheita_prevista + timedelta(days=random.randint(-5, 10))
     produtividade = int(random.randint(*params["produtividade_range"]) * (1 + random.uniform(-0.05, 0.05)))
-    operations.registrar_colheita(db, safra.id, data_colheita, produtividade, colheitadeira.nome, calcular_custo_op_ha(colheitadeira), random.choice(OPERADORES))
+    operations.registrar_colheita(db, safra.id, data_colheita, produtividade, colheitadeira.nome, custo_op_ha(colheitadeira), random.choice(OPERADORES))
 
 def gerar_contratos_venda(db):
     """Gera contratos de venda sintéticos para todas as safras colhidas."""
     print("\n--- A gerar contratos de venda sintéticos ---")
     safras_colhidas = db.query(models.Safra).filter(models.Safra.produtividade_kg_ha.isnot(None)).all()
+    contratos = []
     for safra in safras_colhidas:
         producao_total = safra.produtividade_kg_ha * safra.talhao.area_ha
         qtd_vendida = producao_total * random.uniform(0.8, 0.95) # Vende entre 80-95% da produção
@@ -103,22 +136,209 @@ def gerar_contratos_venda(db):
         preco_venda = preco_base * (1 + random.uniform(-0.1, 0.1)) # Variação de +/- 10% no preço
         data_venda = safra.data_colheita_real + timedelta(days=random.randint(5, 60))
         
-        contrato = models.ContratoVenda(
-            safra_id=safra.id,
-            data_venda=data_venda,
-            quantidade_kg=qtd_vendida,
-            preco_venda_kg=round(preco_venda, 2)
-        )
-        db.add(contrato)
-    db.commit()
+        contratos.append({
+            'safra_id': safra.id,
+            'data_venda': data_venda,
+            'quantidade_kg': qtd_vendida,
+            'preco_venda_kg': round(preco_venda, 2)
+        })
+    operations.registrar_contratos_venda_em_lote(db, contratos)
     print(f"{len(safras_colhidas)} contratos de venda gerados.")
 
 # =============================================================================
-# 2. FUNÇÃO PRINCIPAL
+# 2. GERAÇÃO EM MASSA (TESTES DE CARGA E ESCALA)
+# =============================================================================
+def _datas(dias_desde_epoca):
+    """Converte um vetor de dias (datetime64[D]) em objetos date para o SQLAlchemy."""
+    return pd.to_datetime(dias_desde_epoca).date
+
+def _inserir_em_lotes(conn, tabela, df, tamanho_lote=TAMANHO_LOTE_MASSA):
+    for inicio in range(0, len(df), tamanho_lote):
+        conn.execute(tabela.insert(), df.iloc[inicio:inicio + tamanho_lote].to_dict('records'))
+    if 'id' in df.columns:
+        # Os ids foram gerados aqui: no PostgreSQL a sequência precisa de acompanhar
+        database.ajustar_sequencias(conn, [tabela.name])
+
+def _proximo_id(conn, modelo):
+    maior = conn.execute(select(func.max(modelo.__table__.c.id))).scalar()
+    return (maior or 0) + 1
+
+def gerar_dados_em_massa(db_engine=engine, num_fazendas=NUM_FAZENDAS_MASSA, num_talhoes=NUM_TALHOES_MASSA,
+                         num_anos=NUM_ANOS_SIMULACAO, ano_inicial=ANO_INICIAL, seed=None, gerar_precos=True):
+    """
+    Gera uma base sintética grande com amostragem vetorizada (NumPy) e inserção em lote.
+
+    Segue o mesmo modelo de `main` (rotação de culturas, 5 atividades por safra,
+    análises de solo a cada 2 anos e um contrato de venda por safra colhida), mas
+    monta todas as linhas em memória e grava cada tabela numa única transação.
+    """
+    rng = np.random.default_rng(seed)
+    inicio_geracao = time.perf_counter()
+    migrations.atualizar_esquema(db_engine)
+
+    with Session(bind=db_engine) as db:
+        limpar_banco_de_dados(db)
+        criar_dados_iniciais_completos(db)
+        culturas = {c.nome: c for c in db.query(models.Cultura).all()}
+        maquinas = carregar_maquinas_por_tipo(db)
+        fazendas_existentes = [f.id for f in db.query(models.Fazenda).order_by(models.Fazenda.id).all()]
+
+    with db_engine.begin() as conn:
+        # --- Fazendas ---
+        faltantes = max(num_fazendas - len(fazendas_existentes), 0)
+        primeiro_id = _proximo_id(conn, models.Fazenda)
+        df_fazendas = pd.DataFrame({
+            "id": np.arange(primeiro_id, primeiro_id + faltantes),
+            "nome": [f"Fazenda Sintética {i + 1:04}" for i in range(faltantes)],
+            "localizacao": rng.choice(UFS_FAZENDAS, faltantes),
+        })
+        _inserir_em_lotes(conn, models.Fazenda.__table__, df_fazendas)
+        fazenda_ids = np.array(fazendas_existentes[:num_fazendas] + df_fazendas["id"].tolist())
+
+        # --- Talhões ---
+        primeiro_id = _proximo_id(conn, models.Talhao)
+        talhao_ids = np.arange(primeiro_id, primeiro_id + num_talhoes)
+        area_ha = np.round(rng.uniform(18.0, 22.0, num_talhoes), 2)
+        df_talhoes = pd.DataFrame({
+            "id": talhao_ids,
+            "fazenda_id": rng.choice(fazenda_ids, num_talhoes),
+            "identificador": [f"TLH-{i:06}" for i in talhao_ids],
+            "area_ha": area_ha,
+        })
+        _inserir_em_lotes(conn, models.Talhao.__table__, df_talhoes)
+    print(f"{len(fazenda_ids)} fazendas e {num_talhoes} talhões criados.")
+
+    # --- Análises de solo (a cada 2 anos, como em main) ---
+    anos_analise = np.arange(ano_inicial, ano_inicial + num_anos, 2)
+    n_analises = num_talhoes * len(anos_analise)
+    df_solo = pd.DataFrame({
+        "talhao_id": np.repeat(talhao_ids, len(anos_analise)),
+        "data_analise": _datas(np.tile([np.datetime64(f"{a}-05-15") for a in anos_analise], num_talhoes)),
+        "ph": np.round(rng.uniform(4.8, 6.2, n_analises), 2),
+        "fosforo_ppm": np.round(rng.uniform(5.0, 25.0, n_analises), 2),
+        "potassio_ppm": np.round(rng.uniform(40.0, 150.0, n_analises), 2),
+        "materia_organica_percent": np.round(rng.uniform(1.5, 3.5, n_analises), 2),
+    })
+    with db_engine.begin() as conn:
+        _inserir_em_lotes(conn, models.AnaliseSolo.__table__, df_solo)
+    print(f"{n_analises} análises de solo geradas.")
+
+    # --- Safras: duas seasons por ano, com rotação (nunca repete a cultura anterior) ---
+    inicios_season = []
+    for i in range(num_anos):
+        inicios_season += [np.datetime64(f"{ano_inicial + i}-10-01"), np.datetime64(f"{ano_inicial + i + 1}-02-15")]
+    n_seasons = len(inicios_season)
+    indices_cultura = np.empty((n_seasons, num_talhoes), dtype=np.int64)
+    indices_cultura[0] = rng.integers(0, len(CULTURAS_COMERCIAIS), num_talhoes)
+    for k in range(1, n_seasons):
+        indices_cultura[k] = (indices_cultura[k - 1] + rng.integers(1, len(CULTURAS_COMERCIAIS), num_talhoes)) % len(CULTURAS_COMERCIAIS)
+    indices_cultura = indices_cultura.ravel()
+    n_safras = len(indices_cultura)
+
+    nomes_cultura = np.array(CULTURAS_COMERCIAIS)[indices_cultura]
+    cultura_ids = np.array([culturas[c].id for c in CULTURAS_COMERCIAIS])[indices_cultura]
+    ciclos = np.array([culturas[c].ciclo_fisiologico_dias for c in CULTURAS_COMERCIAIS])[indices_cultura]
+    prod_min = np.array([CULTURA_PARAMETROS[c]["produtividade_range"][0] for c in CULTURAS_COMERCIAIS])[indices_cultura]
+    prod_max = np.array([CULTURA_PARAMETROS[c]["produtividade_range"][1] for c in CULTURAS_COMERCIAIS])[indices_cultura]
+
+    safra_talhao_ids = np.tile(talhao_ids, n_seasons)
+    data_plantio = np.repeat(np.array(inicios_season, dtype="datetime64[D]"), num_talhoes) + rng.integers(1, 46, n_safras)
+    data_colheita_prevista = data_plantio + ciclos
+    data_colheita_real = data_colheita_prevista + rng.integers(-5, 11, n_safras)
+    produtividade = (rng.integers(prod_min, prod_max + 1) * (1 + rng.uniform(-0.05, 0.05, n_safras))).astype(np.int64)
+
+    with db_engine.begin() as conn:
+        primeira_safra = _proximo_id(conn, models.Safra)
+    safra_ids = np.arange(primeira_safra, primeira_safra + n_safras)
+    df_safras = pd.DataFrame({
+        "id": safra_ids,
+        "talhao_id": safra_talhao_ids,
+        "cultura_id": cultura_ids,
+        "data_plantio": _datas(data_plantio),
+        "data_colheita_prevista": _datas(data_colheita_prevista),
+        "data_colheita_real": _datas(data_colheita_real),
+        "produtividade_kg_ha": produtividade.astype(float),
+    })
+    with db_engine.begin() as conn:
+        _inserir_em_lotes(conn, models.Safra.__table__, df_safras)
+    print(f"{n_safras} safras geradas.")
+
+    # --- Atividades: as mesmas 5 operações por safra usadas em gerar_safra_sintetica ---
+    insumos = CUSTOS_OPERACIONAIS["insumos"]
+    custo_op = {t: calcular_custo_op_ha(t, m.custo_hora_operacao, m.consumo_combustivel_l_h) for t, m in maquinas.items()}
+    preco_por_cultura = lambda campo: np.array([insumos[CULTURA_PARAMETROS[c][campo]]["preco"] for c in CULTURAS_COMERCIAIS])[indices_cultura]
+    produto_por_cultura = lambda campo: np.array([CULTURA_PARAMETROS[c][campo] for c in CULTURAS_COMERCIAIS])[indices_cultura]
+    adubo_min = np.array([CULTURA_PARAMETROS[c]["adubo_qtd"][0] for c in CULTURAS_COMERCIAIS])[indices_cultura]
+    adubo_max = np.array([CULTURA_PARAMETROS[c]["adubo_qtd"][1] for c in CULTURAS_COMERCIAIS])[indices_cultura]
+
+    qtd_calcario = np.round(rng.uniform(1.5, 3.0, n_safras), 1)
+    qtd_adubo = rng.integers(adubo_min, adubo_max + 1).astype(float)
+    qtd_herbicida = np.round(rng.uniform(1.5, 3.0, n_safras), 1)
+    qtd_inseticida = np.round(rng.uniform(1.0, 2.0, n_safras), 1)
+
+    blocos = [
+        ("Correção de Solo", np.full(n_safras, "Calcário Dolomítico"), qtd_calcario, "ton", data_plantio - 30, "Pulverizador",
+         qtd_calcario * insumos["Calcário Dolomítico"]["preco"] + custo_op["Pulverizador"]),
+        ("Adubação e Plantio", produto_por_cultura("adubo_produto"), qtd_adubo, "kg", data_plantio, "Plantadeira",
+         qtd_adubo * preco_por_cultura("adubo_produto") + custo_op["Plantadeira"]),
+        ("Herbicida", produto_por_cultura("herbicida_produto"), qtd_herbicida, "L", data_plantio + 30, "Pulverizador",
+         qtd_herbicida * preco_por_cultura("herbicida_produto") + custo_op["Pulverizador"]),
+        ("Inseticida", produto_por_cultura("inseticida_produto"), qtd_inseticida, "L", data_plantio + 60, "Pulverizador",
+         qtd_inseticida * preco_por_cultura("inseticida_produto") + custo_op["Pulverizador"]),
+        ("Colheita", np.full(n_safras, "N/A"), produtividade.astype(float), "kg/ha", data_colheita_real, "Colheitadeira",
+         np.full(n_safras, custo_op["Colheitadeira"])),
+    ]
+    with db_engine.begin() as conn:
+        for tipo, produto, qtd, unidade, data_execucao, tipo_maquina, custo in blocos:
+            df_atividades = pd.DataFrame({
+                "safra_id": safra_ids,
+                "tipo_atividade": tipo,
+                "produto_utilizado": produto,
+                "quantidade_aplicada_ha": qtd,
+                "unidade": unidade,
+                "data_execucao": _datas(data_execucao),
+                "maquina_id": maquinas[tipo_maquina].id,
+                "operador": rng.choice(OPERADORES, n_safras),
+                "custo_total_ha": custo,
+            })
+            _inserir_em_lotes(conn, models.AtividadeAgricola.__table__, df_atividades)
+    print(f"{n_safras * len(blocos)} atividades agrícolas geradas.")
+
+    # --- Contratos de venda (um por safra colhida, como em gerar_contratos_venda) ---
+    area_por_safra = np.tile(area_ha, n_seasons)
+    preco_base = np.array([CULTURA_PARAMETROS[c]["preco_venda_simulado"] for c in CULTURAS_COMERCIAIS])[indices_cultura]
+    df_contratos = pd.DataFrame({
+        "safra_id": safra_ids,
+        "data_venda": _datas(data_colheita_real + rng.integers(5, 61, n_safras)),
+        "quantidade_kg": produtividade * area_por_safra * rng.uniform(0.8, 0.95, n_safras),
+        "preco_venda_kg": np.round(preco_base * (1 + rng.uniform(-0.1, 0.1, n_safras)), 2),
+    })
+    with db_engine.begin() as conn:
+        _inserir_em_lotes(conn, models.ContratoVenda.__table__, df_contratos)
+    print(f"{n_safras} contratos de venda gerados.")
+
+    # --- Preços de mercado diários (passeio aleatório em torno do preço simulado) ---
+    if gerar_precos:
+        datas_mercado = np.arange(np.datetime64(f"{ano_inicial}-01-01"), data_colheita_real.max() + 61)
+        partes = []
+        for cultura_nome in CULTURAS_COMERCIAIS:
+            base = CULTURA_PARAMETROS[cultura_nome]["preco_venda_simulado"]
+            passeio = np.cumsum(rng.normal(0, 0.004, len(datas_mercado)))
+            partes.append(pd.DataFrame({"data": _datas(datas_mercado), "cultura_nome": cultura_nome, "preco_fecho_kg": base * np.exp(passeio)}))
+        df_precos = pd.concat(partes, ignore_index=True)
+        with db_engine.begin() as conn:
+            _inserir_em_lotes(conn, models.PrecoMercado.__table__, df_precos)
+        print(f"{len(df_precos)} preços de mercado gerados.")
+
+    resumo_safras.reconstruir_resumo_safras(db_engine)
+    print(f"\nGeração em massa concluída em {time.perf_counter() - inicio_geracao:.1f} s.")
+
+# =============================================================================
+# 3. FUNÇÃO PRINCIPAL
 # =============================================================================
 def main():
     db = SessionLocal()
-    models.Base.metadata.create_all(bind=engine)
+    migrations.atualizar_esquema(engine)
     limpar_banco_de_dados(db)
     criar_dados_iniciais_completos(db)
     
@@ -133,6 +353,8 @@ def main():
             gerar_analise_solo(db, talhao, ano)
     print("Análises de solo geradas com sucesso.")
 
+    maquinas = carregar_maquinas_por_tipo(db)
+    ultima_cultura_por_talhao = {}
     for i in range(NUM_ANOS_SIMULACAO):
         ano_corrente = ANO_INICIAL + i
         for season_info in [("B", date(ano_corrente, 10, 1)), ("A", date(ano_corrente + 1, 2, 15))]:
@@ -140,10 +362,10 @@ def main():
             print(f"\n--- A gerar dados para a Safra {start_date.year}/{season_label} ---")
             for j, talhao in enumerate(talhoes):
                 # Lógica de rotação (simplificada para o exemplo final)
-                ultima_cultura = db.query(models.Cultura.nome).join(models.Safra).filter(models.Safra.talhao_id == talhao.id).order_by(models.Safra.data_plantio.desc()).first()
-                culturas_possiveis = [c for c in CULTURAS_COMERCIAIS if c != (ultima_cultura[0] if ultima_cultura else None)]
+                culturas_possiveis = [c for c in CULTURAS_COMERCIAIS if c != ultima_cultura_por_talhao.get(talhao.id)]
                 nova_cultura = random.choice(culturas_possiveis)
-                gerar_safra_sintetica(db, talhao, nova_cultura, start_date)
+                gerar_safra_sintetica(db, talhao, nova_cultura, start_date, maquinas)
+                ultima_cultura_por_talhao[talhao.id] = nova_cultura
             print(f"\nSafra {start_date.year}/{season_label} gerada com sucesso.")
 
     gerar_contratos_venda(db)
@@ -152,5 +374,15 @@ def main():
     print("\nProcesso de preenchimento de dados completo.")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Preenche a base de dados com dados agrícolas sintéticos.")
+    parser.add_argument("--massa", action="store_true", help="Usa o gerador em massa (vetorizado, inserção em lote) para testes de carga.")
+    parser.add_argument("--fazendas", type=int, default=NUM_FAZENDAS_MASSA)
+    parser.add_argument("--talhoes", type=int, default=NUM_TALHOES_MASSA)
+    parser.add_argument("--anos", type=int, default=NUM_ANOS_SIMULACAO)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    if args.massa:
+        gerar_dados_em_massa(num_fazendas=args.fazendas, num_talhoes=args.talhoes, num_anos=args.anos, seed=args.seed)
+    else:
+        main()
 
@@ -0,0 +1,52 @@
+import numpy as np
+
+# =============================================================================
+# 0. CONFIGURAÇÕES
+# =============================================================================
+
+# Colunas do ranking: nome -> (coluna de df_agricola, agregação)
+AGREGADOS = {
+    'lucro_medio': ('lucro_ha', 'mean'),
+    'lucro_mediano': ('lucro_ha', 'median'),
+    'produtividade_media': ('produtividade_kg_ha', 'mean'),
+    'custo_medio': ('custo_total_safra_ha', 'mean'),
+    'safras': ('safra_id', 'nunique'),
+}
+ORDENAR_POR = 'lucro_medio'
+TAMANHO_PAGINA = 20
+
+# =============================================================================
+# 1. RANKING DE UM RECORTE
+# =============================================================================
+
+class RankingTalhoes:
+    """
+    Agregados por talhão de um recorte de safras, ordenados do mais para o menos lucrativo.
+
+    A ordenação é feita uma vez na construção; melhores, piores e páginas são fatias
+    da tabela ordenada, com custo proporcional ao número de linhas devolvidas.
+    """
+
+    def __init__(self, df, coluna_talhao='talhao'):
+        agregados = {nome: agregado for nome, agregado in AGREGADOS.items() if agregado[0] in df.columns}
+        dados = df.dropna(subset=[coluna_talhao, AGREGADOS[ORDENAR_POR][0]])
+        tabela = dados.groupby(coluna_talhao, sort=False).agg(fazenda=('fazenda', 'first'), **agregados)
+        tabela = tabela.sort_values([ORDENAR_POR, 'lucro_mediano'], ascending=False, kind='stable').reset_index()
+        tabela.insert(0, 'posicao', np.arange(1, len(tabela) + 1))
+        self.tabela = tabela
+
+    def __len__(self):
+        return len(self.tabela)
+
+    def melhores(self, k):
+        return self.tabela.iloc[:k]
+
+    def piores(self, k):
+        """Os k menos lucrativos, do pior para o menos mau."""
+        return self.tabela.iloc[::-1].iloc[:k]
+
+    def pagina(self, numero, tamanho=TAMANHO_PAGINA):
+        """Linhas da página `numero` (a partir de 0) e o número total de páginas."""
+        total_paginas = max(int(np.ceil(len(self) / tamanho)), 1)
+        numero = min(max(int(numero or 0), 0), total_paginas - 1)
+        return self.tabela.iloc[numero * tamanho:(numero + 1) * tamanho], total_paginas
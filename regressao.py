@@ -0,0 +1,138 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+# =============================================================================
+# 0. CONFIGURAÇÕES
+# =============================================================================
+
+# Linhas de tendência dos gráficos de correlação, calculadas com NumPy (sem statsmodels
+# no processo do servidor web).
+METODOS = {'ols': 'Regressão linear (MQO)', 'lowess': 'LOWESS', 'lowess_robusto': 'LOWESS robusto'}
+# Fração dos pontos usada em cada ajuste local do LOWESS
+FRACAO_LOWESS = 2 / 3
+# Iterações de reponderação do LOWESS robusto (pesos bisquare sobre os resíduos)
+ITERACOES_ROBUSTAS = 3
+# Pontos em que a curva LOWESS é avaliada (suficiente para uma linha suave no gráfico)
+PONTOS_CURVA = 50
+
+# =============================================================================
+# 1. MÍNIMOS QUADRADOS POR GRUPO
+# =============================================================================
+
+def ajustar_ols(df, coluna_x, coluna_y, coluna_grupo):
+    """
+    Reta de mínimos quadrados de `coluna_y` em `coluna_x` para cada grupo, numa única passagem.
+
+    Retorna um DataFrame indexado pelo grupo com n, inclinacao, intercepto, r2, x_min e x_max.
+    As somas são feitas sobre os desvios à média do grupo, o que evita o cancelamento
+    numérico das fórmulas com somas brutas. Grupos com menos de dois valores distintos
+    de x ficam com inclinação NaN.
+    """
+    dados = df[[coluna_grupo, coluna_x, coluna_y]].dropna()
+    grupos = dados.groupby(coluna_grupo, sort=False)
+    medias = grupos[[coluna_x, coluna_y]].transform('mean')
+    dx = dados[coluna_x] - medias[coluna_x]
+    dy = dados[coluna_y] - medias[coluna_y]
+    somas = pd.DataFrame({'sxx': dx * dx, 'sxy': dx * dy, 'syy': dy * dy, coluna_grupo: dados[coluna_grupo]}).groupby(coluna_grupo, sort=False).sum()
+    resumo = grupos.agg(n=(coluna_x, 'size'), media_x=(coluna_x, 'mean'), media_y=(coluna_y, 'mean'), x_min=(coluna_x, 'min'), x_max=(coluna_x, 'max'))
+    sxx = somas['sxx'].where(somas['sxx'] > 0)
+    resumo['inclinacao'] = somas['sxy'] / sxx
+    resumo['intercepto'] = resumo['media_y'] - resumo['inclinacao'] * resumo['media_x']
+    resumo['r2'] = (somas['sxy'] ** 2 / (sxx * somas['syy'].where(somas['syy'] > 0))).fillna(0.0).where(sxx.notna())
+    return resumo[['n', 'inclinacao', 'intercepto', 'r2', 'x_min', 'x_max']]
+
+# =============================================================================
+# 2. LOWESS
+# =============================================================================
+
+def _tricubo(u):
+    return np.clip(1 - np.abs(u) ** 3, 0, None) ** 3
+
+def _ajuste_local(x, y, pesos_robustos, pontos, frac):
+    """Valores da regressão linear local ponderada nos `pontos` (matriz pontos x observações)."""
+    k = min(max(int(np.ceil(frac * len(x))), 2), len(x))
+    distancias = np.abs(pontos[:, None] - x[None, :])
+    largura = np.partition(distancias, k - 1, axis=1)[:, k - 1]
+    largura = np.where(largura > 0, largura, 1.0)
+    w = _tricubo(distancias / largura[:, None]) * pesos_robustos[None, :]
+    soma_w = w.sum(axis=1)
+    soma_w = np.where(soma_w > 0, soma_w, np.nan)
+    media_x = (w * x).sum(axis=1) / soma_w
+    media_y = (w * y).sum(axis=1) / soma_w
+    dx = x[None, :] - media_x[:, None]
+    sxx = (w * dx * dx).sum(axis=1)
+    sxy = (w * dx * (y[None, :] - media_y[:, None])).sum(axis=1)
+    inclinacao = np.divide(sxy, sxx, out=np.zeros_like(sxy), where=sxx > 0)
+    return media_y + inclinacao * (pontos - media_x)
+
+def lowess(x, y, frac=FRACAO_LOWESS, iteracoes=0, n_pontos=PONTOS_CURVA):
+    """
+    Curva LOWESS (regressão linear local com pesos tricúbicos) avaliada em até `n_pontos` valores de x.
+
+    Com `iteracoes` > 0, cada iteração reduz o peso dos pontos com resíduo grande
+    (bisquare sobre 6 vezes a mediana dos resíduos absolutos). Os resíduos usam a curva
+    interpolada nos x observados, o que mantém o custo proporcional a n_pontos x n.
+    Retorna (xs, ys).
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    validos = ~(np.isnan(x) | np.isnan(y))
+    x, y = x[validos], y[validos]
+    if len(x) < 3:
+        return np.array([]), np.array([])
+    pontos = np.unique(x)
+    if len(pontos) > n_pontos:
+        pontos = np.linspace(pontos[0], pontos[-1], n_pontos)
+    pesos = np.ones_like(x)
+    curva = _ajuste_local(x, y, pesos, pontos, frac)
+    for _ in range(iteracoes):
+        residuos = y - np.interp(x, pontos, curva)
+        escala = 6 * np.median(np.abs(residuos))
+        if escala == 0:
+            break
+        pesos = np.clip(1 - (residuos / escala) ** 2, 0, None) ** 2
+        curva = _ajuste_local(x, y, pesos, pontos, frac)
+    return pontos, curva
+
+# =============================================================================
+# 3. LINHAS DE TENDÊNCIA DOS GRÁFICOS
+# =============================================================================
+
+def calcular_tendencias(df, coluna_x, coluna_y, coluna_grupo, metodo='ols'):
+    """
+    Pontos das linhas de tendência de cada grupo: lista de dicionários com grupo, x, y e descricao.
+
+    O resultado contém apenas listas e textos, para poder ser guardado em cache. Na reta
+    do MQO bastam os dois extremos de x.
+    """
+    if metodo not in METODOS:
+        raise ValueError(f"Método de tendência desconhecido: {metodo}")
+    tendencias = []
+    if metodo == 'ols':
+        for grupo, ajuste in ajustar_ols(df, coluna_x, coluna_y, coluna_grupo).iterrows():
+            if pd.isna(ajuste['inclinacao']):
+                continue
+            xs = [ajuste['x_min'], ajuste['x_max']]
+            tendencias.append({
+                'grupo': grupo,
+                'x': xs,
+                'y': [ajuste['intercepto'] + ajuste['inclinacao'] * x for x in xs],
+                'descricao': f"y = {ajuste['inclinacao']:.4g}·x + {ajuste['intercepto']:.4g}<br>R² = {ajuste['r2']:.3f} (n = {int(ajuste['n'])})",
+            })
+        return tendencias
+    iteracoes = ITERACOES_ROBUSTAS if metodo == 'lowess_robusto' else 0
+    for grupo, dados in df[[coluna_grupo, coluna_x, coluna_y]].dropna().groupby(coluna_grupo, sort=False):
+        xs, ys = lowess(dados[coluna_x].to_numpy(), dados[coluna_y].to_numpy(), iteracoes=iteracoes)
+        if len(xs):
+            tendencias.append({'grupo': grupo, 'x': xs.tolist(), 'y': ys.tolist(), 'descricao': f"{METODOS[metodo]} (n = {len(dados)})"})
+    return tendencias
+
+def tracos_tendencia(tendencias, cores=None):
+    """Um go.Scatter por grupo, com a cor dos pontos do grupo (`cores`: {grupo: cor}) e a equação no hover."""
+    cores = cores or {}
+    return [
+        go.Scatter(x=t['x'], y=t['y'], mode='lines', name=f"Tendência - {t['grupo']}", legendgroup=str(t['grupo']),
+                   line=dict(color=cores.get(t['grupo'])), hovertemplate=f"<b>Tendência - {t['grupo']}</b><br>{t['descricao']}<extra></extra>")
+        for t in tendencias
+    ]
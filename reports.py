@@ -4,22 +4,57 @@ from sqlalchemy.orm import Session
 from sqlalchemy import text
 from database import engine
 
+# Consulta base do dashboard: uma linha por atividade de cada safra colhida
+QUERY_COMPLETA = """
+SELECT
+    f.nome as fazenda, t.id as talhao_id, t.identificador as talhao, t.area_ha, s.id as safra_id,
+    s.data_plantio, s.data_colheita_real, s.produtividade_kg_ha, c.nome as cultura,
+    a.tipo_atividade, a.produto_utilizado, a.quantidade_aplicada_ha, a.unidade,
+    a.data_execucao, a.custo_total_ha, a.operador, m.nome as maquina
+FROM fazendas f
+JOIN talhoes t ON f.id = t.fazenda_id
+JOIN safras s ON t.id = s.talhao_id
+JOIN culturas c ON s.cultura_id = c.id
+LEFT JOIN atividades_agricolas a ON s.id = a.safra_id
+LEFT JOIN maquinas m ON a.maquina_id = m.id
+WHERE s.produtividade_kg_ha IS NOT NULL ORDER BY t.identificador, s.data_plantio;
+"""
+
+# Uma linha por safra colhida com os indicadores já consolidados em safra_resumo
+QUERY_SAFRAS_RESUMO = """
+SELECT
+    f.nome as fazenda, t.id as talhao_id, t.identificador as talhao, t.area_ha, s.id as safra_id,
+    s.data_plantio, s.data_colheita_real, s.produtividade_kg_ha, c.nome as cultura,
+    r.custo_total_ha as custo_total_safra_ha, r.receita_potencial_ha as receita_ha_potencial,
+    r.lucro_potencial_ha as lucro_ha_potencial, r.lucro_ha, r.fase_enos,
+    sa.id, sa.data_analise, sa.ph, sa.fosforo_ppm, sa.potassio_ppm, sa.materia_organica_percent
+FROM safra_resumo r
+JOIN safras s ON r.safra_id = s.id
+JOIN talhoes t ON s.talhao_id = t.id
+JOIN fazendas f ON t.fazenda_id = f.id
+JOIN culturas c ON s.cultura_id = c.id
+LEFT JOIN analises_solo sa ON r.analise_solo_id = sa.id
+WHERE s.produtividade_kg_ha IS NOT NULL ORDER BY t.identificador, s.data_plantio;
+"""
+
+QUERY_PRODUTIVIDADE = """
+SELECT
+    f.nome as fazenda,
+    c.nome as cultura,
+    t.identificador as talhao,
+    s.produtividade_kg_ha,
+    s.data_colheita_real
+FROM safras s
+JOIN culturas c ON s.cultura_id = c.id
+JOIN talhoes t ON s.talhao_id = t.id
+JOIN fazendas f ON t.fazenda_id = f.id
+WHERE s.produtividade_kg_ha IS NOT NULL
+ORDER BY f.nome, c.nome;
+"""
+
 def gerar_relatorio_produtividade(db_engine):
     """Gera um relatório de produtividade por cultura e fazenda."""
-    query = """
-    SELECT
-        f.nome as fazenda,
-        c.nome as cultura,
-        t.identificador as talhao,
-        s.produtividade_kg_ha,
-        s.data_colheita_real
-    FROM safras s
-    JOIN culturas c ON s.cultura_id = c.id
-    JOIN talhoes t ON s.talhao_id = t.id
-    JOIN fazendas f ON t.fazenda_id = f.id
-    WHERE s.produtividade_kg_ha IS NOT NULL
-    ORDER BY f.nome, c.nome;
-    """
+    query = QUERY_PRODUTIVIDADE
     
     df = pd.read_sql_query(text(query), db_engine)
     
@@ -0,0 +1,164 @@
+# projeto_agricola/resumo_safras.py
+import os
+from datetime import date
+from functools import lru_cache
+import pandas as pd
+from sqlalchemy import text, bindparam, insert, delete, select
+from database import engine
+import models
+
+# =============================================================================
+# 0. CONFIGURAÇÕES
+# =============================================================================
+
+# Preço de venda de referência (R$/kg) usado na receita e no lucro potenciais
+PRECOS_VENDA = {
+    "Soja": 1.10,
+    "Milho": 0.85,
+    "Algodão": 8.50
+}
+
+ARQUIVO_ONI = 'oni_data.csv'
+FASE_ENOS_INDISPONIVEL = 'Não Disponível'
+
+# Máximo de ids por cláusula IN
+TAMANHO_LOTE_IDS = 500
+
+# Tabelas de que o resumo depende. A contagem e o maior id de cada uma são gravados em
+# safra_resumo_estado junto com o resumo; se diferirem do banco, alguma escrita não
+# passou por atualizar_resumo_safras e o resumo está desatualizado.
+TABELAS_ORIGEM = ['safras', 'atividades_agricolas', 'contratos_venda', 'analises_solo']
+
+# Indicadores de cada safra calculados no banco: custo das atividades, receita dos
+# contratos e a última análise de solo do talhão anterior ao plantio. As subconsultas
+# usam os índices por safra_id e (talhao_id, data_analise) criados nas migrações.
+QUERY_INDICADORES = """
+SELECT
+    s.id AS safra_id, s.data_plantio, s.produtividade_kg_ha, c.nome AS cultura, t.area_ha,
+    (SELECT SUM(a.custo_total_ha) FROM atividades_agricolas a WHERE a.safra_id = s.id) AS custo_total_ha,
+    (SELECT SUM(cv.quantidade_kg * cv.preco_venda_kg) FROM contratos_venda cv WHERE cv.safra_id = s.id) AS receita_contratos,
+    (SELECT sa.id FROM analises_solo sa
+     WHERE sa.talhao_id = s.talhao_id AND sa.data_analise <= s.data_plantio
+     ORDER BY sa.data_analise DESC, sa.id DESC LIMIT 1) AS analise_solo_id
+FROM safras s
+JOIN culturas c ON s.cultura_id = c.id
+JOIN talhoes t ON s.talhao_id = t.id
+"""
+
+# =============================================================================
+# 1. CÁLCULO DOS INDICADORES
+# =============================================================================
+
+@lru_cache(maxsize=4)
+def _fases_enos(caminho, modificado_em):
+    df_oni = pd.read_csv(caminho)
+    return {(int(a), int(m)): f for a, m, f in zip(df_oni['ano'], df_oni['mes'], df_oni['fase_enos'])}
+
+def carregar_fases_enos(caminho=ARQUIVO_ONI):
+    """Fase ENOS por (ano, mês); None se o arquivo do ONI não existir. Relido apenas quando o arquivo muda."""
+    if not os.path.exists(caminho):
+        return None
+    return _fases_enos(caminho, os.path.getmtime(caminho))
+
+def _data(valor):
+    # O SQLite devolve as datas de consultas textuais como string
+    return date.fromisoformat(valor[:10]) if isinstance(valor, str) else valor
+
+def calcular_indicadores(linha, fases=None):
+    """Deriva custo, receita e lucro por hectare de uma linha de QUERY_INDICADORES."""
+    custo = linha['custo_total_ha'] or 0.0
+    preco = PRECOS_VENDA.get(linha['cultura'])
+    produtividade = linha['produtividade_kg_ha']
+    receita_potencial = produtividade * preco if produtividade is not None and preco is not None else None
+    lucro_potencial = receita_potencial - custo if receita_potencial is not None else None
+    receita_realizada = linha['receita_contratos'] / linha['area_ha'] if linha['receita_contratos'] is not None and linha['area_ha'] else None
+    data_plantio = _data(linha['data_plantio'])
+    if fases is None:
+        fase_enos = FASE_ENOS_INDISPONIVEL
+    else:
+        fase_enos = fases.get((data_plantio.year, data_plantio.month)) if data_plantio else None
+    return {
+        'safra_id': linha['safra_id'],
+        'custo_total_ha': custo,
+        'receita_potencial_ha': receita_potencial,
+        'lucro_potencial_ha': lucro_potencial,
+        'receita_realizada_ha': receita_realizada,
+        'lucro_ha': receita_realizada - custo if receita_realizada is not None else lucro_potencial,
+        'analise_solo_id': linha['analise_solo_id'],
+        'fase_enos': fase_enos,
+    }
+
+def _ler_indicadores(db, safra_ids=None):
+    if safra_ids is None:
+        return db.execute(text(QUERY_INDICADORES)).mappings().all()
+    consulta = text(QUERY_INDICADORES + " WHERE s.id IN :ids").bindparams(bindparam('ids', expanding=True))
+    linhas = []
+    for i in range(0, len(safra_ids), TAMANHO_LOTE_IDS):
+        linhas.extend(db.execute(consulta, {'ids': safra_ids[i:i + TAMANHO_LOTE_IDS]}).mappings().all())
+    return linhas
+
+# =============================================================================
+# 2. MANUTENÇÃO DA TABELA safra_resumo
+# =============================================================================
+
+def atualizar_resumo_safras(db, safra_ids=None):
+    """
+    Recalcula as linhas de `safra_resumo` das safras indicadas (todas, se `safra_ids` for None).
+
+    Aceita uma Session ou uma Connection e não confirma a transação: deve ser chamada
+    pelas funções de escrita antes do seu commit, para que o resumo e os dados
+    de origem sejam gravados juntos. Retorna o número de safras resumidas.
+    """
+    if safra_ids is not None:
+        safra_ids = sorted({int(i) for i in safra_ids if i is not None})
+        if not safra_ids:
+            gravar_estado_origem(db)
+            return 0
+
+    linhas = _ler_indicadores(db, safra_ids)
+    if safra_ids is None:
+        db.execute(delete(models.SafraResumo))
+    else:
+        for i in range(0, len(safra_ids), TAMANHO_LOTE_IDS):
+            db.execute(delete(models.SafraResumo).where(models.SafraResumo.safra_id.in_(safra_ids[i:i + TAMANHO_LOTE_IDS])))
+    if linhas:
+        fases = carregar_fases_enos()
+        db.execute(insert(models.SafraResumo), [calcular_indicadores(linha, fases) for linha in linhas])
+    gravar_estado_origem(db)
+    return len(linhas)
+
+def estado_origem(db):
+    """{tabela: (linhas, maior id)} das TABELAS_ORIGEM no banco."""
+    consulta = " UNION ALL ".join(f"SELECT '{tabela}', COUNT(*), MAX(id) FROM {tabela}" for tabela in TABELAS_ORIGEM)
+    return {tabela: (linhas, maior_id) for tabela, linhas, maior_id in db.execute(text(consulta))}
+
+def gravar_estado_origem(db):
+    db.execute(delete(models.SafraResumoEstado))
+    db.execute(insert(models.SafraResumoEstado), [
+        {'tabela': tabela, 'linhas': linhas, 'maior_id': maior_id}
+        for tabela, (linhas, maior_id) in estado_origem(db).items()
+    ])
+
+def resumo_atualizado(db):
+    """
+    True se o estado gravado com o resumo coincide com o das tabelas de origem.
+
+    Deteta linhas inseridas ou apagadas sem atualizar o resumo (ex.: uma análise de solo
+    gravada diretamente); valores alterados no lugar fora das funções de escrita não
+    mudam a contagem nem o maior id e exigem 'python resumo_safras.py'.
+    """
+    tabela = models.SafraResumoEstado.__table__
+    gravado = {linha.tabela: (linha.linhas, linha.maior_id) for linha in db.execute(select(tabela))}
+    return gravado == estado_origem(db)
+
+def reconstruir_resumo_safras(db_engine=engine):
+    """Reconstrói toda a tabela numa única transação (após cargas em massa ou ajustes diretos no banco)."""
+    models.SafraResumo.__table__.create(db_engine, checkfirst=True)
+    models.SafraResumoEstado.__table__.create(db_engine, checkfirst=True)
+    with db_engine.begin() as conn:
+        n_safras = atualizar_resumo_safras(conn)
+    print(f"Tabela safra_resumo reconstruída com {n_safras} safras.")
+    return n_safras
+
+if __name__ == "__main__":
+    reconstruir_resumo_safras()
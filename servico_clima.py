@@ -0,0 +1,178 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# =============================================================================
+# 0. CONFIGURAÇÕES
+# =============================================================================
+
+OPENWEATHER_API_KEY = os.getenv("OPENWEATHER_API_KEY", "cd679ff6e2bb5bc8b49cb85755d617f4")
+# Pode ser apontado para um servidor local de testes
+OPENWEATHER_BASE_URL = os.getenv("OPENWEATHER_BASE_URL", "https://api.openweathermap.org")
+CHAVE_NAO_CONFIGURADA = "SUA_CHAVE_DE_API_VAI_AQUI"
+
+# (conexão, leitura) em segundos: uma resposta lenta nunca prende o worker por mais que isso
+TIMEOUT_S = (float(os.getenv("CLIMA_TIMEOUT_CONEXAO_S", 3)), float(os.getenv("CLIMA_TIMEOUT_LEITURA_S", 8)))
+TAMANHO_POOL_HTTP = 10
+
+# A geocodificação de uma cidade não muda: fica em cache enquanto o processo viver.
+# A previsão é guardada por 30 minutos para cada coordenada arredondada (~1 km).
+TTL_PREVISAO_S = int(os.getenv("CLIMA_TTL_PREVISAO_S", 30 * 60))
+CASAS_DECIMAIS_COORDENADAS = 2
+MAX_ENTRADAS_CACHE = 1024
+NUM_LOCKS = 64
+
+# =============================================================================
+# 1. CACHE
+# =============================================================================
+
+class CacheTTL:
+    """Cache LRU thread-safe com validade opcional por entrada (ttl_s=None: sem expiração)."""
+
+    def __init__(self, ttl_s=None, max_entradas=MAX_ENTRADAS_CACHE):
+        self.ttl_s = ttl_s
+        self.max_entradas = max_entradas
+        self._dados = OrderedDict()
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+
+    def obter(self, chave):
+        with self._lock:
+            item = self._dados.get(chave)
+            if item is not None and item[1] is not None and time.monotonic() >= item[1]:
+                del self._dados[chave]
+                item = None
+            if item is None:
+                self.falhas += 1
+                return None
+            self.acertos += 1
+            self._dados.move_to_end(chave)
+            return item[0]
+
+    def estatisticas(self):
+        """(acertos, falhas) desde a criação da cache."""
+        return self.acertos, self.falhas
+
+    def guardar(self, chave, valor):
+        with self._lock:
+            expira_em = time.monotonic() + self.ttl_s if self.ttl_s is not None else None
+            self._dados[chave] = (valor, expira_em)
+            self._dados.move_to_end(chave)
+            while len(self._dados) > self.max_entradas:
+                self._dados.popitem(last=False)
+
+    def limpar(self):
+        with self._lock:
+            self._dados.clear()
+
+# =============================================================================
+# 2. BACKENDS
+# =============================================================================
+
+class BackendOpenWeather:
+    """Acesso HTTP à OpenWeatherMap com sessão persistente (pool de conexões) e timeouts."""
+
+    def __init__(self, api_key=OPENWEATHER_API_KEY, base_url=OPENWEATHER_BASE_URL, timeout=TIMEOUT_S):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+        # Repete uma vez em falhas transitórias do servidor, sem estender demasiado a espera
+        adaptador = HTTPAdapter(pool_connections=TAMANHO_POOL_HTTP, pool_maxsize=TAMANHO_POOL_HTTP,
+                                max_retries=Retry(total=1, backoff_factor=0.2, status_forcelist=[502, 503, 504], allowed_methods=["GET"]))
+        self.session.mount("http://", adaptador)
+        self.session.mount("https://", adaptador)
+
+    def configurado(self):
+        return bool(self.api_key) and self.api_key != CHAVE_NAO_CONFIGURADA
+
+    def geocodificar(self, cidade):
+        """Lista de locais encontrados para a cidade (pode ser vazia)."""
+        response = self.session.get(f"{self.base_url}/geo/1.0/direct", params={"q": f"{cidade},BR", "limit": 1, "appid": self.api_key}, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def previsao(self, lat, lon):
+        """Previsão de 5 dias em intervalos de 3 horas."""
+        response = self.session.get(f"{self.base_url}/data/2.5/forecast", params={"lat": lat, "lon": lon, "appid": self.api_key, "units": "metric", "lang": "pt_br"}, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+# =============================================================================
+# 3. SERVIÇO
+# =============================================================================
+
+class ServicoClima:
+    """
+    Geocodificação e previsão do tempo com cache.
+
+    Os métodos devolvem (resultado, mensagem_de_erro), como as funções originais do
+    dashboard. Respostas válidas (incluindo "cidade não encontrada") ficam em cache;
+    erros de conexão não, para que a próxima pergunta tente de novo.
+    """
+
+    def __init__(self, backend=None, ttl_previsao_s=TTL_PREVISAO_S):
+        self.backend = backend or BackendOpenWeather()
+        self.cache_geocodificacao = CacheTTL(ttl_s=None)
+        self.cache_previsao = CacheTTL(ttl_s=ttl_previsao_s)
+        self._locks = [threading.Lock() for _ in range(NUM_LOCKS)]
+
+    def _lock_da_chave(self, chave):
+        # Pedidos simultâneos para a mesma chave esperam pela primeira resposta em vez de repetir a chamada
+        return self._locks[hash(chave) % len(self._locks)]
+
+    def coordenadas_cidade(self, city_name):
+        if not self.backend.configurado():
+            return None, "API Key não configurada."
+        chave = " ".join(city_name.lower().split())
+        with self._lock_da_chave(("geo", chave)):
+            resultado = self.cache_geocodificacao.obter(chave)
+            if resultado is None:
+                try:
+                    data = self.backend.geocodificar(city_name)
+                except requests.exceptions.RequestException as e:
+                    return None, f"Erro de conexão com a API de geocoding: {e}"
+                if data:
+                    location = data[0]
+                    resultado = ((location['lat'], location['lon'], f"{location.get('name', '')}, {location.get('state', '')}"), None)
+                else:
+                    resultado = (None, f"Cidade '{city_name}' não encontrada.")
+                self.cache_geocodificacao.guardar(chave, resultado)
+        return resultado
+
+    def previsao(self, lat, lon):
+        if not self.backend.configurado():
+            return None, "Por favor, insira uma chave de API da OpenWeatherMap no início do script."
+        chave = (round(float(lat), CASAS_DECIMAIS_COORDENADAS), round(float(lon), CASAS_DECIMAIS_COORDENADAS))
+        with self._lock_da_chave(("previsao", chave)):
+            dados = self.cache_previsao.obter(chave)
+            if dados is None:
+                try:
+                    dados = self.backend.previsao(*chave)
+                except requests.exceptions.RequestException as e:
+                    return None, f"Erro de conexão com a API de meteorologia: {e}"
+                self.cache_previsao.guardar(chave, dados)
+        return dados, None
+
+_servico = None
+_lock_servico = threading.Lock()
+
+def obter_servico():
+    """Instância partilhada pelo processo (criada no primeiro uso)."""
+    global _servico
+    with _lock_servico:
+        if _servico is None:
+            _servico = ServicoClima()
+        return _servico
+
+def configurar_servico(backend=None, **kwargs):
+    """Substitui o serviço partilhado (ex.: por um backend de testes) e devolve-o."""
+    global _servico
+    with _lock_servico:
+        _servico = ServicoClima(backend, **kwargs)
+        return _servico
@@ -0,0 +1,59 @@
+import os
+
+# =============================================================================
+# 0. CONFIGURAÇÕES
+# =============================================================================
+
+# Os callbacks pesados do dashboard correm como tarefas do Dash em processos à
+# parte, geridos por um diskcache local, para não prenderem os workers que servem
+# os pedidos. DASH_TAREFAS_SEGUNDO_PLANO=0 volta a executá-los no próprio worker.
+TAREFAS_SEGUNDO_PLANO = os.getenv("DASH_TAREFAS_SEGUNDO_PLANO", "1") != "0"
+# Diretório partilhado por todos os workers do mesmo servidor
+DIRETORIO_TAREFAS = os.getenv("DASH_TAREFAS_DIR", "cache_tarefas")
+# Tempo que os resultados e o progresso de uma tarefa ficam guardados
+VALIDADE_RESULTADOS_S = int(os.getenv("DASH_TAREFAS_VALIDADE_S", 600))
+
+# =============================================================================
+# 1. GERENCIADOR DE TAREFAS
+# =============================================================================
+
+def criar_gerenciador(diretorio=DIRETORIO_TAREFAS, ativo=TAREFAS_SEGUNDO_PLANO):
+    """
+    DiskcacheManager do Dash para os callbacks em segundo plano, ou None se estiver
+    desativado ou faltarem os pacotes necessários (diskcache, multiprocess e psutil).
+    """
+    if not ativo:
+        return None
+    try:
+        import diskcache
+        from dash import DiskcacheManager
+        return DiskcacheManager(diskcache.Cache(diretorio), expire=VALIDADE_RESULTADOS_S)
+    except ImportError as e:
+        print(f"Aviso: callbacks em segundo plano indisponíveis ({e}). Os cálculos pesados correrão no próprio worker.")
+        return None
+
+def _sem_progresso(*args):
+    pass
+
+def callback_pesado(app, gerenciador, outputs, inputs, progress, running=None, cancel=None, **kwargs):
+    """
+    Registra um callback cuja função recebe `set_progress` como primeiro argumento.
+
+    Com um gerenciador, o callback é executado em segundo plano: o progresso é
+    publicado em `progress`, a tarefa é cancelada quando algum dos `cancel` muda e o
+    próprio Dash termina a tarefa anterior quando os filtros disparam o callback de
+    novo. Sem gerenciador, corre de forma síncrona e `set_progress` não faz nada.
+    O Dash transforma cada entrada de `cancel` num callback do servidor: com a url como
+    entrada, haveria um pedido a cada navegação. Por isso os callbacks do dashboard não
+    usam `cancel`, e uma tarefa abandonada ao mudar de página simplesmente termina.
+    """
+    def decorador(funcao):
+        if gerenciador is not None:
+            return app.callback(outputs, inputs, background=True, manager=gerenciador,
+                                progress=progress, running=running, cancel=cancel, **kwargs)(funcao)
+        def executar(*args):
+            return funcao(_sem_progresso, *args)
+        executar.__name__ = funcao.__name__
+        app.callback(outputs, inputs, running=running, **kwargs)(executar)
+        return funcao
+    return decorador
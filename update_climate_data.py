@@ -1,9 +1,14 @@
 import requests
 import pandas as pd
-from datetime import date
+from datetime import date, timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from tqdm import tqdm
 import numpy as np
+import threading
 import time
+import os
+
+import armazenamento_clima
 
 # =============================================================================
 # 0. CONFIGURAÇÕES
@@ -13,19 +18,50 @@ import time
 LATITUDE = -11.86
 LONGITUDE = -55.49
 
+# Estações (pontos de grade) buscadas na Open-Meteo
+ESTACOES = {
+    "sinop": {"latitude": LATITUDE, "longitude": LONGITUDE},
+}
+ESTACAO_PADRAO = "sinop"
+
 # Período para buscar os dados históricos
 ANO_INICIAL = 2004
 ANO_FINAL = date.today().year
 
 OUTPUT_CSV_FILE = "Dados_Climaticos_OPEN-METEO.csv"
 
+# Endereço da API (pode ser apontado para um servidor local de testes)
+OPEN_METEO_URL = os.getenv("OPEN_METEO_URL", "https://archive-api.open-meteo.com/v1/archive")
+
+# Armazenamento particionado onde cada estação/ano é gravado assim que é baixado
+PARTICOES_DIR = armazenamento_clima.DIRETORIO_PADRAO
+
+# Concorrência e limite de taxa das requisições
+MAX_REQUISICOES_SIMULTANEAS = 4
+INTERVALO_MINIMO_ENTRE_REQUISICOES_S = 1.0
+
 # =============================================================================
-# 1. FUNÇÃO PARA BUSCAR E PROCESSAR OS DADOS DA OPEN-METEO
+# 1. FUNÇÕES PARA BUSCAR E PROCESSAR OS DADOS DA OPEN-METEO
 # =============================================================================
 
-def fetch_open_meteo_data(lat, lon, start_date, end_date):
+class LimitadorTaxa:
+    """Garante um intervalo mínimo entre o início de requisições feitas por várias threads."""
+
+    def __init__(self, intervalo_s):
+        self.intervalo_s = intervalo_s
+        self._lock = threading.Lock()
+        self._proxima_liberacao = 0.0
+
+    def aguardar(self):
+        with self._lock:
+            agora = time.monotonic()
+            espera = self._proxima_liberacao - agora
+            self._proxima_liberacao = max(agora, self._proxima_liberacao) + self.intervalo_s
+        if espera > 0:
+            time.sleep(espera)
+
+def fetch_open_meteo_data(lat, lon, start_date, end_date, url=OPEN_METEO_URL):
     """Busca dados da API Open-Meteo para um período e local específicos."""
-    url = "https://archive-api.open-meteo.com/v1/archive"
     params = {
         "latitude": lat,
         "longitude": lon,
@@ -41,66 +77,116 @@ def fetch_open_meteo_data(lat, lon, start_date, end_date):
     except requests.exceptions.RequestException as e:
         return None
 
-def process_and_save_data():
+def padronizar_dados(dados_json):
+    """Converte a resposta horária da API no formato de colunas usado pelo projeto."""
+    df = pd.DataFrame(dados_json['hourly'])
+    df = df.rename(columns={
+        'time': 'DATETIME',
+        'precipitation': 'PRECIPITACAO_TOTAL_HORARIO_mm',
+        'temperature_2m': 'TEMPERATURA_AR_BULBO_SECO_HORARIA_C'
+    })
+    df['DATETIME'] = pd.to_datetime(df['DATETIME'])
+    df['PRECIPITACAO_TOTAL_HORARIO_mm'] = pd.to_numeric(df['PRECIPITACAO_TOTAL_HORARIO_mm'], errors='coerce')
+    df['TEMPERATURA_AR_BULBO_SECO_HORARIA_C'] = pd.to_numeric(df['TEMPERATURA_AR_BULBO_SECO_HORARIA_C'], errors='coerce')
+    return df[['DATETIME', 'PRECIPITACAO_TOTAL_HORARIO_mm', 'TEMPERATURA_AR_BULBO_SECO_HORARIA_C']]
+
+def ultimo_timestamp_valido(estacao, ano, diretorio=PARTICOES_DIR):
+    """Último horário com dados reais (a API devolve nulos para as horas ainda não processadas)."""
+    df = armazenamento_clima.ler_particao(estacao, ano, ['TEMPERATURA_AR_BULBO_SECO_HORARIA_C'], diretorio)
+    if df is None:
+        return None
+    validos = df.dropna(subset=['TEMPERATURA_AR_BULBO_SECO_HORARIA_C'])
+    return validos['DATETIME'].max() if not validos.empty else None
+
+def planejar_particoes(estacao, ano_inicial, ano_final, diretorio=PARTICOES_DIR, hoje=None):
+    """
+    Define o intervalo a buscar para cada ano, retomando das partições já gravadas.
+
+    Anos completos são ignorados; um ano incompleto (ex.: o ano corrente) é
+    complementado apenas a partir do dia do último registo armazenado.
+    """
+    hoje = hoje or date.today()
+    tarefas = []
+    for ano in range(ano_inicial, ano_final + 1):
+        data_inicio = date(ano, 1, 1)
+        data_fim = min(date(ano, 12, 31), hoje)
+        if data_inicio > data_fim:
+            continue
+        ultimo = ultimo_timestamp_valido(estacao, ano, diretorio)
+        if ultimo is not None:
+            if ultimo >= pd.Timestamp(data_fim) + timedelta(hours=23):
+                continue
+            data_inicio = ultimo.date()
+        tarefas.append((ano, data_inicio, data_fim))
+    return tarefas
+
+def baixar_particao(estacao, ano, data_inicio, data_fim, limitador, diretorio=PARTICOES_DIR, url=OPEN_METEO_URL):
+    """Baixa um intervalo de um ano, junta-o à partição existente e grava o checkpoint."""
+    coordenadas = ESTACOES[estacao]
+    limitador.aguardar()
+    dados = fetch_open_meteo_data(coordenadas['latitude'], coordenadas['longitude'], data_inicio.strftime('%Y-%m-%d'), data_fim.strftime('%Y-%m-%d'), url=url)
+    if not dados or 'hourly' not in dados:
+        return ano, None
+
+    df_novo = padronizar_dados(dados)
+    armazenamento_clima.gravar(df_novo, estacao, diretorio)
+    return ano, len(df_novo)
+
+def process_and_save_data(estacao=ESTACAO_PADRAO, ano_inicial=ANO_INICIAL, ano_final=ANO_FINAL,
+                          diretorio=PARTICOES_DIR, output_csv=OUTPUT_CSV_FILE, url=OPEN_METEO_URL,
+                          max_workers=MAX_REQUISICOES_SIMULTANEAS, intervalo_s=INTERVALO_MINIMO_ENTRE_REQUISICOES_S):
     """
     Orquestra a busca de dados anuais da Open-Meteo, processa-os e salva em um CSV.
+
+    Os anos são baixados em paralelo (com concorrência e taxa limitadas) e cada
+    partição é gravada no armazenamento particionado (armazenamento_clima) assim
+    que termina, de modo que uma nova execução retoma do ponto em que parou e só
+    busca os dias que ainda faltam.
     """
-    all_data_df = pd.DataFrame()
-    
-    print(f"Iniciando a busca de dados da Open-Meteo para a região de Sinop, MT ({ANO_INICIAL}-{ANO_FINAL}).")
-    print("Este processo pode levar alguns minutos...")
-    
-    for ano in tqdm(range(ANO_INICIAL, ANO_FINAL + 1), desc="Buscando dados anuais"):
-        data_inicio_str = f"{ano}-01-01"
-        
-        if ano == ANO_FINAL:
-            data_fim_str = date.today().strftime('%Y-%m-%d')
-        else:
-            data_fim_str = f"{ano}-12-31"
-            
-        dados_anuais = fetch_open_meteo_data(LATITUDE, LONGITUDE, data_inicio_str, data_fim_str)
-        
-        if dados_anuais and 'hourly' in dados_anuais:
-            df_ano = pd.DataFrame(dados_anuais['hourly'])
-            all_data_df = pd.concat([all_data_df, df_ano], ignore_index=True)
-        
-        time.sleep(1)
+    tarefas = planejar_particoes(estacao, ano_inicial, ano_final, diretorio)
 
+    print(f"Iniciando a busca de dados da Open-Meteo para a estação '{estacao}' ({ano_inicial}-{ano_final}).")
+    if not tarefas:
+        print("Todas as partições já estão atualizadas. Nenhum download necessário.")
+    else:
+        print(f"{len(tarefas)} partição(ões) a baixar ou complementar. Este processo pode levar alguns minutos...")
+
+    limitador = LimitadorTaxa(intervalo_s)
+    falhas = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futuros = [executor.submit(baixar_particao, estacao, ano, inicio, fim, limitador, diretorio, url) for ano, inicio, fim in tarefas]
+        for futuro in tqdm(as_completed(futuros), total=len(futuros), desc="Buscando dados anuais"):
+            ano, n_registos = futuro.result()
+            if n_registos is None:
+                falhas.append(ano)
+
+    if falhas:
+        print(f"\nAviso: falha ao baixar os anos {sorted(falhas)}. Execute novamente para retomar a partir destes.")
+
+    all_data_df = armazenamento_clima.read_range(estacao, f"{ano_inicial}-01-01", f"{ano_final}-12-31 23:59", diretorio=diretorio)
     if all_data_df.empty:
         print("\nNenhum dado foi baixado. O arquivo CSV não será criado.")
         return
 
-    print(f"\nProcessando {len(all_data_df)} registros horários baixados...")
-    
-    # --- Padronização dos dados ---
-    all_data_df.rename(columns={
-        'time': 'DATETIME',
-        'precipitation': 'PRECIPITACAO_TOTAL_HORARIO_mm',
-        'temperature_2m': 'TEMPERATURA_AR_BULBO_SECO_HORARIA_C'
-    }, inplace=True)
-    
-    all_data_df['DATETIME'] = pd.to_datetime(all_data_df['DATETIME'])
-    
-    all_data_df['PRECIPITACAO_TOTAL_HORARIO_mm'] = pd.to_numeric(all_data_df['PRECIPITACAO_TOTAL_HORARIO_mm'], errors='coerce')
-    all_data_df['TEMPERATURA_AR_BULBO_SECO_HORARIA_C'] = pd.to_numeric(all_data_df['TEMPERATURA_AR_BULBO_SECO_HORARIA_C'], errors='coerce')
-    
+    print(f"\nProcessando {len(all_data_df)} registros horários armazenados...")
+
     # --- MUDANÇA: ANÁLISE E TRATAMENTO DE DADOS NULOS ---
     print("\nAnalisando a qualidade dos dados...")
     print(all_data_df.isnull().sum()) # Mostra quantos valores nulos existem por coluna
-    
+
     # Usa interpolação linear para preencher pequenas falhas nos dados de temperatura
-    all_data_df['TEMPERATURA_AR_BULBO_SECO_HORARIA_C'].interpolate(method='linear', inplace=True)
+    all_data_df['TEMPERATURA_AR_BULBO_SECO_HORARIA_C'] = all_data_df['TEMPERATURA_AR_BULBO_SECO_HORARIA_C'].interpolate(method='linear')
     # Para precipitação, é mais seguro preencher falhas com 0, pois a interpolação poderia criar chuva onde não houve
-    all_data_df['PRECIPITACAO_TOTAL_HORARIO_mm'].fillna(0, inplace=True)
-    
+    all_data_df['PRECIPITACAO_TOTAL_HORARIO_mm'] = all_data_df['PRECIPITACAO_TOTAL_HORARIO_mm'].fillna(0)
+
     print("\nDados nulos tratados com sucesso.")
     print(all_data_df.isnull().sum())
-    
+
     df_final = all_data_df[['DATETIME', 'PRECIPITACAO_TOTAL_HORARIO_mm', 'TEMPERATURA_AR_BULBO_SECO_HORARIA_C']]
-    
-    df_final.to_csv(OUTPUT_CSV_FILE, index=False)
-    
-    print(f"\nSucesso! Arquivo '{OUTPUT_CSV_FILE}' foi criado com {len(df_final)} registros limpos e tratados.")
+
+    df_final.to_csv(output_csv, index=False)
+
+    print(f"\nSucesso! Arquivo '{output_csv}' foi criado com {len(df_final)} registros limpos e tratados.")
 
 if __name__ == '__main__':
-    process_and_save_data()
\ No newline at end of file
+    process_and_save_data()
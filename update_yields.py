@@ -1,74 +1,100 @@
 import pandas as pd
-from sqlalchemy import create_engine, text
+from sqlalchemy import text, bindparam
 import numpy as np
+import argparse
 import sys
 
-def update_database_yields():
+import database
+import migrations
+import resumo_safras
+
+# Valores de produtividade média que você forneceu
+TARGET_AVERAGES = {
+    'Milho': 5550,
+    'Algodão': 1800,
+    'Soja': 3970
+}
+
+# Variação aleatória aplicada a cada safra (+/- 5%) para realismo
+VARIACAO_ALEATORIA = 0.05
+
+def reescalar_produtividade(db_engine, target_averages, dry_run=False, variacao=VARIACAO_ALEATORIA, seed=None):
+    """
+    Reescala a produtividade das safras de cada cultura para uma média alvo.
+
+    Os fatores por cultura são calculados de uma só vez (média atual -> alvo),
+    aplicados de forma vetorizada junto com uma pequena variação aleatória, e todas as
+    atualizações são gravadas num único executemany dentro de uma transação curta.
+    Com `dry_run=True` nada é gravado; apenas se calculam as médias antes/depois.
+    Retorna um DataFrame com o resumo por cultura.
+    """
+    consulta = text("""
+        SELECT s.id, c.nome AS cultura, s.produtividade_kg_ha
+        FROM safras s
+        JOIN culturas c ON s.cultura_id = c.id
+        WHERE s.produtividade_kg_ha IS NOT NULL AND c.nome IN :culturas
+    """).bindparams(bindparam('culturas', expanding=True))
+    df = pd.read_sql_query(consulta, db_engine, params={'culturas': list(target_averages)})
+
+    medias_atuais = df.groupby('cultura')['produtividade_kg_ha'].mean()
+    for cultura_nome in target_averages:
+        if cultura_nome not in medias_atuais.index:
+            print(f"- Nenhuma safra encontrada para '{cultura_nome}'. Pulando.")
+        elif pd.isna(medias_atuais[cultura_nome]) or medias_atuais[cultura_nome] == 0:
+            print(f"- Média atual para '{cultura_nome}' é 0 ou inválida. Pulando.")
+
+    fatores = (pd.Series(target_averages, dtype=float) / medias_atuais.replace(0, np.nan)).dropna()
+    df = df[df['cultura'].isin(fatores.index)].copy()
+
+    # A variação aleatória é aplicada antes da escala final, para que a nova média bata exatamente com a meta
+    rng = np.random.default_rng(seed)
+    com_variacao = df['produtividade_kg_ha'] * rng.uniform(1 - variacao, 1 + variacao, len(df))
+    escala = pd.Series(target_averages, dtype=float) / com_variacao.groupby(df['cultura']).mean()
+    df['nova_produtividade'] = com_variacao * df['cultura'].map(escala)
+
+    resumo = df.groupby('cultura').agg(
+        safras=('id', 'size'),
+        media_antes=('produtividade_kg_ha', 'mean'),
+        media_depois=('nova_produtividade', 'mean'),
+    )
+    resumo['fator'] = fatores
+    resumo['meta'] = pd.Series(target_averages)
+    for cultura_nome, linha in resumo.iterrows():
+        print(f"- Ajustando '{cultura_nome}': Média atual={linha['media_antes']:,.0f} kg/ha, Fator={linha['fator']:.2f}, Nova média={linha['media_depois']:,.0f} kg/ha ({linha['safras']:.0f} safras)")
+
+    if dry_run or df.empty:
+        return resumo
+
+    atualizacoes = [{'yield': float(p), 'id': int(i)} for i, p in zip(df['id'], df['nova_produtividade'])]
+    # Transação única e curta: todos os cálculos foram feitos antes de obter o bloqueio de escrita
+    with db_engine.begin() as connection:
+        connection.execute(text("UPDATE safras SET produtividade_kg_ha = :yield WHERE id = :id"), atualizacoes)
+        # O reescalonamento atinge praticamente todas as safras: reconstruir o resumo inteiro é mais barato
+        resumo_safras.atualizar_resumo_safras(connection)
+    return resumo
+
+def update_database_yields(dry_run=False, seed=None):
     """
     Ajusta os valores de produtividade no banco de dados para corresponderem
     a novas médias, mantendo a variabilidade relativa.
     """
-    # Valores de produtividade média que você forneceu
-    target_averages = {
-        'Milho': 5550,
-        'Algodão': 1800,
-        'Soja': 3970
-    }
-
     try:
-        engine = create_engine("sqlite:///gestao_agricola.db")
-
-        # Ler as tabelas necessárias
-        df_safras = pd.read_sql_table('safras', engine)
-        df_culturas = pd.read_sql_table('culturas', engine)
-        
-        # Juntar para ter o nome da cultura junto com a safra
-        df_merged = pd.merge(df_safras, df_culturas, left_on='cultura_id', right_on='id', suffixes=('_safra', '_cultura'))
-
-        print("Iniciando a atualização do banco de dados...")
-        
-        # Usar uma transação para garantir que todas as atualizações ocorram ou nenhuma
-        with engine.begin() as connection:
-            for cultura_nome, target_avg in target_averages.items():
-                
-                # Filtra os dados para a cultura atual
-                cultura_data = df_merged[df_merged['nome'] == cultura_nome]
-                if cultura_data.empty:
-                    print(f"- Nenhuma safra encontrada para '{cultura_nome}'. Pulando.")
-                    continue
-                
-                # Calcula a média atual
-                current_avg = cultura_data['produtividade_kg_ha'].mean()
-
-                if pd.isna(current_avg) or current_avg == 0:
-                    print(f"- Média atual para '{cultura_nome}' é 0 ou inválida. Pulando.")
-                    continue
-                
-                # Calcula o fator de ajuste
-                adjustment_factor = target_avg / current_avg
-                print(f"- Ajustando '{cultura_nome}': Média atual={current_avg:,.0f} kg/ha, Fator={adjustment_factor:.2f}")
-
-                # Itera em cada safra da cultura para aplicar o ajuste
-                for index, row in cultura_data.iterrows():
-                    safra_id = row['id_safra']
-                    current_yield = row['produtividade_kg_ha']
-                    
-                    # Aplica o fator de ajuste
-                    new_yield = current_yield * adjustment_factor
-                    
-                    # Adiciona uma pequena variação aleatória (+/- 5%) para realismo
-                    random_factor = np.random.uniform(0.95, 1.05)
-                    final_yield = new_yield * random_factor
-                    
-                    # Prepara e executa o comando SQL de atualização
-                    stmt = text("UPDATE safras SET produtividade_kg_ha = :yield WHERE id = :id")
-                    connection.execute(stmt, {"yield": final_yield, "id": safra_id})
-        
-        print("\nBanco de dados 'gestao_agricola.db' foi atualizado com sucesso!")
+        engine = database.engine
+        migrations.atualizar_esquema(engine)
+
+        print("Iniciando a atualização do banco de dados..." if not dry_run else "Simulação (dry-run): nenhuma alteração será gravada.")
+        reescalar_produtividade(engine, TARGET_AVERAGES, dry_run=dry_run, seed=seed)
+
+        if not dry_run:
+            print(f"\nBanco de dados '{database.descricao_banco(engine)}' foi atualizado com sucesso!")
 
     except Exception as e:
         print(f"\nOcorreu um erro: {e}", file=sys.stderr)
         sys.exit(1)
 
 if __name__ == "__main__":
-    update_database_yields()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Reescala a produtividade das safras para as médias alvo por cultura.")
+    parser.add_argument("--dry-run", action="store_true", help="Apenas mostra as médias antes/depois, sem gravar.")
+    parser.add_argument("--seed", type=int, default=None, help="Semente da variação aleatória.")
+    args = parser.parse_args()
+    update_database_yields(dry_run=args.dry_run, seed=args.seed)